@@ -1,10 +1,23 @@
 # Player Dark_Knight
 
+import sys
 import numpy as np
-from datetime import datetime
+import os
+import attack_maps
+import parallel_search
+import eval_cache
+import knight_distance
+import opening_book
+import parameters
+import proof_search
+import shared_tt
+import tablebase
+import zobrist
+from search_stats import SearchStats
+from time_control import TimeControl, SearchTimeout
 
 class GameState(object):
-    __slots__ = ['board', 'playerToMove', 'gameOver', 'movesRemaining', 'points']
+    __slots__ = ['board', 'playerToMove', 'gameOver', 'movesRemaining', 'points', 'key', 'attacks']
 
 # Global variables
 boardWidth = 0            # Board dimensions 
@@ -16,32 +29,58 @@ moveLimit = 0             # Maximum number of moves
                           # Otherwise, number of remaining moves is added to winner's score.  
 startState = None         # Initial state, provided to the initPlayer function
 assignedPlayer = 0        # 1 -> player MAX; -1 -> player MIN (in terms of the MiniMax algorithm)
-startTime = 0             # Remember the time stamp when move computation started
+clock = TimeControl()     # Keeps track of the thinking time and aborts the search when it runs out
 
 # Local parameters for player's algorithm. Can be modified, deleted, or extended in any conceivable way
 name = 'Dark_Knight'
 pointMultiplier = 10      # Muliplier for winner's points in getScore function
 pieceValue = 20           # Score value of a single piece in getScore function
+defenseScore = [0, 2, 2, 0]  # posScore bonus for a horse 0, 1, 2, or 3 moves away from its own apple
+attackScore = [0, 6, 3, 1]   # posScore bonus for a horse 0, 1, 2, or 3 moves away from the opponent's apple
+tunableParameters = ['pieceValue', 'defenseScore', 'attackScore']  # Evaluation parameters that tuning.py can optimize
+parameterFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Dark_Knight_parameters.json')  # Tuned values (None -> the values above)
 victoryScoreThresh = 1000 # An absolute score exceeds this value if and only if one player has won
 minLookAhead = 3          # Initial search depth for iterative deepening
 maxLookAhead = 20          # Maximum search depth 
-evalCount = 0             # Count the total number of e(p) computations during each search cycle 
-leafCount = 0             # Count the total number of leaves encountered during each search cycle 
+statsEnabled = False      # Count nodes, leaves, evaluations, cutoffs, and TT probes in <stats> (off -> one test per counting point)
+stats = SearchStats(name) # Search statistics of the current iteration, and a record (see search_stats.py) for each finished one
 appleDistance = None      # For exach square, contains distance (number of moves) to MAX or MIN's apple (index 0 or 1) 
 posScore = None
+parallelWorkers = 0       # Number of extra processes for root-parallel search (0 -> search on a single core)
+workerPool = None         # Worker processes for root-parallel search, started in initPlayer
+transpositionTableSize = 2 ** 18  # Number of entries in the transposition table
+transpositionTableName = None     # Name of an existing shared table to use instead of creating one (set in workers)
+transpositionTable = None # Transposition table in shared memory, so that parallel workers share their results
+minTableDepth = 2         # Nodes with less remaining depth are not looked up in the transposition table
+pieceKeys = None          # Zobrist keys for each square and piece
+evalCacheSize = 2 ** 16   # Number of entries in the evaluation cache
+evalCache = None          # Caches getScore results by position key, separately from the transposition table
+knightTargets = None      # For each square index (x * boardHeight + y), the indices of the squares a horse can jump to
+batchOrdering = False     # Order moves in lookAheadWithPresort by one evaluateMany call instead of cached getScore calls
+openingBookFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), name + '_book.npy')  # Built by opening_book.py (None -> no book)
+openingBook = None        # Book moves for the first plies from the start position, loaded in initPlayer if the file exists
+tablebaseDirectory = None # Directory with the tablebase files built by tablebase.py (None -> next to tablebase.py)
+tablebases = None         # Exact results of positions with few horses, loaded in initPlayer if the files exist
+proofNodeLimit = 20000    # Node budget of the proof-number search for a forced win at the root (0 -> no proof search)
+proofShare = 0.1          # Share of the thinking time and of the move's node budget that the proof-number search may use
+proofMaxPlies = 11        # Longest forced win (in plies) that the proof-number search looks for
+proofMaxHorses = 4        # The proof-number search runs when at most this many horses are left on the board, ...
+proofThreatDistance = 2   # ... or a horse of the player to move is at most this many moves from the opponent's apple
+proofSearch = None        # Proof-number search (see proof_search.py), created in initPlayer
 
-direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]    # Possible (dx, dy) moves
     
-# Compute list of legal moves for a given GameState and the player moving next 
+# Compute list of legal moves for a given GameState and the player moving next. The player's horses are found with
+# one NumPy scan and their targets looked up in knightTargets (in the order of attack_maps.direction), so the cost grows with the
+# number of horses rather than with the board size.
 def getMoveOptions(state):
     moves = []
-    for xStart in range(boardWidth):                                    # Search board for player's pieces
-        for yStart in range(boardHeight):
-            if state.board[xStart, yStart] == state.playerToMove:       # Found a piece!
-                for (dx, dy) in direction:                              # Check all potential move vectors
-                    (xEnd, yEnd) = (xStart + dx, yStart + dy)
-                    if xEnd >= 0 and xEnd < boardWidth and yEnd >= 0 and yEnd < boardHeight and not (state.board[xEnd, yEnd] in [state.playerToMove, 2 * state.playerToMove]):
-                        moves.append((xStart, yStart, xEnd, yEnd))      # If square is empty or occupied by the opponent, then we have a legal move.
+    board = state.board.ravel().tolist()
+    ownPieces = (state.playerToMove, 2 * state.playerToMove)
+    for start in np.flatnonzero(state.board == state.playerToMove).tolist():   # Search board for player's pieces
+        (xStart, yStart) = divmod(start, boardHeight)
+        for target in knightTargets[start]:
+            if board[target] not in ownPieces:                  # If square is empty or occupied by the opponent, then we have a legal move.
+                moves.append((xStart, yStart) + divmod(target, boardHeight))
     return moves
 
 # For a given GameState and move to be executed, return the GameState that results from the move
@@ -55,6 +94,8 @@ def makeMove(state, move):
     newState.movesRemaining = state.movesRemaining - 1
     newState.gameOver = False
     newState.points = 0
+    newState.key = zobrist.moveKey(state.key, pieceKeys, move, state.playerToMove, state.board[xEnd, yEnd], state.movesRemaining)
+    newState.attacks = attack_maps.moveAttackMaps(state.attacks, knightTargets, boardHeight, move, state.playerToMove, state.board[xEnd, yEnd])
 
     if state.board[xEnd, yEnd] == -2 * state.playerToMove or not (-state.playerToMove in newState.board):    
         newState.gameOver = True                            # If the opponent lost the apple or all horses, the game is over...
@@ -66,7 +107,8 @@ def makeMove(state, move):
 
 # Return the evaluation score for a given GameState; higher score indicates a better situation for Player MAX.
 # Knight_Rider's evaluation function is based on the number of remaining horses and their proximity to the 
-# opponent's apple. 
+# opponent's apple. The numbers of horses attacking and protecting each horse are looked up in the attack maps
+# that makeMove keeps up to date (see rootState).
 def getScore(state):
     if state.gameOver:
         return pointMultiplier * state.points 
@@ -79,35 +121,27 @@ def getScore(state):
     protectCount = [0, 0]
     movesUntilWin = [10000, 10000]
     
-    for x in range(boardWidth):                             # Search board for any pieces
-        for y in range(boardHeight):                 
-            if state.board[x, y] in [-1, 1]:
-                playerCode = state.board[x, y]
-                playerIndex = (1 - playerCode) // 2
-                horseCount[playerIndex] += 1
-                defendCount, attackCount = 0, 0
-                score += playerCode * posScore[playerIndex, x, y]
-
-                for (dx, dy) in direction:                              # Check all potential move vectors
-                    (xEnd, yEnd) = (x + dx, y + dy)
-                    if xEnd >= 0 and xEnd < boardWidth and yEnd >= 0 and yEnd < boardHeight:
-                        if state.board[xEnd, yEnd] == playerCode:
-                            defendCount += 1
-                        elif state.board[xEnd, yEnd] == -playerCode:
-                            attackCount += 1
-                
-                if attackCount > 0:
-                    fightingHorseCount[playerIndex] += 1
-                if attackCount > defendCount:
-                    troubledHorseCount[playerIndex] += 1
-                
-                protectCount[playerIndex] += defendCount
-                
-                if appleDistance[1 - playerIndex, x, y] == 1:
-                    if state.playerToMove == playerCode:        # 1 step away from opponent's apple and making next move -> win!
-                        movesUntilWin[playerToMoveIndex] = 1
-                    elif defendCount >= attackCount:
-                        movesUntilWin[1 - playerToMoveIndex] = min(movesUntilWin[1 - playerToMoveIndex], 2 * attackCount + 2)
+    (horseXs, horseYs) = np.nonzero(np.abs(state.board) == 1)   # Search board for any horses
+    for (x, y) in zip(horseXs.tolist(), horseYs.tolist()):
+        playerCode = int(state.board[x, y])
+        playerIndex = (1 - playerCode) // 2
+        horseCount[playerIndex] += 1
+        defendCount = state.attacks[playerIndex][x * boardHeight + y]       # Own horses protecting this horse
+        attackCount = state.attacks[1 - playerIndex][x * boardHeight + y]   # Opponent's horses attacking it
+        score += playerCode * posScore[playerIndex, x, y]
+
+        if attackCount > 0:
+            fightingHorseCount[playerIndex] += 1
+        if attackCount > defendCount:
+            troubledHorseCount[playerIndex] += 1
+        
+        protectCount[playerIndex] += defendCount
+        
+        if appleDistance[1 - playerIndex, x, y] == 1:
+            if state.playerToMove == playerCode:        # 1 step away from opponent's apple and making next move -> win!
+                movesUntilWin[playerToMoveIndex] = 1
+            elif defendCount >= attackCount:
+                movesUntilWin[1 - playerToMoveIndex] = min(movesUntilWin[1 - playerToMoveIndex], 2 * attackCount + 2)
     
     score += pieceValue * (horseCount[0] - horseCount[1]) + 1 * (troubledHorseCount[1] - troubledHorseCount[0]) + 4.0 * (protectCount[0]/horseCount[0] - protectCount[1]/horseCount[1])
     if troubledHorseCount[playerToMoveIndex] < troubledHorseCount[1 - playerToMoveIndex] or (troubledHorseCount[1 - playerToMoveIndex] == 1 and fightingHorseCount[1 - playerToMoveIndex] == 1):  # Player can win a horse in the next move
@@ -125,112 +159,226 @@ def getScore(state):
     
     return score
 
-# Check whether time limit has been reached
-def timeOut():
-    duration = datetime.now() - startTime
-    return duration.seconds + duration.microseconds * 1e-6 >= timeLimit
+# Return getScore for many positions at once: <boards> is an (N, W, H) array, <playerToMove> and <movesRemaining>
+# are arrays of N values (or single values). The terms of getScore are computed with array operations over all
+# boards, with the attack counts from attack_maps.countAttacksMany; the scores are identical to getScore's.
+def evaluateMany(boards, playerToMove, movesRemaining):
+    boards = np.asarray(boards)
+    numBoards = boards.shape[0]
+    boardIndex = np.arange(numBoards)
+    playerToMove = np.broadcast_to(np.asarray(playerToMove), (numBoards,))
+    movesRemaining = np.broadcast_to(np.asarray(movesRemaining), (numBoards,))
+    playerToMoveIndex = (1 - playerToMove) // 2
+
+    horses = np.stack([boards == 1, boards == -1], axis=1)         # (N, 2, W, H): MAX's and MIN's horses
+    defendCount = attack_maps.countAttacksMany(horses).astype(int)  # Own horses that can jump to each square...
+    attackCount = defendCount[:, ::-1]                              # ... and the opponent's horses
+    horseCount = horses.sum(axis=(2, 3))
+    fightingHorseCount = (horses & (attackCount > 0)).sum(axis=(2, 3))
+    troubledHorseCount = (horses & (attackCount > defendCount)).sum(axis=(2, 3))
+    protectCount = (horses * defendCount).sum(axis=(2, 3))
+
+    score = (horses[:, 0] * posScore[0]).sum(axis=(1, 2)) - (horses[:, 1] * posScore[1]).sum(axis=(1, 2))
+    with np.errstate(divide='ignore', invalid='ignore'):            # Boards without horses are finished games (see below)
+        score += pieceValue * (horseCount[:, 0] - horseCount[:, 1]) + 1 * (troubledHorseCount[:, 1] - troubledHorseCount[:, 0]) \
+            + 4.0 * (protectCount[:, 0] / horseCount[:, 0] - protectCount[:, 1] / horseCount[:, 1])
+    (troubledToMove, troubledOther) = (troubledHorseCount[boardIndex, playerToMoveIndex], troubledHorseCount[boardIndex, 1 - playerToMoveIndex])
+    canWinHorse = (troubledToMove < troubledOther) | ((troubledOther == 1) & (fightingHorseCount[boardIndex, 1 - playerToMoveIndex] == 1))
+    score += np.where(canWinHorse, playerToMove * pieceValue, 0)
+
+    # movesUntilWin for the player to move and for the other player
+    nearApple = horses & (appleDistance[::-1] == 1)                 # Horses 1 step away from the opponent's apple
+    movesUntilWin = np.full((numBoards, 2), 10000)
+    movesUntilWin[nearApple[boardIndex, playerToMoveIndex].any(axis=(1, 2)), 0] = 1
+    otherThreats = nearApple & (defendCount >= attackCount)
+    otherThreats = otherThreats[boardIndex, 1 - playerToMoveIndex]
+    otherAttackCount = attackCount[boardIndex, 1 - playerToMoveIndex]
+    movesUntilWin[:, 1] = np.where(otherThreats, 2 * otherAttackCount + 2, 10000).min(axis=(1, 2))
+    lastHorseTroubled = (horseCount[boardIndex, 1 - playerToMoveIndex] == 1) & (troubledOther == 1)
+    movesUntilWin[lastHorseTroubled & ((playerToMove == 1) | (movesRemaining > 0)), 0] = 1
+
+    winScore = pointMultiplier * (victoryPoints + movesRemaining - movesUntilWin[:, 0])
+    lossScore = pointMultiplier * (victoryPoints + movesRemaining - movesUntilWin[:, 1])
+    toMoveWins = (movesUntilWin[:, 0] < 1000) & (movesUntilWin[:, 0] <= movesUntilWin[:, 1])
+    score = np.where(toMoveWins, playerToMove * winScore, np.where(movesUntilWin[:, 1] < movesUntilWin[:, 0], -playerToMove * lossScore, score))
+
+    # Finished games get the score of their points, as in getScore
+    maxWon = ~(boards == -2).any(axis=(1, 2)) | (horseCount[:, 1] == 0)
+    minWon = ~(boards == 2).any(axis=(1, 2)) | (horseCount[:, 0] == 0)
+    score = np.where(maxWon, pointMultiplier * (victoryPoints + movesRemaining), score)
+    score = np.where(minWon, -pointMultiplier * (victoryPoints + movesRemaining), score)
+    return np.where(~maxWon & ~minWon & (movesRemaining == 0), 0, score).astype(float)
+
+# Return getScore(state), looking the position up in the evaluation cache first; positions covered by the
+# tablebases get their exact score instead
+def getCachedScore(state):
+    if state.gameOver:
+        return pointMultiplier * state.points
+    score = evalCache.lookup(state.key)
+    if score is None:
+        score = getTablebaseScore(state)
+        if score is None:
+            score = getScore(state)
+            if statsEnabled:
+                stats.evals += 1
+        evalCache.store(state.key, score)
+    return score
+
+# Return the exact score of <state> according to the tablebases, or None if they do not cover it
+def getTablebaseScore(state):
+    if tablebases is None:
+        return None
+    result = tablebases.probe(state.board, state.playerToMove)
+    if result is None:
+        return None
+    return pointMultiplier * tablebase.resultPoints(result, state.playerToMove, state.movesRemaining, victoryPoints)
 
 # Use the minimax algorithm to look ahead <depthRemaining> moves and return the resulting score
 def lookAhead(state, depthRemaining, alpha, beta):
-    global leafCount
+    if statsEnabled:
+        stats.nodes += 1
     if depthRemaining == 0 or state.gameOver:
-        #leafCount += 1
-        return getScore(state)
+        if statsEnabled:
+            stats.leaves += 1
+        return getCachedScore(state)
 
-    if timeOut():
-        return 0
+    clock.check()                                   # Raises SearchTimeout once the time limit has been reached
+
+    moveList = getMoveOptions(state)
+    if depthRemaining >= minTableDepth:
+        (tableScore, tableMove) = transpositionTable.lookup(state.key, depthRemaining, alpha, beta)
+        if statsEnabled:
+            stats.countProbe(tableScore, tableMove)
+        if tableScore is not None:
+            return tableScore
+        if tableMove in moveList:                   # Try the best move from an earlier search first
+            moveList.remove(tableMove)
+            moveList.insert(0, tableMove)
         
     a, b = alpha, beta
+    bestMove = None
 
-    for move in getMoveOptions(state):
+    for (moveNumber, move) in enumerate(moveList):
         projectedState = makeMove(state, move)
         score = lookAhead(projectedState, depthRemaining - 1, a, b)
         
         if state.playerToMove == 1 and score > a:
-            a = score
+            a, bestMove = score, move
             if a >= beta:
+                if statsEnabled:
+                    stats.countCutoff(moveNumber)
                 break
         elif state.playerToMove == -1 and score < b:
-            b = score
+            b, bestMove = score, move
             if b <= alpha:
+                if statsEnabled:
+                    stats.countCutoff(moveNumber)
                 break
-    if state.playerToMove == 1:
-        return a
-    else:
-        return b
+    score = a if state.playerToMove == 1 else b
+    if depthRemaining >= minTableDepth:
+        transpositionTable.save(state.key, depthRemaining, alpha, beta, score, bestMove)
+    return score
 
 # Use the minimax algorithm to look ahead <depthRemaining> moves and return the resulting score
 def lookAheadWithPresort(state, depthRemaining, alpha, beta):
-    global leafCount
+    if statsEnabled:
+        stats.nodes += 1
     if depthRemaining == 0 or state.gameOver:
-        #leafCount += 1
-        return getScore(state)
+        if statsEnabled:
+            stats.leaves += 1
+        return getCachedScore(state)
 
-    if timeOut():
-        return 0
+    clock.check()                                   # Raises SearchTimeout once the time limit has been reached
         
     a, b = alpha, beta
     scoreList = []
     projectedStateList = []
     moveList = getMoveOptions(state)
 
-    for move in moveList:
-        projectedState = GameState()
-        projectedState = makeMove(state, move)
-        scoreList.append(-state.playerToMove * getScore(projectedState))
-        projectedStateList.append(projectedState)
+    if batchOrdering and depthRemaining > 1:        # Score all children with one evaluateMany call (only used for ordering)
+        projectedStateList = [makeMove(state, move) for move in moveList]
+        boards = np.array([projectedState.board for projectedState in projectedStateList])
+        scoreList = (-state.playerToMove * evaluateMany(boards, -state.playerToMove, state.movesRemaining - 1)).tolist()
+    else:
+        for move in moveList:
+            projectedState = GameState()
+            projectedState = makeMove(state, move)
+            scoreList.append(-state.playerToMove * getCachedScore(projectedState))
+            projectedStateList.append(projectedState)
     
-    moveOrder = np.argsort(scoreList)
+    moveOrder = list(np.argsort(scoreList))
     if depthRemaining == 1:
+        if statsEnabled:                            # The children scored for the ordering are the leaves
+            stats.nodes += len(moveList)
+            stats.leaves += len(moveList)
         return -state.playerToMove * scoreList[moveOrder[0]]
 
-    for moveIndex in moveOrder:
+    if depthRemaining >= minTableDepth:
+        (tableScore, tableMove) = transpositionTable.lookup(state.key, depthRemaining, alpha, beta)
+        if statsEnabled:
+            stats.countProbe(tableScore, tableMove)
+        if tableScore is not None:
+            return tableScore
+        if tableMove in moveList:                   # Try the best move from an earlier search first
+            moveOrder.remove(moveList.index(tableMove))
+            moveOrder.insert(0, moveList.index(tableMove))
+    bestMove = None
+
+    for (moveNumber, moveIndex) in enumerate(moveOrder):
         if depthRemaining > 3:
             score = lookAheadWithPresort(projectedStateList[moveIndex], depthRemaining - 1, a, b)    # Find score through MiniMax for current lookAheadDepth
         else:
             score = lookAhead(projectedStateList[moveIndex], depthRemaining - 1, a, b)    # Find score through MiniMax for current lookAheadDepth
 
         if state.playerToMove == 1 and score > a:
-            a = score
+            a, bestMove = score, moveList[moveIndex]
             if a >= beta:
+                if statsEnabled:
+                    stats.countCutoff(moveNumber)
                 break
         elif state.playerToMove == -1 and score < b:
-            b = score
+            b, bestMove = score, moveList[moveIndex]
             if b <= alpha:
+                if statsEnabled:
+                    stats.countCutoff(moveNumber)
                 break
-    if state.playerToMove == 1:
-        return a
-    else:
-        return b
+    score = a if state.playerToMove == 1 else b
+    if depthRemaining >= minTableDepth:
+        transpositionTable.save(state.key, depthRemaining, alpha, beta, score, bestMove)
+    return score
 
+# Look up the distances of all squares to the apple at (xApple, yApple) in the shared knight distance table
 def setAppleDistance(player, xApple, yApple):
     global appleDistance
-    numMissingSquares = boardWidth * boardHeight - 1
-    appleDistance[player, xApple, yApple] = 0
-    currLabel = -1
-
-    while numMissingSquares > 0:
-        currLabel += 1
-        for x in range(boardWidth):
-            for y in range(boardHeight):
-                if appleDistance[player, x, y] == currLabel:
-                    for (dx, dy) in direction:                              # Check all potential move vectors
-                        (xNew, yNew) = (x + dx, y + dy)
-                        if xNew >= 0 and xNew < boardWidth and yNew >= 0 and yNew < boardHeight and appleDistance[player, xNew, yNew] == -1:
-                            appleDistance[player, xNew, yNew] = currLabel + 1
-                            numMissingSquares -= 1
+    appleDistance[player] = knight_distance.getDistanceBoard(boardWidth, boardHeight, xApple, yApple)
+
+# Compute the position score of each square for both players from the evaluation parameters; called by
+# initPlayer, and by tuning.py whenever it changes the parameters
+def initEvaluation():
+    global posScore
+    posScore = np.zeros((2, boardWidth, boardHeight))
+    for x in range(boardWidth):
+        for y in range(boardHeight):
+            edgeDistX = min(x, boardWidth - 1 - x)
+            edgeDistY = min(y, boardHeight - 1 - y)
+            centrality = min(2, edgeDistX) + min(2, edgeDistY)
+            for pl in range(2):
+                posScore[pl, x, y] = centrality
+                if appleDistance[pl, x, y] < 4:
+                    posScore[pl, x, y] += defenseScore[appleDistance[pl, x, y]]
+                if appleDistance[1 - pl, x, y] < 4:
+                    posScore[pl, x, y] += attackScore[appleDistance[1 - pl, x, y]]
 
 # Set global variables and initialize any data structures that the player will need
 def initPlayer(_startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer):
-    global startState, timeLimit, victoryPoints, moveLimit, assignedPlayer, boardWidth, boardHeight, appleDistance, posScore
+    global startState, timeLimit, victoryPoints, moveLimit, assignedPlayer, boardWidth, boardHeight, appleDistance, workerPool
+    global transpositionTable, pieceKeys, evalCache, knightTargets, openingBook, tablebases, proofSearch
     
     startState, timeLimit, victoryPoints, moveLimit, assignedPlayer = _startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer 
     (boardWidth, boardHeight) = startState.board.shape
+    parameters.loadParameters(sys.modules[__name__], parameterFile)
     
     appleDistance = -np.ones((2, boardWidth, boardHeight), dtype=int)
-    posScore = np.zeros((2, boardWidth, boardHeight))
-    defenseScore = [0, 2, 2, 0]
-    attackScore = [0, 6, 3, 1]
     
     for x in range(boardWidth):
         for y in range(boardHeight):
@@ -239,71 +387,159 @@ def initPlayer(_startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPla
             elif startState.board[x, y] == -2:
                 setAppleDistance(1, x, y)  # Fill in appleDistance values for MIN (in [1, :, :])
 
-    for x in range(boardWidth):
-        for y in range(boardHeight):
-            edgeDistX = min(x, boardWidth - 1 - x)
-            edgeDistY = min(y, boardHeight - 1 - y)
-            centrality = min(2, edgeDistX) + min(2, edgeDistY)
-            for pl in range(2):
-                posScore[pl, x, y] = centrality
-                if appleDistance[pl, x, y] < 4:
-                    posScore[pl, x, y] += defenseScore[appleDistance[pl, x, y]]
-                if appleDistance[1 - pl, x, y] < 4:
-                    posScore[pl, x, y] += attackScore[appleDistance[1 - pl, x, y]]
-                    
-    defenseScore = np.zeros(2 * (boardWidth + boardHeight))
+    initEvaluation()
+
+    pieceKeys = zobrist.getPieceKeys(boardWidth, boardHeight)
+    knightTargets = attack_maps.getKnightTargets(boardWidth, boardHeight)
+    transpositionTable = shared_tt.TranspositionTable(transpositionTableSize, transpositionTableName)
+    evalCache = eval_cache.EvalCache(evalCacheSize)
+    openingBook = opening_book.loadBook(openingBookFile)
+    tablebases = tablebase.loadTablebases(boardWidth, boardHeight, tablebase.appleSquareOf(startState.board), tablebaseDirectory)
+    proofSearch = proof_search.ProofSearch(boardWidth, boardHeight) if proofNodeLimit > 0 else None
+
+    if parallelWorkers > 0:
+        workerSettings = {'transpositionTableName': transpositionTable.name}    # Workers attach to our table
+        workerPool = parallel_search.startWorkers(__name__, parallelWorkers, workerSettings, startState, timeLimit, victoryPoints, moveLimit, assignedPlayer)
     
     
 # Free up memory if player used huge data structures 
 def exitPlayer():
-    return
+    global workerPool, transpositionTable
+    parallel_search.stopWorkers(workerPool)
+    workerPool = None
+    transpositionTable.close()
+    transpositionTable = None
+
+# Return a copy of the referee's GameState <state> as this player's GameState, including its Zobrist key
+def rootState(state):
+    newState = GameState()
+    newState.board = np.copy(state.board)
+    newState.playerToMove = state.playerToMove
+    newState.movesRemaining = state.movesRemaining
+    newState.gameOver = state.gameOver
+    newState.points = state.points
+    newState.key = zobrist.boardKey(state.board, state.playerToMove, state.movesRemaining)
+    newState.attacks = attack_maps.initAttackMaps(state.board)
+    return newState
+
+# Search the root moves in <moveList> (in the order given) by iterative deepening until the time limit is reached
+# or a victory/defeat is certain. Return a list of (depth, move, score, complete, elapsed) tuples, one per depth,
+# with the MiniMax score of the best move and whether all moves could be searched at that depth.
+def searchRootMoves(state, moveList):
+    projectedStateList = [makeMove(state, move) for move in moveList]
+    results = []
+
+    # Iterative deepening loop
+    for lookAheadDepth in range(minLookAhead, maxLookAhead + 1):
+        alpha = -9e9
+        beta = 9e9
+        currBestMove = None                         # Best move and score during the current iteration (lookAheadDepth)
+        currBestScore = -9e9 * state.playerToMove
+        clock.startIteration()
+        if statsEnabled:
+            stats.startIteration()
+
+        # Try every possible next move, evaluate it using Minimax, and pick the one with best score
+        try:
+            for moveIndex in range(len(moveList)):
+                score = lookAheadWithPresort(projectedStateList[moveIndex], lookAheadDepth - 1, alpha, beta)    # Find score through MiniMax for current lookAheadDepth
+            
+                if state.playerToMove == 1 and score > alpha:
+                    alpha, currBestMove, currBestScore = score, moveList[moveIndex], score
+                elif state.playerToMove == -1 and score < beta:
+                    beta, currBestMove, currBestScore = score, moveList[moveIndex], score
+        except SearchTimeout:                       # Only the moves searched before the timeout have valid scores
+            results.append((lookAheadDepth, currBestMove, currBestScore, False, clock.elapsed()))
+            if statsEnabled:
+                stats.finishIteration(lookAheadDepth, False)
+            break
+
+        clock.finishIteration()
+        results.append((lookAheadDepth, currBestMove, currBestScore, True, clock.elapsed()))
+        if statsEnabled:
+            stats.finishIteration(lookAheadDepth, True)
+
+        if abs(currBestScore) > victoryScoreThresh:  # Stop computation if certain victory/defeat predicted
+            break
+        if not clock.canFinishNextIteration():      # Don't start a depth that is predicted not to finish in time
+            break
+
+    return results
+
+# True if a forced win from <state> is worth looking for: few horses are left, or the player to move threatens the
+# opponent's apple
+def forcedWinPromising(state):
+    if np.count_nonzero(np.abs(state.board) == 1) <= proofMaxHorses:
+        return True
+    distances = appleDistance[(1 + state.playerToMove) // 2][state.board == state.playerToMove]
+    return bool(np.any((distances >= 0) & (distances <= proofThreatDistance)))
+
+# Look for the shortest forced win from <state> with the proof-number search, within 1, 3, 5, ... <proofMaxPlies> plies
+# (a longer win scores fewer points); return (move, plies) or None if no win is proved within the node and time budget.
+# The proof nodes are counted against the move's node budget (see TimeControl.addNodes)
+def findForcedWin(state):
+    if proofSearch is None or not forcedWinPromising(state):
+        return None
+    nodesLeft = proofNodeLimit if clock.nodeLimit is None else min(proofNodeLimit, int(proofShare * clock.nodeLimit))
+    for maxPlies in range(1, proofMaxPlies + 1, 2):
+        timeLeft = proofShare * timeLimit - clock.elapsed()
+        if nodesLeft <= 0 or timeLeft <= 0:
+            return None
+        (result, move, nodes) = proofSearch.solve(state, nodesLeft, timeLeft, maxPlies)
+        nodesLeft -= nodes
+        clock.addNodes(nodes)
+        if result == proof_search.PROVEN:
+            return (move, maxPlies)
+        if result == proof_search.UNKNOWN:  # Out of budget: longer wins would take even more nodes
+            return None
+    return None
 
 # Compute the next move to be played; keep updating <favoredMove> until computation finished or time limit reached
 def getMove(state):
-    global startTime, leafCount, evalCount
-    
     #print('SCORE: ' + str(getScore(state)))
     #input("")
 
-    startTime = datetime.now()                      # Remember computation start time
+    clock.start(timeLimit)                          # Remember computation start time
+    state = rootState(state)
     moveList = getMoveOptions(state)                # Get the list of possible moves
 
+    if openingBook is not None:                     # Play the book move if this position is in the opening book
+        bookEntry = openingBook.lookup(state.board, state.playerToMove, state.movesRemaining)
+        if bookEntry is not None and bookEntry[0] in moveList:
+            print(name + ': Book move (%d,%d)->(%d,%d), score = %.2f (depth %d)'%(bookEntry[0] + (state.playerToMove * bookEntry[1], bookEntry[2])))
+            return bookEntry[0]
+
+    tablebaseScore = getTablebaseScore(state)
+    if tablebaseScore is not None and tablebaseScore != 0:  # Won or lost within the move limit: play it out exactly
+        scoreList = [state.playerToMove * getCachedScore(makeMove(state, move)) for move in moveList]
+        favoredMove = moveList[int(np.argmax(scoreList))]
+        print(name + ': Tablebase move (%d,%d)->(%d,%d), score = %.2f'%(favoredMove + (tablebaseScore,)))
+        return favoredMove
+
+    forcedWin = findForcedWin(state)
+    if forcedWin is not None and forcedWin[0] in moveList:
+        print(name + ': Proof search move (%d,%d)->(%d,%d), forced win within %d plies'%(forcedWin[0] + (forcedWin[1],)))
+        return forcedWin[0]
+
     scoreList = []
-    projectedStateList = []
     for move in moveList:
-        projectedState = GameState()
         projectedState = makeMove(state, move)
-        scoreList.append(-state.playerToMove * getScore(projectedState))
-        projectedStateList.append(projectedState)
+        scoreList.append(-state.playerToMove * getCachedScore(projectedState))
 
-    moveOrder = np.argsort(scoreList)
+    moveList = [moveList[moveIndex] for moveIndex in np.argsort(scoreList)]
     
-    favoredMove = moveList[moveOrder[0]]            # Just choose first move from the list for now, in case we run out of time 
+    favoredMove = moveList[0]                       # Just choose first move from the list for now, in case we run out of time 
     favoredMoveScore = -9e9    # Use this variable to remember the score for the favored move  
-    
-    # Iterative deepening loop
-    for lookAheadDepth in range(minLookAhead, maxLookAhead + 1):
-        alpha = -9e9
-        beta = 9e9
-        currBestMove = None                         # Best move and absolute score during the current iteration (lookAheadDepth)                     
-        currBestScore = alpha
-        leafCount = 0
-        evalCount = 0
 
-        # Try every possible next move, evaluate it using Minimax, and pick the one with best score
-        for moveIndex in moveOrder:
-            move = moveList[moveIndex]                       
-            score = lookAheadWithPresort(projectedStateList[moveIndex], lookAheadDepth - 1, alpha, beta)    # Find score through MiniMax for current lookAheadDepth
-            
-            if timeOut():
-                break
-            
-            if state.playerToMove == 1 and score > alpha:
-                alpha, currBestMove, currBestScore = score, move, score
-            elif state.playerToMove == -1 and score < beta:
-                beta, currBestMove, currBestScore = score, move, -score
-        
-        if timeOut():
+    if workerPool is not None:
+        results = parallel_search.searchInParallel(workerPool, sys.modules[__name__], state, moveList, victoryScoreThresh)
+    else:
+        results = searchRootMoves(state, moveList)
+
+    for (lookAheadDepth, currBestMove, score, complete, elapsed) in results:
+        currBestScore = state.playerToMove * score  # Absolute score, i.e., from the perspective of the player to move
+
+        if not complete:
             if favoredMoveScore < victoryScoreThresh and currBestScore > victoryScoreThresh:
                 print(name + ': Timeout! Depth %d imcomplete but found winning move!'%(lookAheadDepth)) 
             elif favoredMoveScore < -victoryScoreThresh and currBestScore > -victoryScoreThresh:
@@ -314,12 +550,8 @@ def getMove(state):
         
         favoredMove, favoredMoveScore = currBestMove, currBestScore
         
-        duration = datetime.now() - startTime
-        print(name + ': Depth %d finished at %.4f s, %d evals, %d leaves, favored move (%d,%d)->(%d,%d), score = %.2f'
-            %(lookAheadDepth, duration.seconds + duration.microseconds * 1e-6, evalCount, leafCount, 
+        print(name + ': Depth %d finished at %.4f s, favored move (%d,%d)->(%d,%d), score = %.2f'
+            %(lookAheadDepth, elapsed,
             favoredMove[0], favoredMove[1], favoredMove[2], favoredMove[3], favoredMoveScore))
 
-        if timeOut() or abs(favoredMoveScore) > victoryScoreThresh:   # Stop computation if timeout or certain victory/defeat predicted
-            break
-
     return favoredMove
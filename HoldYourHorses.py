@@ -2,11 +2,10 @@
 # Game tournament interface for the course CS 470/670 at UMass Boston
 # Version 1.2 on 04/15/2021 by Marc Pomplun
 
-import importlib
 import numpy as np
 import random as rnd
 import time
-from datetime import datetime
+import referee
 from graphics import GraphWin, Text, Point, Rectangle, Circle, Line, Polygon, update, color_rgb
 
 # Polygon coordinates for game pieces - awkward implementation but keeps graphics library use to a minimum 
@@ -21,17 +20,23 @@ appleShape = [(52, 36), (60, 34), (67, 34), (75, 38), (81, 45), (83, 51), (83, 6
 
 playerCode = [1, -1]  # Used to translate array indices 0 and 1 to player codes 1 and -1, resp.
 
-boardWidth = 7
+boardSize = None  # Board size '<width>x<height>' with the standard layout (None -> 7x6), see referee.loadStartBoard
+layoutFile = None  # JSON file with the board diagram of the start position (None -> the standard layout)
+startBoard = None  # Board of the start position, loaded in the main script (None -> the standard position)
+openingsFile = None  # Opening suite (see openings.py); tournaments play every opening with both colors (None -> no openings)
+openings = None  # Openings of the suite ({'name': ..., 'moves': ...}), loaded in the main script
+boardWidth = 7  # Board dimensions, set from the start position in the main script
 boardHeight = 6
 squareSize = 100  # Size of each square (pixels)
 textHeight = 50  # Height of the text display at the top of the window (pixels)
 pieceColors = [color_rgb(230, 20, 20), color_rgb(20, 200, 20)]
 squareColors = [color_rgb(40, 40, 210), color_rgb(50, 50, 255)]
-horseCoords = [(0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1)]
-appleCoords = (0, 0)
 
 timeLimit = 3.0  # Limit for computer players' thinking time (seconds)
 timeTolerance = 0.1  # Additional wait time (seconds) before timeout is called
+nodeLimit = None  # Fixed match mode (see referee.py): node budget per move instead of the time limit
+depthLimit = None  # Fixed match mode: search depth instead of the time limit
+randomSeed = None  # Seed for the tournament order and the players' random numbers (None -> not seeded)
 
 victoryPoints = 100  # Number of points for the winner
 moveLimit = 40  # Maximum number of moves
@@ -169,44 +174,28 @@ def makeMove(state, move):
 
 
 # Play a game with players indicated by their indices in playerList. Human player is indicated by index == None.
+# With <openingNumber>, the game starts with the moves of that opening of the suite.
 # Return the points for each player (winner: move advantage over opponent; loser: 0)
-def playGame(indexPlayer1, indexPlayer2):
+def playGame(indexPlayer1, indexPlayer2, openingNumber=None):
     # Create initial game state
-    state = GameState()
-    state.board = np.zeros((boardWidth, boardHeight), dtype=int)
-    state.board[appleCoords] = 2
-    state.board[boardWidth - appleCoords[0] - 1, boardHeight - appleCoords[1] - 1] = -2
-
-    for (x, y) in horseCoords:
-        state.board[x, y] = 1
-        state.board[boardWidth - x - 1, boardHeight - y - 1] = -1
-
-    state.playerToMove = 1
-    state.movesRemaining = moveLimit
-    state.gameOver = False
-    state.points = 0
-    # state = GameState()
-    # state.board = np.zeros((boardHeight, boardWidth), dtype=int)
-    # state.board[appleCoords] = 2
-    # state.board[boardHeight - appleCoords[0] - 1, boardWidth - appleCoords[1] - 1] = -2
-    #
-    # for (x, y) in horseCoords:
-    #     state.board[x, y] = 1
-    #     state.board[boardHeight - x - 1, boardWidth - y - 1] = -1
-    #
-    # state.playerToMove = 1
-    # state.movesRemaining = moveLimit
-    # state.gameOver = False
-    # state.points = 0
+    settings = referee.MatchSettings(timeLimit, nodeLimit, depthLimit, randomSeed, startBoard)
+    state = settings.startState()
+    if openingNumber is not None:
+        for move in openings[openingNumber]['moves']:
+            state = makeMove(state, tuple(move))
 
     # Init players
     moduleIndices = [indexPlayer1, indexPlayer2]
     playerNames = [playerModuleList[indexPlayer1], playerModuleList[indexPlayer2]]
     isHuman = [True, True]
+    if randomSeed is not None:  # Every pairing gets its own seed
+        referee.seedPlayers([getPlayer(index) for index in moduleIndices if index >= 0], randomSeed,
+                            ((openingNumber or 0) * len(playerModuleList) + indexPlayer1) * len(playerModuleList) + indexPlayer2)
 
     for i in range(2):
         if moduleIndices[i] >= 0:
-            players[moduleIndices[i]].initPlayer(state, timeLimit, victoryPoints, moveLimit, playerCode[i])
+            playerTimeLimit = referee.configurePlayer(getPlayer(moduleIndices[i]), settings)
+            getPlayer(moduleIndices[i]).initPlayer(state, playerTimeLimit, victoryPoints, moveLimit, playerCode[i])
             isHuman[i] = False
 
     displayState(state, playerNames, None)
@@ -244,10 +233,10 @@ def playGame(indexPlayer1, indexPlayer2):
                         legalEnd = True
             move = (xStart, yStart, xEnd, yEnd)
         else:  # Computer player
-            startTime = datetime.now()
-            move = players[moduleIndices[playerIndex]].getMove(state)
-            duration = datetime.now() - startTime
-            if duration.seconds + duration.microseconds * 1e-6 >= timeLimit + timeTolerance:
+            startTime = time.perf_counter()
+            move = getPlayer(moduleIndices[playerIndex]).getMove(state)
+            duration = time.perf_counter() - startTime
+            if not settings.fixed() and duration >= timeLimit + timeTolerance:
                 print("Time violation by player " + playerNames[playerIndex])
                 move = moveList[
                     0]  # If computatiomn took too long or illegal move is returned, just pick first move from list
@@ -265,7 +254,7 @@ def playGame(indexPlayer1, indexPlayer2):
 
     for i in range(2):
         if not isHuman[i]:
-            players[moduleIndices[i]].exitPlayer()
+            getPlayer(moduleIndices[i]).exitPlayer()
 
     if state.points > 0:
         return (state.points, 0)
@@ -274,35 +263,50 @@ def playGame(indexPlayer1, indexPlayer2):
     return (victoryPoints // 2, victoryPoints // 2)
 
 
+# Return the module of the computer player with index <index> in playerModuleList, importing it on first use
+def getPlayer(index):
+    if index not in players:
+        players[index] = referee.loadPlayer(playerModuleList[index])
+    return players[index]
+
+
 # Play a game by picking computer players by their index in <players> or putting <None> for a human player
-def singleGame(indexPlayer1, indexPlayer2):
-    (points1, points2) = playGame(indexPlayer1, indexPlayer2)
+def singleGame(indexPlayer1, indexPlayer2, openingNumber=None):
+    (points1, points2) = playGame(indexPlayer1, indexPlayer2, openingNumber)
     playerNames = [playerModuleList[indexPlayer1], playerModuleList[indexPlayer2]]
-    print(playerNames[0] + ' vs. ' + playerNames[1] + ' ' + str(points1) + ' - ' + str(points2))
+    openingName = '' if openingNumber is None else ' (' + openings[openingNumber]['name'] + ')'
+    print(playerNames[0] + ' vs. ' + playerNames[1] + ' ' + str(points1) + ' - ' + str(points2) + openingName)
     time.sleep(2)
     return (points1, points2)
 
 
-# Play a round-robin computer player tournament in which any two players compete against each other twice (to play each side once)
-# Afterwards, rank players by number of victories. If victories are identical, rank by number of points.
+# Play a round-robin computer player tournament in which any two players compete against each other twice (to play each side once),
+# or twice from every opening of the suite. Afterwards, rank players by number of victories. If victories are identical, rank by number of points.
 def computerTournament(playerIndexList):
+    availablePlayers = referee.discoverPlayers()  # Player files in the directory, without importing them
+    for index in playerIndexList:
+        if playerModuleList[index] not in availablePlayers:
+            print(playerModuleList[index] + ' is not available and does not take part')
+    playerIndexList = [index for index in playerIndexList if playerModuleList[index] in availablePlayers]
+
     print('\n\nTournament Participants:\n')
     for i in range(len(playerIndexList)):
         print(playerModuleList[playerIndexList[i]])
     print('\n')
 
     gameList = []
-    for player1 in range(len(playerIndexList)):
-        for player2 in range(len(playerIndexList)):
-            if player1 != player2:
-                gameList.append((player1, player2))
+    for openingNumber in (range(len(openings)) if openings is not None else [None]):
+        for player1 in range(len(playerIndexList)):
+            for player2 in range(len(playerIndexList)):
+                if player1 != player2:
+                    gameList.append((player1, player2, openingNumber))
 
-    rnd.shuffle(gameList)
+    rnd.Random(randomSeed).shuffle(gameList)
     victories = np.zeros(len(playerIndexList), dtype=float)
     points = np.zeros(len(playerIndexList), dtype=int)
 
-    for (player1, player2) in gameList:
-        (points1, points2) = singleGame(playerIndexList[player1], playerIndexList[player2])
+    for (player1, player2, openingNumber) in gameList:
+        (points1, points2) = singleGame(playerIndexList[player1], playerIndexList[player2], openingNumber)
         points[player1] += points1
         points[player2] += points2
         if points1 > points2:
@@ -330,21 +334,25 @@ def computerTournament(playerIndexList):
     time.sleep(6)
 
 
-# Main script
-win = GraphWin("Hold Your Horses!", boardWidth * squareSize, textHeight + boardHeight * squareSize, autoflush=False)
-win.setBackground("black")
+# Main script (guarded, so that worker processes started by 'spawn' do not run it again)
+if __name__ == '__main__':
+    startBoard = referee.loadStartBoard(boardSize, layoutFile)
+    if openingsFile is not None:
+        (suiteBoard, openings) = referee.loadOpeningSuite(openingsFile)
+        startBoard = suiteBoard if suiteBoard is not None else startBoard
+    (boardWidth, boardHeight) = referee.MatchSettings(startBoard=startBoard).startState().board.shape
+    win = GraphWin("Hold Your Horses!", boardWidth * squareSize, textHeight + boardHeight * squareSize, autoflush=False)
+    win.setBackground("black")
 
-playerModuleList = ['Knight_Rider', 'Brain_Fog', 'Dark_Knight', 'suncharn_pipithkul', 'Wenyue_Wu',
-                    'Human Player']  # Names of player files (without '.py' extension) and human player
+    playerModuleList = ['Knight_Rider', 'Brain_Fog', 'Dark_Knight', 'suncharn_pipithkul', 'Wenyue_Wu',
+                        'Monte_Knight', 'Human Player']  # Names of player files (without '.py' extension) and human player
 
-players = []  # Import player modules
-for player in playerModuleList[:-1]:
-    players.append(importlib.import_module(player))
+    players = {}  # Player modules by index in playerModuleList, imported when they first play (see getPlayer)
 
-# singleGame(0, 3)  # Play single game (computer vs. computer or human vs. computer). -1 indicates human player
-# singleGame(-1, 0)       # Play single game (computer vs. computer or human vs. computer). -1 indicates human player
-# computerTournament([0, 1, 2])  # Play a tournament with any number of computer players (numbers refer to position in playerModuleList)
-computerTournament([2, 4])  # Play a tournament with any number of computer players (numbers refer to position in playerModuleList)
+    # singleGame(0, 3)  # Play single game (computer vs. computer or human vs. computer). -1 indicates human player
+    # singleGame(-1, 0)       # Play single game (computer vs. computer or human vs. computer). -1 indicates human player
+    # computerTournament([0, 1, 2])  # Play a tournament with any number of computer players (numbers refer to position in playerModuleList)
+    computerTournament([2, 4])  # Play a tournament with any number of computer players (numbers refer to position in playerModuleList)
 
 
-win.close()
+    win.close()
@@ -1,7 +1,8 @@
 # Player Knight_Rider
 
 import numpy as np
-from datetime import datetime
+from search_stats import SearchStats
+from time_control import TimeControl, SearchTimeout
 
 
 class GameState(object):
@@ -18,7 +19,7 @@ moveLimit = 0  # Maximum number of moves
 # Otherwise, number of remaining moves is added to winner's score.
 startState = None  # Initial state, provided to the initPlayer function
 assignedPlayer = 0  # 1 -> player MAX; -1 -> player MIN (in terms of the MiniMax algorithm)
-startTime = 0  # Remember the time stamp when move computation started
+clock = TimeControl()  # Keeps track of the thinking time and aborts the search when it runs out
 
 # Local parameters for player's algorithm. Can be modified, deleted, or extended in any conceivable way
 pointMultiplier = 10  # Muliplier for winner's points in getScore function
@@ -26,6 +27,9 @@ pieceValue = 20  # Score value of a single piece in getScore function
 victoryScoreThresh = 1000  # An absolute score exceeds this value if and only if one player has won
 minLookAhead = 2  # Initial search depth for iterative deepening
 maxLookAhead = 20  # Maximum search depth
+statsEnabled = False  # Count nodes, leaves, and evaluations in <stats> (see search_stats.py)
+stats = SearchStats('Knight_Rider')  # Search statistics of the current iteration and records of the finished ones
+appleCoords = [(0, 0), (0, 0)]  # Squares of MAX's and MIN's apple in the start position, set in initPlayer
 
 
 # Compute list of legal moves for a given GameState and the player moving next
@@ -75,27 +79,25 @@ def getScore(state):
     for x in range(boardWidth):  # Search board for any pieces
         for y in range(boardHeight):
             if state.board[x, y] == 1:
-                appleDistance = (boardWidth - 1) - x + (boardHeight - 1) - y
+                appleDistance = abs(appleCoords[1][0] - x) + abs(appleCoords[1][1] - y)
                 score += pieceValue - appleDistance
             elif state.board[x, y] == -1:
-                appleDistance = x + y
+                appleDistance = abs(appleCoords[0][0] - x) + abs(appleCoords[0][1] - y)
                 score -= pieceValue - appleDistance
     return score
 
 
-# Check whether time limit has been reached
-def timeOut():
-    duration = datetime.now() - startTime
-    return duration.seconds + duration.microseconds * 1e-6 >= timeLimit
-
-
 # Use the minimax algorithm to look ahead <depthRemaining> moves and return the resulting score
 def lookAhead(state, depthRemaining):
+    if statsEnabled:
+        stats.nodes += 1
     if depthRemaining == 0 or state.gameOver:
+        if statsEnabled:
+            stats.leaves += 1
+            stats.evals += 1
         return getScore(state)
 
-    if timeOut():
-        return 0
+    clock.check()  # Raises SearchTimeout once the time limit has been reached
 
     bestScore = -9e9 * state.playerToMove
 
@@ -111,9 +113,10 @@ def lookAhead(state, depthRemaining):
 
 # Set global variables and initialize any data structures that the player will need
 def initPlayer(_startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer):
-    global startState, timeLimit, victoryPoints, moveLimit, assignedPlayer, boardWidth, boardHeight
+    global startState, timeLimit, victoryPoints, moveLimit, assignedPlayer, boardWidth, boardHeight, appleCoords
     startState, timeLimit, victoryPoints, moveLimit, assignedPlayer = _startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer
     (boardWidth, boardHeight) = startState.board.shape
+    appleCoords = [tuple(int(c) for c in np.argwhere(startState.board == apple)[0]) for apple in (2, -2)]
     # TODO: Put any initialization code here
 
 
@@ -124,8 +127,7 @@ def exitPlayer():
 
 # Compute the next move to be played; keep updating <favoredMove> until computation finished or time limit reached
 def getMove(state):
-    global startTime
-    startTime = datetime.now()  # Remember computation start time
+    clock.start(timeLimit)  # Remember computation start time
     moveList = getMoveOptions(state)  # Get the list of possible moves
     favoredMove = moveList[0]  # Just choose first move from the list for now, in case we run out of time
     favoredMoveScore = -9e9 * state.playerToMove  # Use this variable to remember the score for the favored move
@@ -134,31 +136,37 @@ def getMove(state):
     for lookAheadDepth in range(minLookAhead, maxLookAhead + 1):
         currBestMove = None  # Best move and score currently found during the current iteration (lookAheadDepth)
         currBestScore = -9e9 * state.playerToMove
+        clock.startIteration()
+        if statsEnabled:
+            stats.startIteration()
 
         # Try every possible next move, evaluate it using Minimax, and pick the one with best score
-        for move in moveList:
-            projectedState = makeMove(state, move)
-            score = lookAhead(projectedState,
-                              lookAheadDepth - 1)  # Find score through MiniMax for current lookAheadDepth
-
-            if timeOut():
-                break
-
-            if (state.playerToMove == 1 and score > currBestScore) or (
-                    state.playerToMove == -1 and score < currBestScore):
-                currBestMove, currBestScore = move, score  # Found new best move during this iteration
-
-        if not timeOut():  # Pick the move from the last lookahead depth as new favorite, unless the lookahead was incomplete
-            favoredMove, favoredMoveScore = currBestMove, currBestScore
-            duration = datetime.now() - startTime
-            print('Knight_Rider: Depth %d finished at %.4f s, favored move (%d,%d)->(%d,%d), score = %.2f'
-                  % (lookAheadDepth, duration.seconds + duration.microseconds * 1e-6,
-                     favoredMove[0], favoredMove[1], favoredMove[2], favoredMove[3], favoredMoveScore))
-        else:
+        try:
+            for move in moveList:
+                projectedState = makeMove(state, move)
+                score = lookAhead(projectedState,
+                                  lookAheadDepth - 1)  # Find score through MiniMax for current lookAheadDepth
+
+                if (state.playerToMove == 1 and score > currBestScore) or (
+                        state.playerToMove == -1 and score < currBestScore):
+                    currBestMove, currBestScore = move, score  # Found new best move during this iteration
+        except SearchTimeout:  # The lookahead was incomplete, so keep the move from the last lookahead depth
             print('Knight_Rider: Timeout!')
+            if statsEnabled:
+                stats.finishIteration(lookAheadDepth, False)
+            break
 
-        if timeOut() or abs(
-                favoredMoveScore) > victoryScoreThresh:  # Stop computation if timeout or certain victory/defeat predicted
+        clock.finishIteration()
+        if statsEnabled:
+            stats.finishIteration(lookAheadDepth, True)
+        favoredMove, favoredMoveScore = currBestMove, currBestScore
+        print('Knight_Rider: Depth %d finished at %.4f s, favored move (%d,%d)->(%d,%d), score = %.2f'
+              % (lookAheadDepth, clock.elapsed(),
+                 favoredMove[0], favoredMove[1], favoredMove[2], favoredMove[3], favoredMoveScore))
+
+        if abs(favoredMoveScore) > victoryScoreThresh:  # Stop computation if certain victory/defeat predicted
+            break
+        if not clock.canFinishNextIteration():  # Don't start a depth that is predicted not to finish in time
             break
 
     return favoredMove
@@ -0,0 +1,227 @@
+# Player Monte_Knight
+
+import math
+import random
+import numpy as np
+from search_stats import SearchStats
+from time_control import TimeControl
+
+class GameState(object):
+    __slots__ = ['board', 'playerToMove', 'gameOver', 'movesRemaining', 'points']
+
+# Global variables
+boardWidth = 0            # Board dimensions
+boardHeight = 0
+timeLimit = 0.0           # Maximum thinking time (in seconds) for each move
+victoryPoints = 0         # Number of points for the winner
+moveLimit = 0             # Maximum number of moves
+startState = None         # Initial state, provided to the initPlayer function
+assignedPlayer = 0        # 1 -> player MAX; -1 -> player MIN (in terms of the MiniMax algorithm)
+clock = TimeControl()     # Keeps track of the thinking time
+
+# Local parameters for player's algorithm. Can be modified, deleted, or extended in any conceivable way
+name = 'Monte_Knight'
+exploration = 1.4         # Weight of the exploration term in the UCT formula (sqrt(2) in the textbook version)
+playoutPolicy = 'random'  # 'random' -> uniformly random legal moves (Brain_Fog's policy); 'guided' -> also take the opponent's apple when possible
+drawValue = 0.5           # Value of a drawn playout (a win counts 1, a loss 0)
+rng = random.Random()     # Random numbers for the playouts
+simulationCount = 0       # Number of simulations during the last move computation
+targets = None            # For each square index (x * boardHeight + y) and direction, the target square index (-1 if off the board)
+appleAttackers = None     # For MAX and MIN (index 0 or 1), the squares from which a horse can capture the opponent's apple
+cells = None              # Board of the current simulation as a flat list (reused, so playouts do not allocate boards)
+horses = None             # Squares of MAX's and MIN's horses in the current simulation (reused as well)
+statsEnabled = False      # Make a record (see search_stats.py) of every move computation, with simulations as nodes
+stats = SearchStats(name) # Tree nodes and playouts of the current move computation
+
+direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]    # Possible (dx, dy) moves
+
+# A node of the search tree; <player> made <move> (a pair of square indices) to reach it, and <wins> sums the
+# simulation results from that player's point of view
+class Node(object):
+    __slots__ = ['move', 'parent', 'player', 'children', 'untriedMoves', 'visits', 'wins', 'result']
+
+    def __init__(self, move, parent, player, result, untriedMoves):
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = []
+        self.untriedMoves = untriedMoves
+        self.visits = 0
+        self.wins = 0.0
+        self.result = result      # Winner (1, -1, or 0 for a draw) if the game is over in this node, otherwise None
+
+# Compute list of legal moves, as pairs (start square, end square), for the simulation board and the player moving next
+def getMoveOptions(playerToMove):
+    moves = []
+    for start in horses[(1 - playerToMove) // 2]:
+        for target in targets[8 * start:8 * start + 8]:
+            if target >= 0 and cells[target] != playerToMove and cells[target] != 2 * playerToMove:
+                moves.append((start, target))
+    return moves
+
+# Execute <move> on the simulation board; return the winner (1, -1, or 0 for a draw) if the game is over, otherwise None
+def makeMove(move, playerToMove, movesRemaining):
+    (start, target) = move
+    captured = cells[target]
+    cells[start] = 0
+    cells[target] = playerToMove
+    ownHorses = horses[(1 - playerToMove) // 2]
+    ownHorses[ownHorses.index(start)] = target
+    if captured == -2 * playerToMove:       # Opponent's apple captured
+        return playerToMove
+    if captured == -playerToMove:
+        opponentHorses = horses[(1 + playerToMove) // 2]
+        opponentHorses.remove(target)
+        if len(opponentHorses) == 0:        # Opponent's last horse captured
+            return playerToMove
+    if movesRemaining == 1:                 # No more moves left, the game is drawn
+        return 0
+    return None
+
+# Play random moves on the simulation board until the game is over; return the winner (1, -1, or 0 for a draw).
+# Moves are drawn uniformly by picking a random (horse, direction) pair until it is a legal move.
+def playout(playerToMove, movesRemaining):
+    random = rng.random
+    guided = playoutPolicy == 'guided'
+    while True:
+        sideIndex = (1 - playerToMove) // 2
+        ownHorses = horses[sideIndex]
+        if guided:
+            for start in ownHorses:
+                if start in appleAttackers[sideIndex]:
+                    return playerToMove
+
+        numSlots = 8 * len(ownHorses)
+        for attempt in range(64):
+            slot = int(random() * numSlots)
+            start = ownHorses[slot >> 3]
+            target = targets[8 * start + (slot & 7)]
+            if target >= 0 and cells[target] != playerToMove and cells[target] != 2 * playerToMove:
+                break
+        else:                               # Unlucky or no legal move at all: pick from the full list
+            moves = getMoveOptions(playerToMove)
+            if len(moves) == 0:
+                return 0
+            (start, target) = moves[int(random() * len(moves))]
+
+        captured = cells[target]            # Same as makeMove, inlined because this is the innermost loop
+        cells[start] = 0
+        cells[target] = playerToMove
+        ownHorses[ownHorses.index(start)] = target
+        if captured == -2 * playerToMove:
+            return playerToMove
+        if captured == -playerToMove:
+            opponentHorses = horses[1 - sideIndex]
+            opponentHorses.remove(target)
+            if len(opponentHorses) == 0:
+                return playerToMove
+        if movesRemaining == 1:
+            return 0
+        playerToMove = -playerToMove
+        movesRemaining -= 1
+
+# Return the child of <node> with the highest UCT value
+def selectChild(node):
+    logVisits = math.log(node.visits)
+    bestChild, bestValue = None, -1.0
+    for child in node.children:
+        value = child.wins / child.visits + exploration * math.sqrt(logVisits / child.visits)
+        if value > bestValue:
+            bestChild, bestValue = child, value
+    return bestChild
+
+# Run one simulation from the root: select a path through the tree, expand one node, play out, and update the statistics
+def simulate(root, rootCells, rootHorses, playerToMove, movesRemaining):
+    cells[:] = rootCells                    # Reset the simulation board in place
+    horses[0][:] = rootHorses[0]
+    horses[1][:] = rootHorses[1]
+
+    node = root
+    while node.result is None and len(node.untriedMoves) == 0 and len(node.children) > 0:
+        node = selectChild(node)
+        makeMove(node.move, playerToMove, movesRemaining)
+        playerToMove = -playerToMove
+        movesRemaining -= 1
+
+    if node.result is None and len(node.untriedMoves) > 0:
+        move = node.untriedMoves.pop(int(rng.random() * len(node.untriedMoves)))
+        result = makeMove(move, playerToMove, movesRemaining)
+        child = Node(move, node, playerToMove, result, getMoveOptions(-playerToMove) if result is None else [])
+        if statsEnabled:
+            stats.leaves += 1
+        node.children.append(child)
+        node = child
+        playerToMove = -playerToMove
+        movesRemaining -= 1
+
+    winner = node.result
+    if winner is None:
+        winner = playout(playerToMove, movesRemaining) if len(node.untriedMoves) > 0 else 0
+
+    while node is not None:                 # Backpropagation
+        node.visits += 1
+        if winner == node.player:
+            node.wins += 1.0
+        elif winner == 0:
+            node.wins += drawValue
+        node = node.parent
+
+# Set global variables and initialize any data structures that the player will need
+def initPlayer(_startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer):
+    global startState, timeLimit, victoryPoints, moveLimit, assignedPlayer, boardWidth, boardHeight
+    global targets, appleAttackers, cells, horses
+
+    startState, timeLimit, victoryPoints, moveLimit, assignedPlayer = _startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer
+    (boardWidth, boardHeight) = startState.board.shape
+
+    targets = []
+    for x in range(boardWidth):
+        for y in range(boardHeight):
+            for (dx, dy) in direction:
+                if 0 <= x + dx < boardWidth and 0 <= y + dy < boardHeight:
+                    targets.append((x + dx) * boardHeight + y + dy)
+                else:
+                    targets.append(-1)
+
+    appleAttackers = [set(), set()]
+    for (playerIndex, apple) in enumerate([-2, 2]):     # MAX attacks MIN's apple and vice versa
+        for appleSquare in np.flatnonzero(startState.board.ravel() == apple).tolist():
+            appleAttackers[playerIndex].update(start for start in range(boardWidth * boardHeight)
+                                               if appleSquare in targets[8 * start:8 * start + 8])
+
+    cells = [0] * (boardWidth * boardHeight)
+    horses = [[], []]
+
+# Free up memory if player used huge data structures
+def exitPlayer():
+    return
+
+# Compute the next move to be played by Monte Carlo tree search (UCT) until the time limit is reached (or, if the
+# clock has a node budget, until that many simulations have been run)
+def getMove(state):
+    global simulationCount
+    clock.start(timeLimit)
+
+    rootCells = state.board.ravel().tolist()
+    rootHorses = [[square for (square, piece) in enumerate(rootCells) if piece == player] for player in (1, -1)]
+    cells[:] = rootCells
+    horses[0][:], horses[1][:] = rootHorses[0], rootHorses[1]
+    root = Node(None, None, -state.playerToMove, None, getMoveOptions(state.playerToMove))
+
+    simulationCount = 0
+    if statsEnabled:
+        stats.startIteration()
+    while simulationCount == 0 or not (clock.timeOut() or simulationCount == clock.nodeLimit):
+        simulate(root, rootCells, rootHorses, state.playerToMove, state.movesRemaining)
+        simulationCount += 1
+
+    bestChild = max(root.children, key=lambda child: child.visits)
+    if statsEnabled:                        # Nodes are simulations, leaves the nodes added to the tree
+        stats.nodes = simulationCount
+        stats.finishIteration(1, True, winRate=bestChild.wins / bestChild.visits)
+    (start, target) = bestChild.move
+    favoredMove = (start // boardHeight, start % boardHeight, target // boardHeight, target % boardHeight)
+    print(name + ': %d simulations in %.4f s, favored move (%d,%d)->(%d,%d), visits = %d, win rate = %.2f'
+          %(simulationCount, clock.elapsed(), favoredMove[0], favoredMove[1], favoredMove[2], favoredMove[3],
+            bestChild.visits, bestChild.wins / bestChild.visits))
+    return favoredMove
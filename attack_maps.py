@@ -0,0 +1,75 @@
+# Attack maps shared by the searching players
+# For each side (index 0 for MAX, 1 for MIN), a flat list holds for every square (index x * boardHeight + y) the
+# number of that side's horses that can jump to it, i.e. that attack an opponent's piece or protect an own piece
+# on that square. The maps are updated incrementally when a horse moves or is captured, so that evaluation terms
+# about attacked and protected horses or threatened apples become lookups.
+# For batched evaluation, countAttacksMany computes the same counts for many boards at once as NumPy arrays.
+
+import numpy as np
+
+direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]  # Possible (dx, dy) moves
+
+knightTargetTables = {}  # (boardWidth, boardHeight) -> list of target square indices for each square
+
+
+# Return for each square index the indices of all squares a horse can jump to from there
+def getKnightTargets(boardWidth, boardHeight):
+    if (boardWidth, boardHeight) not in knightTargetTables:
+        targets = []
+        for x in range(boardWidth):
+            for y in range(boardHeight):
+                targets.append([(x + dx) * boardHeight + y + dy for (dx, dy) in direction
+                                if 0 <= x + dx < boardWidth and 0 <= y + dy < boardHeight])
+        knightTargetTables[(boardWidth, boardHeight)] = targets
+    return knightTargetTables[(boardWidth, boardHeight)]
+
+
+# Compute both sides' attack maps for <board> from scratch
+def initAttackMaps(board):
+    (boardWidth, boardHeight) = board.shape
+    targets = getKnightTargets(boardWidth, boardHeight)
+    attacks = [[0] * (boardWidth * boardHeight), [0] * (boardWidth * boardHeight)]
+    for x in range(boardWidth):
+        for y in range(boardHeight):
+            if board[x, y] == 1 or board[x, y] == -1:
+                sideAttacks = attacks[(1 - board[x, y]) // 2]
+                for target in targets[x * boardHeight + y]:
+                    sideAttacks[target] += 1
+    return attacks
+
+
+# Return the attack maps after <piece> (1 or -1) makes <move>, capturing <captured> (0 for an empty square).
+# Only the lists that change are copied; <attacks> itself is left untouched.
+def moveAttackMaps(attacks, targets, boardHeight, move, piece, captured):
+    (xStart, yStart, xEnd, yEnd) = move
+    sideIndex = (1 - piece) // 2
+    endTargets = targets[xEnd * boardHeight + yEnd]
+
+    newAttacks = [None, None]
+    sideAttacks = attacks[sideIndex][:]
+    for target in targets[xStart * boardHeight + yStart]:
+        sideAttacks[target] -= 1
+    for target in endTargets:
+        sideAttacks[target] += 1
+    newAttacks[sideIndex] = sideAttacks
+
+    if captured == -piece:  # The opponent's captured horse no longer attacks anything
+        opponentAttacks = attacks[1 - sideIndex][:]
+        for target in endTargets:
+            opponentAttacks[target] -= 1
+        newAttacks[1 - sideIndex] = opponentAttacks
+    else:
+        newAttacks[1 - sideIndex] = attacks[1 - sideIndex]
+    return newAttacks
+
+
+# Count the attacks for many boards at once: <horses> is an (N, 2, W, H) boolean array of MAX's and MIN's horses;
+# return an (N, 2, W, H) array with the number of each side's horses that can jump to each square
+def countAttacksMany(horses):
+    (boardWidth, boardHeight) = horses.shape[2:]
+    counts = np.zeros(horses.shape, dtype=np.int8)
+    for (dx, dy) in direction:
+        (xStart, yStart) = (slice(max(0, -dx), boardWidth - max(0, dx)), slice(max(0, -dy), boardHeight - max(0, dy)))
+        (xEnd, yEnd) = (slice(max(0, dx), boardWidth + min(0, dx)), slice(max(0, dy), boardHeight + min(0, dy)))
+        counts[:, :, xEnd, yEnd] += horses[:, :, xStart, yStart]
+    return counts
@@ -0,0 +1,130 @@
+# Batch game simulator for many boards at once
+# Holds N positions as an (N, W, H) int8 array plus per-board player to move, remaining moves, and game results,
+# and implements the rules with whole-array NumPy operations instead of Python loops over squares: legal horse
+# moves for all boards are found by shifting the board by each knight vector and masking, one move per board is
+# applied by fancy indexing, and captured apples, lost horses, and the move limit are detected for all boards
+# together. Used for random playouts, self-play data generation, and perft counts to cross-check move generators.
+
+import numpy as np
+import game_rules
+
+direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]  # Possible (dx, dy) moves
+directionX = np.array([dx for (dx, dy) in direction])
+directionY = np.array([dy for (dx, dy) in direction])
+
+
+class BoardBatch(object):
+    __slots__ = ['boards', 'playerToMove', 'movesRemaining', 'gameOver', 'points', 'victoryPoints']
+
+    # Create a batch from an (N, W, H) array of boards and the player to move and remaining moves for each board
+    def __init__(self, boards, playerToMove, movesRemaining, victoryPoints=None):
+        self.boards = np.asarray(boards, dtype=np.int8)
+        numBoards = self.boards.shape[0]
+        self.playerToMove = np.broadcast_to(np.asarray(playerToMove, dtype=np.int8), (numBoards,)).copy()
+        self.movesRemaining = np.broadcast_to(np.asarray(movesRemaining, dtype=np.int16), (numBoards,)).copy()
+        self.gameOver = np.zeros(numBoards, dtype=bool)
+        self.points = np.zeros(numBoards, dtype=np.int32)
+        self.victoryPoints = game_rules.victoryPoints if victoryPoints is None else victoryPoints
+
+    # Return a batch of <numBoards> copies of the GameState <state>
+    @staticmethod
+    def fromState(state, numBoards, victoryPoints=None):
+        boards = np.repeat(state.board[None, :, :], numBoards, axis=0)
+        return BoardBatch(boards, state.playerToMove, state.movesRemaining, victoryPoints)
+
+    def __len__(self):
+        return self.boards.shape[0]
+
+    # Return board <index> as a GameState of game_rules
+    def getState(self, index):
+        state = game_rules.makeState(self.boards[index], int(self.playerToMove[index]), int(self.movesRemaining[index]))
+        state.gameOver, state.points = bool(self.gameOver[index]), int(self.points[index])
+        return state
+
+    # Return an (N, 8, W, H) boolean array telling for each board whether the horse of the player to move on (x, y)
+    # can move in direction d (all False for finished games); only for the boards <boardIndices> if given
+    def getMoveMask(self, boardIndices=None):
+        (boards, player, gameOver) = (self.boards, self.playerToMove, self.gameOver)
+        if boardIndices is not None:
+            (boards, player, gameOver) = (boards[boardIndices], player[boardIndices], gameOver[boardIndices])
+        (numBoards, boardWidth, boardHeight) = boards.shape
+        player = player[:, None, None]
+        own = boards == player
+        blocked = own | (boards == 2 * player)          # Squares the player's horses cannot move to
+        mask = np.zeros((numBoards, len(direction), boardWidth, boardHeight), dtype=bool)
+        for (d, (dx, dy)) in enumerate(direction):
+            (xStart, yStart) = (slice(max(0, -dx), boardWidth - max(0, dx)), slice(max(0, -dy), boardHeight - max(0, dy)))
+            (xEnd, yEnd) = (slice(max(0, dx), boardWidth + min(0, dx)), slice(max(0, dy), boardHeight + min(0, dy)))
+            mask[:, d, xStart, yStart] = own[:, xStart, yStart] & ~blocked[:, xEnd, yEnd]
+        mask[gameOver] = False
+        return mask
+
+    # Number of legal moves on each board
+    def countMoves(self):
+        return self.getMoveMask().sum(axis=(1, 2, 3))
+
+    # Convert indices into the flattened (8, W, H) move mask into an (n, 4) array of moves (xStart, yStart, xEnd, yEnd)
+    def movesFromIndices(self, indices):
+        (boardWidth, boardHeight) = self.boards.shape[1:]
+        (d, x, y) = np.unravel_index(indices, (len(direction), boardWidth, boardHeight))
+        return np.stack([x, y, x + directionX[d], y + directionY[d]], axis=1)
+
+    # Pick a uniformly random legal move for every unfinished board; the other boards, and boards without a legal
+    # move, get the move (-1, -1, -1, -1)
+    def randomMoves(self, rng):
+        moves = np.full((len(self), 4), -1, dtype=np.int64)
+        active = np.flatnonzero(~self.gameOver)
+        mask = self.getMoveMask(active).reshape((len(active), -1))
+        # Legal moves get random numbers in [1, 2), illegal ones 0, so the largest one is a uniformly random legal move
+        choice = np.argmax(mask * (rng.random(mask.shape, dtype=np.float32) + 1.0), axis=1)
+        hasMove = mask.any(axis=1)
+        moves[active[hasMove]] = self.movesFromIndices(choice[hasMove])
+        return moves
+
+    # Execute one move per board (an (N, 4) array); boards whose game is over or whose move is (-1, ...) are skipped.
+    # A board on which the player to move has no legal move is scored as a draw.
+    def makeMoves(self, moves):
+        moves = np.asarray(moves)
+        stalled = ~self.gameOver & (moves[:, 0] < 0)
+        self.gameOver[stalled] = True
+        active = np.flatnonzero(~self.gameOver)
+        if len(active) == 0:
+            return
+
+        (xStart, yStart, xEnd, yEnd) = moves[active].T
+        player = self.playerToMove[active]
+        captured = self.boards[active, xEnd, yEnd]
+        self.boards[active, xStart, yStart] = 0
+        self.boards[active, xEnd, yEnd] = player
+        self.playerToMove[active] = -player
+        self.movesRemaining[active] -= 1
+
+        opponentLeft = (self.boards[active] == -player[:, None, None]).any(axis=(1, 2))
+        won = (captured == -2 * player) | ~opponentLeft   # Opponent lost the apple or all horses
+        self.gameOver[active] = won | (self.movesRemaining[active] == 0)
+        self.points[active[won]] = player[won].astype(np.int32) * (self.victoryPoints + self.movesRemaining[active[won]])
+
+    # Play uniformly random moves on all boards until every game is over; return the points of all games
+    def playRandom(self, rng):
+        while not self.gameOver.all():
+            self.makeMoves(self.randomMoves(rng))
+        return self.points
+
+    # Return a batch of all positions reachable by one move from the unfinished boards, and for each of them the
+    # index of the board it came from
+    def expand(self):
+        (parentIndex, d, x, y) = np.nonzero(self.getMoveMask())
+        children = BoardBatch(self.boards[parentIndex], self.playerToMove[parentIndex],
+                              self.movesRemaining[parentIndex], self.victoryPoints)
+        children.makeMoves(np.stack([x, y, x + directionX[d], y + directionY[d]], axis=1))
+        return (children, parentIndex)
+
+
+# Count the positions reached after 1 ... <depth> moves from GameState <state> (finished games are not expanded)
+def perft(state, depth):
+    batch = BoardBatch.fromState(state, 1)
+    counts = []
+    for _ in range(depth):
+        (batch, _) = batch.expand()
+        counts.append(len(batch))
+    return counts
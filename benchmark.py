@@ -0,0 +1,180 @@
+# Benchmark of the searching players on a fixed set of positions
+#     python benchmark.py --depth 4 --runs 3 --save benchmark.json
+#     python benchmark.py --depth 4 --runs 3 --baseline benchmark.json
+# Every player searches every position of benchmark_positions.json (openings, middlegames, and apple races, as board
+# diagrams, see game_rules.boardFromDiagram) to a fixed depth or node budget without a time limit, with the opening
+# book, the tablebases, and the proof-number search switched off. The search statistics (see search_stats.py) give
+# the time to reach each depth, the nodes, and nodes per second. Each search is repeated <runs> times with a fresh player, and the median
+# and the spread over the runs are reported. The results can be saved and compared against a saved baseline: the
+# comparison prints the time ratio for each position, flags positions where the search itself changed (different
+# node count or move), and exits with status 1 if a player got slower by more than <tolerance> on average.
+# With --boards 7x6 10x10 12x8, the start positions of these board sizes are searched as well, to see how the
+# searches scale with the size of the board.
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+import game_rules
+import referee
+
+benchmarkPlayers = ['Knight_Rider', 'Dark_Knight', 'suncharn_pipithkul']  # Players with search statistics
+positionFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_positions.json')
+
+
+# Return the positions of a benchmark file as a list of (name, category, GameState)
+def loadPositions(fileName):
+    with open(fileName) as file:
+        positions = json.load(file)
+    return [(position['name'], position['category'],
+             game_rules.makeState(game_rules.boardFromDiagram(position['board']), position['playerToMove'],
+                                  position['movesRemaining'])) for position in positions]
+
+
+# Return the start positions of the board sizes <boardSizes> ('<width>x<height>') as (name, category, GameState)
+def boardSizePositions(boardSizes):
+    return [('start-' + boardSize, 'board size', game_rules.makeState(referee.loadStartBoard(boardSize), 1, game_rules.moveLimit))
+            for boardSize in boardSizes]
+
+
+# Initialize player <module> for a search of <state> to a fixed depth or node budget, with search statistics on;
+# <startState> is the start position of the game (None -> the standard layout on the board of <state>)
+def preparePlayer(module, state, depth, nodeLimit, startState=None):
+    if nodeLimit is None and not hasattr(module, 'maxLookAhead'):
+        raise ValueError('%s has no search depth; give it a node budget' % module.__name__)
+    module.openingBookFile = None
+    module.parallelWorkers = 0
+    (boardWidth, boardHeight) = state.board.shape
+    with contextlib.redirect_stdout(io.StringIO()):
+        module.initPlayer(startState or game_rules.initialState(boardWidth, boardHeight), float('inf'),
+                          game_rules.victoryPoints, game_rules.moveLimit, state.playerToMove)
+    module.tablebases = None
+    module.proofSearch = None
+    if hasattr(module, 'maxLookAhead'):  # Monte_Knight only has the node (simulation) budget
+        module.minLookAhead = min(module.minLookAhead, depth)
+        module.maxLookAhead = depth
+    module.clock.nodeLimit = nodeLimit
+    module.statsEnabled = True
+    module.stats.printRecords = False
+    module.stats.fileName = None
+    module.stats.records = []
+
+
+# Search <state> once with a freshly initialized player; return the chosen move, the total time, and the records of
+# the search statistics
+def searchOnce(module, state, depth, nodeLimit):
+    preparePlayer(module, state, depth, nodeLimit)
+    startTime = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        move = module.getMove(state)
+    elapsed = time.perf_counter() - startTime
+    module.exitPlayer()
+    return (tuple(int(c) for c in move), elapsed, module.stats.records)
+
+
+# Run <runs> searches of one position; return the summary of the results
+def benchmarkPosition(module, state, depth, nodeLimit, runs):
+    times = []
+    depthTimes = {}
+    for run in range(runs):
+        (move, elapsed, records) = searchOnce(module, state, depth, nodeLimit)
+        times.append(elapsed)
+        iterationTime = 0.0
+        for record in records:
+            iterationTime += record['time']
+            if record['complete']:
+                depthTimes.setdefault(record['depth'], []).append(iterationTime)
+        if run == 0:
+            (firstMove, nodes) = (move, sum(record['nodes'] for record in records))
+            reachedDepth = max([record['depth'] for record in records if record['complete']], default=0)
+        elif move != firstMove:
+            print('  Warning: run %d chose a different move' % run)
+
+    medianTime = statistics.median(times)
+    return {'move': list(firstMove), 'depth': reachedDepth, 'nodes': nodes, 'time': medianTime, 'minTime': min(times),
+            'spread': (max(times) - min(times)) / medianTime if medianTime > 0 else 0.0,
+            'nps': nodes / medianTime if medianTime > 0 else None,
+            'timeToDepth': {str(d): statistics.median(t) for (d, t) in sorted(depthTimes.items())}}
+
+
+def runBenchmark(playerNames, positions, depth, nodeLimit, runs):
+    results = {}
+    for playerName in playerNames:
+        module = importlib.import_module(playerName)
+        results[playerName] = {}
+        print('%s:' % playerName)
+        for (positionName, category, state) in positions:
+            result = benchmarkPosition(module, state, depth, nodeLimit, runs)
+            results[playerName][positionName] = result
+            print('  %-16s %-10s depth %2d  %8.3f s (min %.3f, spread %3.0f%%)  %8d nodes  %6.1f knodes/s  move (%d,%d)->(%d,%d)'
+                  % ((positionName, category, result['depth'], result['time'], result['minTime'], 100.0 * result['spread'],
+                      result['nodes'], (result['nps'] or 0.0) / 1000.0) + tuple(result['move'])))
+            print('  %-27s time to depth: %s' % ('', ', '.join('%s: %.3f s' % item for item in result['timeToDepth'].items())))
+    return results
+
+
+# Print the comparison with a baseline; return the names of the players that got slower than the tolerance allows
+def compareResults(results, baseline, tolerance):
+    slowerPlayers = []
+    for (playerName, playerResults) in results.items():
+        if playerName not in baseline:
+            continue
+        print('%s compared to the baseline:' % playerName)
+        ratios = []
+        for (positionName, result) in playerResults.items():
+            old = baseline[playerName].get(positionName)
+            if old is None:
+                continue
+            ratio = result['time'] / old['time']
+            ratios.append(ratio)
+            notes = []
+            if result['nodes'] != old['nodes']:
+                notes.append('nodes %d -> %d' % (old['nodes'], result['nodes']))
+            if result['move'] != old['move']:
+                notes.append('move (%d,%d)->(%d,%d) -> (%d,%d)->(%d,%d)' % tuple(old['move'] + result['move']))
+            print('  %-16s %8.3f s -> %8.3f s  x%.3f  %s' % (positionName, old['time'], result['time'], ratio, '; '.join(notes)))
+        if len(ratios) > 0:
+            meanRatio = float(np.exp(np.mean(np.log(ratios))))
+            print('  Geometric mean time ratio: %.3f' % meanRatio)
+            if meanRatio > 1.0 + tolerance:
+                slowerPlayers.append(playerName)
+    return slowerPlayers
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the players\' searches on fixed positions.')
+    parser.add_argument('--players', nargs='+', default=benchmarkPlayers, help='player modules to benchmark')
+    parser.add_argument('--positions', default=positionFile, help='position file')
+    parser.add_argument('--boards', nargs='*', default=[], help='board sizes <width>x<height> whose start positions '
+                                                                 'are searched as well')
+    parser.add_argument('--depth', type=int, default=4, help='search depth')
+    parser.add_argument('--nodes', type=int, default=None, help='node budget instead of a fixed depth')
+    parser.add_argument('--runs', type=int, default=3, help='number of runs per position')
+    parser.add_argument('--save', default=None, help='file to save the results to')
+    parser.add_argument('--baseline', default=None, help='saved results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='allowed average slowdown against the baseline')
+    args = parser.parse_args()
+
+    settings = {'depth': args.depth if args.nodes is None else 20, 'nodes': args.nodes, 'positions': args.positions}
+    if len(args.boards) > 0:
+        settings['boards'] = args.boards
+    positions = loadPositions(args.positions) + boardSizePositions(args.boards)
+    results = runBenchmark(args.players, positions, settings['depth'], args.nodes, args.runs)
+    if args.save is not None:
+        with open(args.save, 'w') as file:
+            json.dump({'settings': settings, 'results': results}, file, indent=1)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['settings'] != settings:
+            print('Warning: the baseline was run with different settings: %s' % baseline['settings'])
+        slowerPlayers = compareResults(results, baseline['results'], args.tolerance)
+        if len(slowerPlayers) > 0:
+            print('Slower than the baseline: %s' % ', '.join(slowerPlayers))
+            sys.exit(1)
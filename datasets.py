@@ -0,0 +1,89 @@
+# Datasets of recorded positions
+# A dataset is a directory with one raw binary file per field (<field>.bin, little-endian, one record per position)
+# and a manifest.json that records the board size, the number of complete positions and games, and the type of
+# each field. Writers append to the files and rewrite the manifest only after the data has been flushed, so a
+# dataset can be extended later, and a reader never sees half-written positions.
+# Readers memory-map the files with np.memmap, so tools can work through millions of positions without loading
+# them into memory. Positions beyond the count in the manifest (e.g. from an interrupted writer) are ignored.
+#
+# Fields: boards (W, H) int8, playerToMove int8, movesRemaining int16, score float32 (search score from MAX's
+# perspective, NaN if unknown), result int8 (game result for MAX: 1, 0, or -1), game int32 (game number).
+
+import json
+import os
+import numpy as np
+
+manifestName = 'manifest.json'
+fieldTypes = {'boards': '<i1', 'playerToMove': '<i1', 'movesRemaining': '<i2', 'score': '<f4', 'result': '<i1',
+              'game': '<i4'}
+
+
+def readManifest(directory):
+    with open(os.path.join(directory, manifestName)) as file:
+        return json.load(file)
+
+
+# Return the fields of the dataset in <directory> as a dictionary of read-only memory-mapped arrays
+def openDataset(directory):
+    manifest = readManifest(directory)
+    numPositions = manifest['numPositions']
+    fields = {}
+    for (field, dtype) in fieldTypes.items():
+        shape = (numPositions, manifest['boardWidth'], manifest['boardHeight']) if field == 'boards' else (numPositions,)
+        if numPositions == 0:
+            fields[field] = np.zeros(shape, dtype=dtype)
+        else:
+            fields[field] = np.memmap(os.path.join(directory, field + '.bin'), dtype=dtype, mode='r', shape=shape)
+    return fields
+
+
+# Appends games to the dataset in <directory>; creates it if it does not exist yet
+class DatasetWriter(object):
+    __slots__ = ['directory', 'manifest', 'files']
+
+    def __init__(self, directory, boardWidth, boardHeight):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, manifestName)):
+            self.manifest = readManifest(directory)
+            if (self.manifest['boardWidth'], self.manifest['boardHeight']) != (boardWidth, boardHeight):
+                raise ValueError('%s holds positions of a %dx%d board' % (directory, self.manifest['boardWidth'],
+                                                                          self.manifest['boardHeight']))
+        else:
+            self.manifest = {'boardWidth': boardWidth, 'boardHeight': boardHeight, 'numPositions': 0, 'numGames': 0,
+                             'fields': fieldTypes}
+
+        self.files = {}
+        for (field, dtype) in fieldTypes.items():
+            recordSize = np.dtype(dtype).itemsize * (boardWidth * boardHeight if field == 'boards' else 1)
+            file = open(os.path.join(directory, field + '.bin'), 'ab')
+            file.truncate(self.manifest['numPositions'] * recordSize)  # Drop positions of an interrupted writer
+            self.files[field] = file
+
+    # Append the positions of one game (boards as an (n, W, H) array, the other fields as arrays of length n) and
+    # its result for MAX; return the game number
+    def addGame(self, boards, playerToMove, movesRemaining, score, result):
+        gameNumber = self.manifest['numGames']
+        numPositions = len(playerToMove)
+        fields = {'boards': boards, 'playerToMove': playerToMove, 'movesRemaining': movesRemaining, 'score': score,
+                  'result': np.full(numPositions, result), 'game': np.full(numPositions, gameNumber)}
+        for (field, dtype) in fieldTypes.items():
+            self.files[field].write(np.ascontiguousarray(fields[field], dtype=dtype).tobytes())
+        self.manifest['numPositions'] += numPositions
+        self.manifest['numGames'] += 1
+        return gameNumber
+
+    # Write the appended positions to disk, then the manifest that makes them visible to readers
+    def flush(self):
+        for file in self.files.values():
+            file.flush()
+            os.fsync(file.fileno())
+        tempFileName = os.path.join(self.directory, manifestName + '.tmp')
+        with open(tempFileName, 'w') as file:
+            json.dump(self.manifest, file, indent=1)
+        os.replace(tempFileName, os.path.join(self.directory, manifestName))
+
+    def close(self):
+        self.flush()
+        for file in self.files.values():
+            file.close()
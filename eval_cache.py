@@ -0,0 +1,40 @@
+# Evaluation cache shared by the searching players
+# A direct-mapped table from Zobrist position keys to static evaluation scores, separate from the transposition
+# table, so that evaluating a position that was already evaluated (e.g. once for move ordering and again as a
+# leaf) costs a single lookup. It is kept in plain Python lists, which are faster to index from Python code
+# than NumPy arrays, and counts its own probes and hits.
+
+class EvalCache(object):
+    __slots__ = ['size', 'mask', 'keys', 'scores', 'probes', 'hits']
+
+    # Create a cache with <size> entries (rounded up to a power of 2)
+    def __init__(self, size=2 ** 16):
+        self.size = 1 << max(0, int(size) - 1).bit_length()
+        self.mask = self.size - 1
+        self.clear()
+
+    # Remove all entries and reset the counters
+    def clear(self):
+        self.keys = [-1] * self.size  # Zobrist keys are never negative, so -1 marks an empty entry
+        self.scores = [0] * self.size
+        self.probes = 0
+        self.hits = 0
+
+    # Return the cached score for position <key>, or None if it is not in the cache
+    def lookup(self, key):
+        self.probes += 1
+        index = key & self.mask
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+        return None
+
+    # Remember <score> for position <key>, replacing whatever was stored in its entry
+    def store(self, key, score):
+        index = key & self.mask
+        self.keys[index] = key
+        self.scores[index] = score
+
+    # Fraction of lookups that found the position
+    def hitRate(self):
+        return self.hits / max(1, self.probes)
@@ -0,0 +1,109 @@
+# Hold Your Horses game rules without any graphics
+# The same rules, start layout and scoring as in HoldYourHorses.py, for tools that play or analyze games offline
+# (opening book, tablebases, benchmarks, tournaments) and therefore must not open the game window.
+
+import numpy as np
+
+playerCode = [1, -1]  # Used to translate array indices 0 and 1 to player codes 1 and -1, resp.
+
+boardWidth = 7
+boardHeight = 6
+horseCoords = [(0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1)]
+appleCoords = (0, 0)
+
+timeLimit = 3.0  # Limit for computer players' thinking time (seconds)
+victoryPoints = 100  # Number of points for the winner
+moveLimit = 40  # Maximum number of moves
+
+
+class GameState(object):
+    __slots__ = ['board', 'playerToMove', 'gameOver', 'movesRemaining', 'points']
+
+
+# Create the start position: MAX's pieces as given, MIN's pieces rotated by 180 degrees
+def initialState(width=None, height=None, horses=None, apple=None, moves=None):
+    (width, height) = (width or boardWidth, height or boardHeight)
+    state = GameState()
+    state.board = np.zeros((width, height), dtype=int)
+    (xApple, yApple) = apple or appleCoords
+    state.board[xApple, yApple] = 2
+    state.board[width - xApple - 1, height - yApple - 1] = -2
+
+    for (x, y) in horses or horseCoords:
+        state.board[x, y] = 1
+        state.board[width - x - 1, height - y - 1] = -1
+
+    state.playerToMove = 1
+    state.movesRemaining = moves or moveLimit
+    state.gameOver = False
+    state.points = 0
+    return state
+
+
+# Compute list of legal moves for a given GameState and the player moving next
+def getMoveOptions(state):
+    direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]  # Possible (dx, dy) moves
+    (width, height) = state.board.shape
+    moves = []
+    for xStart in range(width):  # Search board for player's pieces
+        for yStart in range(height):
+            if state.board[xStart, yStart] == state.playerToMove:  # Found a piece!
+                for (dx, dy) in direction:  # Check all potential move vectors
+                    (xEnd, yEnd) = (xStart + dx, yStart + dy)
+                    if xEnd >= 0 and xEnd < width and yEnd >= 0 and yEnd < height and not (
+                            state.board[xEnd, yEnd] in [state.playerToMove, 2 * state.playerToMove]):
+                        moves.append((xStart, yStart, xEnd, yEnd))  # Square is empty or occupied by the opponent
+    return moves
+
+
+# For a given GameState and move to be executed, return the GameState that results from the move
+def makeMove(state, move):
+    (xStart, yStart, xEnd, yEnd) = move
+    newState = GameState()
+    newState.board = np.copy(state.board)  # The new board configuration is a copy of the current one except that...
+    newState.board[xStart, yStart] = 0  # ... we remove the moving piece from its start position...
+    newState.board[xEnd, yEnd] = state.playerToMove  # ... and place it at the end position
+    newState.playerToMove = -state.playerToMove  # After this move, it will be the opponent's turn
+    newState.movesRemaining = state.movesRemaining - 1
+    newState.gameOver = False
+    newState.points = 0
+
+    if state.board[xEnd, yEnd] == -2 * state.playerToMove or not (-state.playerToMove in newState.board):
+        newState.gameOver = True  # If the opponent lost the apple or all horses, the game is over...
+        newState.points = state.playerToMove * (
+                victoryPoints + newState.movesRemaining)  # ... and more remaining moves result in more points
+    elif newState.movesRemaining == 0:  # Otherwise, if there are no more moves left, the game is drawn
+        newState.gameOver = True
+
+    return newState
+
+
+# Characters for the pieces in board diagrams (one string per row y, one character per column x)
+pieceSymbols = {0: '.', 1: 'H', 2: 'A', -1: 'h', -2: 'a'}
+
+
+# Return the diagram of a board as a list of strings
+def boardToDiagram(board):
+    (width, height) = board.shape
+    return [''.join(pieceSymbols[int(board[x, y])] for x in range(width)) for y in range(height)]
+
+
+# Return the board described by a diagram
+def boardFromDiagram(rows):
+    pieces = {symbol: piece for (piece, symbol) in pieceSymbols.items()}
+    board = np.zeros((len(rows[0]), len(rows)), dtype=int)
+    for (y, row) in enumerate(rows):
+        for (x, symbol) in enumerate(row):
+            board[x, y] = pieces[symbol]
+    return board
+
+
+# Return a GameState for a given board, player to move and number of remaining moves
+def makeState(board, playerToMove, movesRemaining):
+    state = GameState()
+    state.board = np.array(board, dtype=int)
+    state.playerToMove = playerToMove
+    state.movesRemaining = movesRemaining
+    state.gameOver = False
+    state.points = 0
+    return state
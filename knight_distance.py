@@ -0,0 +1,75 @@
+# Knight distances shared by all players and evaluators
+# For a board of a given size, the number of horse moves between every pair of squares is computed once by a
+# breadth-first search that advances the frontiers of all start squares at the same time (one matrix product per
+# distance level). The result is a single (W*H, W*H) NumPy array, where square (x, y) has index x * H + y and
+# unreachable squares have distance -1. It is memoized per board size and can be saved to a cache file.
+
+import os
+import numpy as np
+
+direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]  # Possible (dx, dy) moves
+
+cacheDirectory = None  # If set, distance matrices are loaded from and saved to .npy files in this directory
+distanceTables = {}    # (boardWidth, boardHeight) -> distance matrix
+
+
+# Return the (W*H, W*H) boolean matrix telling whether a horse can jump from one square to another
+def getKnightMoveMatrix(boardWidth, boardHeight):
+    (x, y) = np.divmod(np.arange(boardWidth * boardHeight), boardHeight)
+    moves = np.zeros((boardWidth * boardHeight, boardWidth * boardHeight), dtype=bool)
+    for (dx, dy) in direction:
+        onBoard = (x + dx >= 0) & (x + dx < boardWidth) & (y + dy >= 0) & (y + dy < boardHeight)
+        moves[np.nonzero(onBoard)[0], ((x + dx) * boardHeight + y + dy)[onBoard]] = True
+    return moves
+
+
+# Compute the distance matrix with a BFS from all squares at once
+def computeKnightDistances(boardWidth, boardHeight):
+    numSquares = boardWidth * boardHeight
+    moves = getKnightMoveMatrix(boardWidth, boardHeight).astype(np.int32)
+    distances = -np.ones((numSquares, numSquares), dtype=np.int16)
+    frontier = np.eye(numSquares, dtype=bool)
+    visited = frontier.copy()
+    distance = 0
+    while frontier.any():
+        distances[frontier] = distance
+        frontier = ((frontier.astype(np.int32) @ moves) > 0) & ~visited
+        visited |= frontier
+        distance += 1
+    return distances
+
+
+def cacheFileName(boardWidth, boardHeight):
+    return os.path.join(cacheDirectory, 'knight_distance_%dx%d.npy' % (boardWidth, boardHeight))
+
+
+# Return the (read-only) distance matrix for a board of the given size, computing it only once per process
+def getKnightDistances(boardWidth, boardHeight):
+    if (boardWidth, boardHeight) in distanceTables:
+        return distanceTables[(boardWidth, boardHeight)]
+
+    distances = None
+    if cacheDirectory is not None and os.path.exists(cacheFileName(boardWidth, boardHeight)):
+        distances = np.load(cacheFileName(boardWidth, boardHeight))
+    if distances is None or distances.shape != (boardWidth * boardHeight, boardWidth * boardHeight):
+        distances = computeKnightDistances(boardWidth, boardHeight)
+        if cacheDirectory is not None:
+            saveKnightDistances(cacheFileName(boardWidth, boardHeight), distances)
+
+    distances.flags.writeable = False  # The matrix is shared by all players in this process
+    distanceTables[(boardWidth, boardHeight)] = distances
+    return distances
+
+
+# Save a distance matrix, writing to a temporary file first so that readers never see a partial file
+def saveKnightDistances(fileName, distances):
+    os.makedirs(os.path.dirname(os.path.abspath(fileName)), exist_ok=True)
+    tempFileName = fileName + '.%d.tmp' % os.getpid()
+    with open(tempFileName, 'wb') as file:
+        np.save(file, distances)
+    os.replace(tempFileName, fileName)
+
+
+# Return the (W, H) board of distances from square (x, y) to every square
+def getDistanceBoard(boardWidth, boardHeight, x, y):
+    return getKnightDistances(boardWidth, boardHeight)[x * boardHeight + y].reshape((boardWidth, boardHeight))
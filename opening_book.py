@@ -0,0 +1,164 @@
+# Opening book for the fixed start position
+# The book is built offline by deep fixed-depth searches of a player module over the first few plies:
+#     python opening_book.py --engine Dark_Knight --plies 4 --depth 6 --workers 4
+# For each side, it covers the positions reached when that side follows the book and the opponent plays any move.
+# Every finished search is appended to a journal file right away, so an interrupted build resumes where it
+# stopped. The finished book is a single .npy array of entries sorted by position key, which players
+# memory-map at initPlayer and search with a binary search in getMove. Each engine has its own book, written to
+# <engine>_book.npy by default, which is where the player looks for it.
+
+import argparse
+import importlib
+import multiprocessing
+import multiprocessing.util
+import os
+import numpy as np
+import game_rules
+import zobrist
+
+entryType = np.dtype([('key', '<u8'), ('move', 'u1', (4,)), ('score', '<f4'), ('depth', 'u1')])
+
+
+class OpeningBook(object):
+    __slots__ = ['entries', 'keys', 'probes', 'hits']
+
+    def __init__(self, fileName):
+        self.entries = np.load(fileName, mmap_mode='r')
+        self.keys = self.entries['key']
+        self.probes = self.hits = 0
+
+    # Return (move, score, depth) for a position, or None if it is not in the book
+    def lookup(self, board, playerToMove, movesRemaining):
+        self.probes += 1
+        key = zobrist.boardKey(board, playerToMove, movesRemaining)
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+        if index == len(self.keys) or int(self.keys[index]) != key:
+            return None
+        self.hits += 1
+        entry = self.entries[index]
+        return (tuple(int(c) for c in entry['move']), float(entry['score']), int(entry['depth']))
+
+
+# Return the book stored in <fileName>, or None if there is no such file
+def loadBook(fileName):
+    if fileName is None or not os.path.exists(fileName):
+        return None
+    return OpeningBook(fileName)
+
+
+engineModule = None  # Player module that does the searches (in each builder process)
+
+
+def initBuilder(engineName):
+    global engineModule
+    engineModule = importlib.import_module(engineName)
+    engineModule.parallelWorkers = 0
+    engineModule.openingBookFile = None  # Never answer from an older book
+    engineModule.initPlayer(game_rules.initialState(), float('inf'), game_rules.victoryPoints,
+                            game_rules.moveLimit, 1)
+    multiprocessing.util.Finalize(None, engineModule.exitPlayer, exitpriority=10)
+
+
+# Search one position to a fixed depth with the engine; return a book entry as a tuple
+def searchPosition(job):
+    (board, playerToMove, movesRemaining, depth) = job
+    if engineModule.assignedPlayer != playerToMove:  # Some engines evaluate differently for MAX and MIN
+        engineModule.exitPlayer()
+        engineModule.initPlayer(game_rules.initialState(), float('inf'), game_rules.victoryPoints,
+                                game_rules.moveLimit, playerToMove)
+
+    state = engineModule.rootState(game_rules.makeState(board, playerToMove, movesRemaining))
+    engineModule.minLookAhead = min(engineModule.minLookAhead, depth)
+    engineModule.maxLookAhead = depth
+    engineModule.clock.start(float('inf'))
+    results = engineModule.searchRootMoves(state, engineModule.getMoveOptions(state))
+    (reachedDepth, move, score, _, _) = [result for result in results if result[3]][-1]
+    return (zobrist.boardKey(state.board, playerToMove, movesRemaining), move, score, reachedDepth)
+
+
+# Read all entries of a (possibly interrupted) journal into a dictionary key -> entry
+def readJournal(journalName):
+    if not os.path.exists(journalName):
+        return {}
+    data = open(journalName, 'rb').read()
+    entries = np.frombuffer(data[:len(data) - len(data) % entryType.itemsize], dtype=entryType)
+    return {int(entry['key']): entry for entry in entries}
+
+
+# Write the sorted book, through a temporary file so that players never load a partial book
+def writeBook(fileName, entries):
+    book = np.array(list(entries.values()), dtype=entryType)
+    book = book[np.argsort(book['key'])]
+    tempFileName = fileName + '.tmp'
+    with open(tempFileName, 'wb') as file:
+        np.save(file, book)
+    os.replace(tempFileName, fileName)
+    return len(book)
+
+
+def uniqueStates(states):
+    unique = {}
+    for state in states:
+        if not state.gameOver:
+            unique.setdefault(zobrist.boardKey(state.board, state.playerToMove, state.movesRemaining), state)
+    return list(unique.values())
+
+
+def allChildren(state):
+    return [game_rules.makeMove(state, move) for move in game_rules.getMoveOptions(state)]
+
+
+def buildBook(engineName, plies, depth, numWorkers, fileName):
+    journalName = fileName + '.journal'
+    entries = readJournal(journalName)
+    if len(entries) > 0:
+        print('Resuming with %d positions from %s' % (len(entries), journalName))
+
+    if numWorkers > 0:
+        pool = multiprocessing.Pool(numWorkers, initializer=initBuilder, initargs=(engineName,))
+        mapper = pool.imap_unordered
+    else:
+        initBuilder(engineName)
+        pool, mapper = None, map
+
+    # levels[ply] holds the positions after <ply> moves in which the side to move follows the book
+    levels = [[game_rules.initialState()]]
+    levels.append(uniqueStates(allChildren(levels[0][0])))
+    for ply in range(plies):
+        if ply >= 2:  # Book move in each position two plies earlier, then every reply of the opponent
+            nextStates = []
+            for state in levels[ply - 2]:
+                entry = entries[zobrist.boardKey(state.board, state.playerToMove, state.movesRemaining)]
+                bookState = game_rules.makeMove(state, tuple(int(c) for c in entry['move']))
+                if not bookState.gameOver:
+                    nextStates += allChildren(bookState)
+            levels.append(uniqueStates(nextStates))
+
+        jobs = [(state.board, state.playerToMove, state.movesRemaining, depth) for state in levels[ply]
+                if zobrist.boardKey(state.board, state.playerToMove, state.movesRemaining) not in entries]
+        print('Ply %d: %d positions, %d to search' % (ply, len(levels[ply]), len(jobs)))
+
+        with open(journalName, 'ab') as journal:
+            for (count, (key, move, score, reachedDepth)) in enumerate(mapper(searchPosition, jobs)):
+                entry = np.array([(key, move, score, reachedDepth)], dtype=entryType)
+                journal.write(entry.tobytes())
+                journal.flush()
+                entries[key] = entry[0]
+                if (count + 1) % 50 == 0:
+                    print('  %d / %d' % (count + 1, len(jobs)))
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+    print('Book with %d positions written to %s' % (writeBook(fileName, entries), fileName))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an opening book from the start position.')
+    parser.add_argument('--engine', default='Dark_Knight', help='player module that searches the positions')
+    parser.add_argument('--plies', type=int, default=4, help='number of plies covered by the book')
+    parser.add_argument('--depth', type=int, default=6, help='search depth for each book position')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--output', default=None, help='book file to write (default: <engine>_book.npy)')
+    args = parser.parse_args()
+    buildBook(args.engine, args.plies, args.depth, args.workers, args.output or args.engine + '_book.npy')
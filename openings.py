@@ -0,0 +1,143 @@
+# Opening suites for tournaments
+#     python openings.py random --count 50 --plies 4 --seed 1 --output openings.json
+#     python openings.py book --count 20 --plies 4 --seed 1 --balance Dark_Knight --max-score 150 --output book_openings.json
+# With deterministic players (e.g. in the fixed mode of referee.py), a pairing plays the same game from the same
+# start position every time. An opening suite is a file of short move sequences from the start position; the referee
+# and the tournament play every opening twice for each pair of players, once with each player as MAX, so every game
+# adds information and luck in the opening evens out.
+# <random> openings are uniformly random legal moves. <book> openings follow the opening book (see opening_book.py)
+# for one side, which plays its book moves, while the other side plays random moves. With --balance, every opening
+# is searched by an engine (fixed depth, from MAX's perspective) and lopsided openings are dropped.
+# The suite is a JSON file: {"board": diagram of the start position or null for the standard one,
+# "openings": [{"name": ..., "moves": [[xStart, yStart, xEnd, yEnd], ...], "score": ...}, ...]}.
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import random
+import benchmark
+import game_rules
+import opening_book
+import referee
+import zobrist
+
+
+# Write a suite file (one opening per line), to be read by referee.loadOpeningSuite
+def saveSuite(fileName, startBoard, openings):
+    with open(fileName, 'w') as file:
+        file.write('{"board": %s,\n "openings": [\n' % json.dumps(None if startBoard is None else game_rules.boardToDiagram(startBoard)))
+        file.write(',\n'.join('  ' + json.dumps(opening) for opening in openings))
+        file.write('\n]}\n')
+
+
+# Return the state after playing <moves> from <state>
+def playOpening(state, moves):
+    for move in moves:
+        state = game_rules.makeMove(state, tuple(move))
+    return state
+
+
+# Play <count> openings of <plies> moves, each move chosen by <chooseMove(state, ply, openingNumber)>; openings that
+# end the game or reach the position of an earlier opening are replaced by new ones
+def collectOpenings(startState, count, plies, chooseMove, name, maxAttempts=100):
+    openings = []
+    seen = set()
+    attempts = 0
+    while len(openings) < count and attempts < maxAttempts * count:
+        (state, moves) = (startState, [])
+        for ply in range(plies):
+            move = chooseMove(state, ply, len(openings))
+            moves.append([int(c) for c in move])
+            state = game_rules.makeMove(state, tuple(move))
+            if state.gameOver:
+                break
+        attempts += 1
+        key = zobrist.boardKey(state.board, state.playerToMove, state.movesRemaining)
+        if not state.gameOver and key not in seen:
+            seen.add(key)
+            openings.append({'name': '%s-%d' % (name, len(openings)), 'moves': moves})
+    if len(openings) < count:
+        print('Only %d different openings of %d plies found' % (len(openings), plies))
+    return openings
+
+
+def randomOpenings(startState, count, plies, rng):
+    return collectOpenings(startState, count, plies, lambda state, ply, number: rng.choice(game_rules.getMoveOptions(state)),
+                           'random')
+
+
+# Openings in which one side (MAX in even, MIN in odd openings) plays its book moves and the other side random moves
+def bookOpenings(startState, book, count, plies, rng):
+    def chooseMove(state, ply, number):
+        bookSide = game_rules.playerCode[number % 2]
+        entry = book.lookup(state.board, state.playerToMove, state.movesRemaining) if state.playerToMove == bookSide else None
+        if entry is None:  # The opponent's move, or a position the book does not cover
+            return rng.choice(game_rules.getMoveOptions(state))
+        return entry[0]
+
+    return collectOpenings(startState, count, plies, chooseMove, 'book')
+
+
+# Import player <engineName> for balancing; only players with rootState and searchRootMoves (Dark_Knight,
+# suncharn_pipithkul) report the scores of their root moves
+def loadEngine(engineName):
+    module = importlib.import_module(engineName)
+    if not all(hasattr(module, function) for function in ('rootState', 'searchRootMoves')):
+        raise ValueError('%s cannot balance openings: it has no rootState and searchRootMoves' % engineName)
+    return module
+
+
+# Search the position after every opening with player <module> to <depth>; store the score (MAX's perspective)
+# in the openings, and return the openings whose score is at most <maxScore> in absolute value
+def balanceOpenings(startState, openings, module, depth, maxScore):
+    balanced = []
+    for opening in openings:
+        state = playOpening(startState, opening['moves'])
+        benchmark.preparePlayer(module, state, depth, None, startState)
+        module.clock.start(float('inf'))
+        ownState = module.rootState(state)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = module.searchRootMoves(ownState, module.getMoveOptions(ownState))
+        module.exitPlayer()
+        opening['score'] = float([result for result in results if result[3]][-1][2])
+        if abs(opening['score']) <= maxScore:
+            balanced.append(opening)
+    print('%d of %d openings within a score of %g' % (len(balanced), len(openings), maxScore))
+    return balanced
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an opening suite for tournaments.')
+    parser.add_argument('kind', choices=['random', 'book'], help='random openings, or openings from the opening book')
+    parser.add_argument('--count', type=int, default=50, help='number of openings')
+    parser.add_argument('--plies', type=int, default=4, help='number of moves per opening')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the random moves')
+    parser.add_argument('--book', default='Dark_Knight_book.npy', help='opening book file (book openings, see opening_book.py)')
+    parser.add_argument('--balance', default=None, help='player module that searches the openings to drop lopsided ones')
+    parser.add_argument('--depth', type=int, default=4, help='search depth for --balance')
+    parser.add_argument('--max-score', type=float, default=150.0, help='largest absolute score kept by --balance')
+    parser.add_argument('--board', default=None, help='board size <width>x<height> with the standard layout')
+    parser.add_argument('--layout', default=None, help='JSON file with the board diagram of the start position')
+    parser.add_argument('--output', default='openings.json', help='suite file to write')
+    args = parser.parse_args()
+
+    try:
+        engine = loadEngine(args.balance) if args.balance is not None else None
+    except (ImportError, ValueError) as error:
+        parser.error(str(error))
+    startBoard = referee.loadStartBoard(args.board, args.layout)
+    startState = referee.MatchSettings(startBoard=startBoard).startState()
+    rng = random.Random(args.seed)
+    if args.kind == 'random':
+        openings = randomOpenings(startState, args.count, args.plies, rng)
+    else:
+        book = opening_book.loadBook(args.book)
+        if book is None:
+            parser.error('no opening book %s; build one with opening_book.py' % args.book)
+        openings = bookOpenings(startState, book, args.count, args.plies, rng)
+    if args.balance is not None:
+        openings = balanceOpenings(startState, openings, engine, args.depth, args.max_score)
+    saveSuite(args.output, startBoard, openings)
+    print('%d openings written to %s' % (len(openings), args.output))
@@ -0,0 +1,117 @@
+# Root-parallel search shared by the searching players
+# The root moves are dealt round-robin to the player's own process and a pool of worker processes.
+# Every process runs its own iterative deepening over its share of the moves until the common deadline,
+# and the per-depth results are merged so that the referee still receives a single move in time.
+#
+# A player that wants to use this module provides
+#   searchRootMoves(state, moveList) -> list of (depth, move, score, complete, elapsed) tuples,
+# one per searched depth, where score is the MiniMax score (higher is better for MAX) of the best move
+# in moveList and complete tells whether all of moveList was searched at that depth,
+#   rootState(state) -> the player's own GameState for a state received from the referee,
+# as well as module-level GameState, clock, and parallelWorkers variables.
+
+import importlib
+import multiprocessing
+import time
+
+workerModule = None  # Player module imported by a worker process
+
+
+# Game states are sent as plain tuples so that workers never need to unpickle the referee's GameState class
+def packState(state):
+    return (state.board, state.playerToMove, state.movesRemaining)
+
+
+def unpackState(module, packedState):
+    state = module.GameState()
+    (state.board, state.playerToMove, state.movesRemaining) = packedState
+    state.gameOver = False
+    state.points = 0
+    return state
+
+
+def initWorker(moduleName, workerSettings, packedStartState, timeLimit, victoryPoints, moveLimit, assignedPlayer):
+    global workerModule
+    workerModule = importlib.import_module(moduleName)
+    workerModule.parallelWorkers = 0  # Workers search on their own; they never start workers themselves
+    for (variable, value) in workerSettings.items():  # E.g. the name of a shared table to attach to
+        setattr(workerModule, variable, value)
+    workerModule.initPlayer(unpackState(workerModule, packedStartState), timeLimit, victoryPoints, moveLimit,
+                            assignedPlayer)
+
+
+# Run in a worker: search <moveList> until the wall-clock time <deadline> (time.time() based, since the
+# perf_counter of different processes cannot be compared on every platform)
+def searchJob(packedState, moveList, deadline):
+    workerModule.clock.start(max(0.0, deadline - time.time()))
+    return workerModule.searchRootMoves(workerModule.rootState(unpackState(workerModule, packedState)), moveList)
+
+
+# Start <numWorkers> worker processes that run player <moduleName>; call from the player's initPlayer.
+# <workerSettings> maps names of module-level variables to the values they get in the workers.
+def startWorkers(moduleName, numWorkers, workerSettings, startState, timeLimit, victoryPoints, moveLimit,
+                 assignedPlayer):
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')  # Fast startup, and the referee script is not re-run
+    else:
+        context = multiprocessing.get_context('spawn')
+    return context.Pool(numWorkers, initializer=initWorker,
+                        initargs=(moduleName, workerSettings, packState(startState), timeLimit, victoryPoints,
+                                  moveLimit, assignedPlayer))
+
+
+# Shut down the worker processes; call from the player's exitPlayer
+def stopWorkers(pool):
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+# Merge the per-process result lists into one list of (depth, move, score, complete, elapsed) tuples.
+# A depth is complete if every process completed it. A process that stopped early because it found a
+# certain victory or defeat (|score| > victoryScoreThresh) counts as complete for all deeper depths.
+def mergeResults(sliceResults, playerToMove, victoryScoreThresh):
+    maxDepth = max([results[-1][0] for results in sliceResults if len(results) > 0], default=0)
+    merged = []
+    for depth in range(1, maxDepth + 1):
+        bestMove, bestScore, numComplete, elapsed, found = None, -9e9 * playerToMove, 0, 0.0, False
+        for results in sliceResults:
+            entry = None
+            for result in results:
+                if result[0] == depth:
+                    entry = result
+            if entry is None and len(results) > 0 and results[-1][0] < depth and results[-1][3] \
+                    and abs(results[-1][2]) > victoryScoreThresh:
+                entry = results[-1]
+            if entry is None:
+                continue
+
+            found = True
+            (_, move, score, complete, sliceElapsed) = entry
+            if complete:
+                numComplete += 1
+            elapsed = max(elapsed, sliceElapsed)
+            if move is not None and playerToMove * score > playerToMove * bestScore:
+                bestMove, bestScore = move, score
+        if found:
+            merged.append((depth, bestMove, bestScore, numComplete == len(sliceResults), elapsed))
+    return merged
+
+
+# Search <moveList> (in the order the moves should be tried) with the player's process and all workers
+# in <pool>, and return the merged results. Uses the player's clock, which must already be started.
+def searchInParallel(pool, module, state, moveList, victoryScoreThresh):
+    numSlices = min(len(moveList), module.parallelWorkers + 1)
+    slices = [moveList[i::numSlices] for i in range(numSlices)]
+    deadline = time.time() + module.clock.remaining()
+
+    jobs = [pool.apply_async(searchJob, (packState(state), slices[i], deadline)) for i in range(1, numSlices)]
+    sliceResults = [module.searchRootMoves(state, slices[0])]  # Search the first share in this process
+
+    for job in jobs:
+        try:
+            sliceResults.append(job.get(timeout=max(0.0, deadline - time.time()) + 0.02))
+        except multiprocessing.TimeoutError:  # A late worker makes the last depths incomplete but does no harm
+            sliceResults.append([])
+
+    return mergeResults(sliceResults, state.playerToMove, victoryScoreThresh)
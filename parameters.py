@@ -0,0 +1,69 @@
+# Parameter files for the players' evaluation functions
+# A player lists the names of its tunable module globals (numbers, lists, or NumPy arrays) in
+# <tunableParameters> and loads a JSON file with new values for some of them at the start of initPlayer, before it
+# derives its evaluation tables. The tuning tool reads and writes all tunable parameters as one flat vector.
+
+import json
+import os
+import numpy as np
+
+
+# Set the parameters stored in <fileName> as globals of the player <module>; return False if there is no such file
+def loadParameters(module, fileName):
+    if fileName is None or not os.path.exists(fileName):
+        return False
+    with open(fileName) as file:
+        values = json.load(file)
+    for (parameterName, value) in values.items():
+        if parameterName not in module.tunableParameters:
+            raise ValueError('%s is not a tunable parameter of %s' % (parameterName, module.__name__))
+        if isinstance(getattr(module, parameterName), np.ndarray):
+            value = np.array(value, dtype=float).reshape(getattr(module, parameterName).shape)
+        setattr(module, parameterName, value)
+    return True
+
+
+# Write the current values of all tunable parameters of <module> to <fileName>
+def saveParameters(module, fileName):
+    values = {}
+    for parameterName in module.tunableParameters:
+        value = getattr(module, parameterName)
+        values[parameterName] = value.tolist() if isinstance(value, np.ndarray) else value
+    tempFileName = fileName + '.tmp'
+    with open(tempFileName, 'w') as file:
+        json.dump(values, file, indent=1)
+    os.replace(tempFileName, fileName)
+
+
+# Return the tunable parameters of <module> as one flat float vector
+def getParameterVector(module):
+    return np.concatenate([np.ravel(np.asarray(getattr(module, parameterName), dtype=float))
+                           for parameterName in module.tunableParameters])
+
+
+# Set the tunable parameters of <module> from a flat vector (in the order of getParameterVector)
+def setParameterVector(module, vector):
+    position = 0
+    for parameterName in module.tunableParameters:
+        value = getattr(module, parameterName)
+        size = np.size(value)
+        newValue = np.asarray(vector[position:position + size], dtype=float)
+        if isinstance(value, np.ndarray):
+            setattr(module, parameterName, newValue.reshape(value.shape))
+        elif isinstance(value, list):
+            setattr(module, parameterName, newValue.tolist())
+        else:
+            setattr(module, parameterName, float(newValue[0]))
+        position += size
+
+
+# Return the name of each entry of the parameter vector, e.g. 'attackScore[2]'
+def getParameterNames(module):
+    names = []
+    for parameterName in module.tunableParameters:
+        value = getattr(module, parameterName)
+        if isinstance(value, (list, np.ndarray)):
+            names += ['%s[%s]' % (parameterName, ','.join(str(i) for i in index)) for index in np.ndindex(np.shape(value))]
+        else:
+            names.append(parameterName)
+    return names
@@ -0,0 +1,156 @@
+# Profiling harness for a player's getMove
+#     python profiling.py --player Dark_Knight --depth 5 --output Dark_Knight_profile
+# The player searches the benchmark positions (see benchmark.py) in up to three separate passes, since every
+# measurement distorts the others:
+# 1. cProfile: the hottest functions by own time and by cumulative time, and for the functions in <focus> the number
+#    of calls per search node (from the search statistics); written to <output>.prof for pstats / snakeviz.
+# 2. Stack sampling: a thread records the main thread's Python stack every <sampleInterval> seconds; written to
+#    <output>.collapsed in the collapsed-stack format of flamegraph.pl and speedscope.
+# 3. tracemalloc: peak memory of each getMove, the memory blocks per node that are still allocated after it (what
+#    the search keeps, e.g. in its caches), and the lines that hold the most memory.
+
+import argparse
+import collections
+import contextlib
+import cProfile
+import importlib
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import benchmark
+
+focus = ['getMoveOptions', 'makeMove', 'getScore', 'getCachedScore', 'evaluateMany', 'lookup', 'save', 'check',
+         'timeOut']  # Functions whose calls per node are reported
+sampleInterval = 0.001  # Seconds between two stack samples
+
+
+# Run getMove of a prepared player on every position, calling <wrapper(getMove, state)>; return the total number of
+# search nodes
+def searchPositions(module, positions, depth, nodeLimit, wrapper):
+    nodes = 0
+    for (_, _, state) in positions:
+        benchmark.preparePlayer(module, state, depth, nodeLimit)
+        with contextlib.redirect_stdout(io.StringIO()):
+            wrapper(module.getMove, state)
+        nodes += sum(record['nodes'] for record in module.stats.records)
+        module.exitPlayer()
+    return nodes
+
+
+def profileCalls(module, positions, depth, nodeLimit, outputName, numLines):
+    profiler = cProfile.Profile()
+    nodes = searchPositions(module, positions, depth, nodeLimit, lambda getMove, state: profiler.runcall(getMove, state))
+    profiler.dump_stats(outputName + '.prof')
+
+    stats = pstats.Stats(profiler, stream=sys.stdout)
+    stats.strip_dirs().sort_stats('tottime').print_stats(numLines)
+    stats.sort_stats('cumulative').print_stats(numLines)
+
+    print('Calls per search node (%d nodes):' % nodes)
+    for ((fileName, line, functionName), (_, numCalls, ownTime, totalTime, _)) in sorted(stats.stats.items()):
+        if functionName in focus:
+            print('  %-32s %10d calls  %8.3f per node  %8.3f s own  %8.3f s total'
+                  % ('%s:%d(%s)' % (fileName, line, functionName), numCalls, numCalls / max(nodes, 1), ownTime, totalTime))
+    print('Profile written to %s.prof' % outputName)
+
+
+# Samples the Python stack of one thread at regular intervals and counts the collapsed stacks
+class StackSampler(object):
+    __slots__ = ['threadId', 'counts', 'running', 'thread']
+
+    def __init__(self, threadId):
+        self.threadId = threadId
+        self.counts = collections.Counter()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.threadId)
+            stack = []
+            while frame is not None and frame.f_code.co_filename != __file__:  # Stop at the harness's frames
+                code = frame.f_code
+                stack.append('%s:%s' % (code.co_filename.replace('\\', '/').split('/')[-1], code.co_name))
+                frame = frame.f_back
+            if len(stack) > 0:
+                self.counts[';'.join(reversed(stack))] += 1
+            time.sleep(sampleInterval)
+
+
+def sampleStacks(module, positions, depth, nodeLimit, outputName):
+    sampler = StackSampler(threading.get_ident())
+
+    def sampled(getMove, state):
+        sampler.start()
+        try:
+            getMove(state)
+        finally:
+            sampler.stop()
+
+    searchPositions(module, positions, depth, nodeLimit, sampled)
+    with open(outputName + '.collapsed', 'w') as file:
+        for (stack, count) in sorted(sampler.counts.items()):
+            file.write('%s %d\n' % (stack, count))
+    print('%d stack samples written to %s.collapsed' % (sum(sampler.counts.values()), outputName))
+
+
+def traceMemory(module, positions, depth, nodeLimit, numLines):
+    tracemalloc.start(10)
+    peaks = []
+    snapshots = []
+
+    def traced(getMove, state):
+        tracemalloc.reset_peak()
+        (baseline, _) = tracemalloc.get_traced_memory()
+        startBlocks = sys.getallocatedblocks()
+        getMove(state)
+        (_, peak) = tracemalloc.get_traced_memory()
+        peaks.append((peak - baseline, sys.getallocatedblocks() - startBlocks))
+        snapshots.append(tracemalloc.take_snapshot())
+
+    nodes = searchPositions(module, positions, depth, nodeLimit, traced)
+    tracemalloc.stop()
+
+    print('Memory per getMove:')
+    for ((positionName, _, _), (peak, blocks)) in zip(positions, peaks):
+        print('  %-16s peak %8.1f kB, %8d blocks still allocated' % (positionName, peak / 1024.0, blocks))
+    print('Peak memory %.1f kB; %.2f blocks allocated per node at the end of the searches (%d nodes)'
+          % (max(peak for (peak, _) in peaks) / 1024.0, sum(blocks for (_, blocks) in peaks) / max(nodes, 1), nodes))
+    print('Lines holding the most memory at the end of the last search:')
+    for statistic in snapshots[-1].statistics('lineno')[:numLines]:
+        print('  %s' % statistic)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profile a player\'s getMove on the benchmark positions.')
+    parser.add_argument('--player', default='Dark_Knight', help='player module')
+    parser.add_argument('--positions', default=benchmark.positionFile, help='position file')
+    parser.add_argument('--depth', type=int, default=4, help='search depth')
+    parser.add_argument('--nodes', type=int, default=None, help='node budget instead of a fixed depth')
+    parser.add_argument('--output', default=None, help='name of the output files (default: <player>_profile)')
+    parser.add_argument('--lines', type=int, default=25, help='number of lines in each report')
+    parser.add_argument('--skip', nargs='*', default=[], choices=['calls', 'stacks', 'memory'], help='passes to skip')
+    args = parser.parse_args()
+
+    module = importlib.import_module(args.player)
+    positions = benchmark.loadPositions(args.positions)
+    depth = args.depth if args.nodes is None else 20
+    outputName = args.output or args.player + '_profile'
+    if 'calls' not in args.skip:
+        profileCalls(module, positions, depth, args.nodes, outputName, args.lines)
+    if 'stacks' not in args.skip:
+        sampleStacks(module, positions, depth, args.nodes, outputName)
+    if 'memory' not in args.skip:
+        traceMemory(module, positions, depth, args.nodes, args.lines)
@@ -0,0 +1,141 @@
+# Depth-first proof-number search (df-pn) for forced wins
+#     python proof_search.py --nodes 200000 --plies 15
+# Proves or disproves that the player to move can force a win (capture the opponent's apple or its last horse)
+# within <maxPlies> plies and the move limit, whatever the opponent does. The search tree is an AND/OR tree: the
+# attacker (the player to move at the root) needs one winning move (OR), and every defender move must lose (AND).
+# Each node has a proof number (how many leaves must still be proved to prove it) and a disproof number, and df-pn
+# always expands the most-proving node, with thresholds so it can stay deep in the tree instead of returning to the
+# root after every expansion. Forced wins are found far deeper than an alpha-beta search of the same size reaches,
+# since branches where the defender has an easy escape are dropped right away.
+# Proof and disproof numbers are kept in a table by Zobrist key (see zobrist.py). The key includes the remaining
+# moves, which drop by one every ply, so the tree has no cycles and transpositions are merged safely.
+# The search stops with UNKNOWN when the node budget or time limit runs out (see time_control.py).
+#
+# Players call it at the root (see Dark_Knight.getMove) or at promising nodes:
+#     (result, move, nodes) = solver.solve(state, nodeLimit=20000, maxPlies=11)
+
+import argparse
+import time
+import attack_maps
+import zobrist
+from time_control import TimeControl, SearchTimeout
+
+infinity = 10 ** 9  # Proof or disproof number of a disproved or proved node
+PROVEN, UNKNOWN, DISPROVEN = 1, 0, -1  # Results of solve() for the player to move
+resultNames = {PROVEN: 'win', UNKNOWN: 'unknown', DISPROVEN: 'no win'}
+
+
+class ProofSearch(object):
+    __slots__ = ['boardHeight', 'targets', 'squareKeys', 'table', 'clock', 'attacker', 'horizon']
+
+    def __init__(self, boardWidth, boardHeight):
+        self.boardHeight = boardHeight
+        self.targets = attack_maps.getKnightTargets(boardWidth, boardHeight)  # Target squares of each square
+        pieceKeys = zobrist.getPieceKeys(boardWidth, boardHeight)
+        self.squareKeys = [pieceKeys[x][y] for x in range(boardWidth) for y in range(boardHeight)]
+        self.table = {}                 # Key -> (proof number, disproof number)
+        self.clock = TimeControl()      # Node budget and time limit of a solve() call
+        self.attacker = 1               # Player who tries to force a win
+        self.horizon = 0                # Positions with this many remaining moves count as not won
+
+    # Try to prove a forced win for the player to move in GameState <state>; return (result, winning move or None,
+    # number of nodes expanded)
+    def solve(self, state, nodeLimit=None, timeLimit=float('inf'), maxPlies=None):
+        cells = state.board.ravel().tolist()
+        horses = [cells.count(1), cells.count(-1)]
+        key = zobrist.boardKey(state.board, state.playerToMove, state.movesRemaining)
+        self.attacker = state.playerToMove
+        self.horizon = 0 if maxPlies is None else max(0, state.movesRemaining - maxPlies)
+        self.table = {}
+        self.clock.nodeLimit = nodeLimit
+        self.clock.start(timeLimit)
+        try:
+            self.search(cells, state.playerToMove, state.movesRemaining, horses, key, infinity, infinity)
+        except SearchTimeout:
+            pass
+
+        (proof, disproof) = self.table.get(key, (1, 1))
+        if proof == 0:
+            for (start, target, childKey, _) in self.expand(cells, state.playerToMove, state.movesRemaining, horses, key):
+                if self.table.get(childKey, (1, 1))[0] == 0:
+                    return (PROVEN, divmod(start, self.boardHeight) + divmod(target, self.boardHeight), self.clock.nodeCount)
+        return (DISPROVEN if disproof == 0 else UNKNOWN, None, self.clock.nodeCount)
+
+    # Return the moves of a position as (start, target, child key, captured piece), and put the proof and disproof
+    # numbers of the children that end the game (or reach the horizon) into the table
+    def expand(self, cells, player, movesRemaining, horses, key):
+        children = []
+        opponentHorses = horses[(1 + player) // 2]
+        stepKey = zobrist.sideKey ^ zobrist.movesKeys[movesRemaining] ^ zobrist.movesKeys[movesRemaining - 1]
+        won = (0, infinity) if player == self.attacker else (infinity, 0)
+        for start in [square for (square, piece) in enumerate(cells) if piece == player]:
+            startKey = key ^ self.squareKeys[start][player + 2] ^ stepKey
+            for target in self.targets[start]:
+                captured = cells[target]
+                if captured == player or captured == 2 * player:
+                    continue
+                childKey = startKey ^ self.squareKeys[target][captured + 2] ^ self.squareKeys[target][player + 2]
+                if captured == -2 * player or (captured == -player and opponentHorses == 1):
+                    self.table[childKey] = won
+                elif movesRemaining - 1 <= self.horizon:  # Drawn by the move limit, or beyond the horizon
+                    self.table[childKey] = (infinity, 0)
+                children.append((start, target, childKey, captured))
+        return children
+
+    # Expand the position until its proof number reaches <proofLimit> or its disproof number <disproofLimit>
+    def search(self, cells, player, movesRemaining, horses, key, proofLimit, disproofLimit):
+        self.clock.check()
+        children = self.expand(cells, player, movesRemaining, horses, key)
+        if len(children) == 0:  # No legal move: the game is drawn
+            self.table[key] = (infinity, 0)
+            return
+        orNode = player == self.attacker
+
+        while True:
+            numbers = [self.table.get(childKey, (1, 1)) for (_, _, childKey, _) in children]
+            if orNode:  # One proved child proves the node; all children must be disproved
+                ranking = sorted(range(len(children)), key=lambda index: numbers[index][0])
+                (proof, disproof) = (numbers[ranking[0]][0], min(infinity, sum(number[1] for number in numbers)))
+            else:
+                ranking = sorted(range(len(children)), key=lambda index: numbers[index][1])
+                (proof, disproof) = (min(infinity, sum(number[0] for number in numbers)), numbers[ranking[0]][1])
+            self.table[key] = (proof, disproof)
+            if proof >= proofLimit or disproof >= disproofLimit:
+                return
+
+            best = ranking[0]
+            (childProof, childDisproof) = numbers[best]
+            if orNode:  # Stay in the best child until it is no longer better than the second best
+                second = numbers[ranking[1]][0] if len(ranking) > 1 else infinity
+                (childProofLimit, childDisproofLimit) = (min(proofLimit, second + 1), disproofLimit - disproof + childDisproof)
+            else:
+                second = numbers[ranking[1]][1] if len(ranking) > 1 else infinity
+                (childProofLimit, childDisproofLimit) = (proofLimit - proof + childProof, min(disproofLimit, second + 1))
+
+            (start, target, childKey, captured) = children[best]
+            childCells = cells[:]
+            childCells[start] = 0
+            childCells[target] = player
+            childHorses = horses[:]
+            if captured == -player:
+                childHorses[(1 + player) // 2] -= 1
+            self.search(childCells, -player, movesRemaining - 1, childHorses, childKey, min(infinity, childProofLimit),
+                        min(infinity, childDisproofLimit))
+
+
+if __name__ == '__main__':
+    import benchmark  # Only for the benchmark positions; players that import this module do not load it
+
+    parser = argparse.ArgumentParser(description='Look for forced wins in the benchmark positions.')
+    parser.add_argument('--positions', default=benchmark.positionFile, help='position file')
+    parser.add_argument('--nodes', type=int, default=100000, help='node budget per position')
+    parser.add_argument('--plies', type=int, default=None, help='only look for wins within this many plies')
+    args = parser.parse_args()
+
+    for (positionName, category, state) in benchmark.loadPositions(args.positions):
+        solver = ProofSearch(*state.board.shape)
+        startTime = time.perf_counter()
+        (result, move, nodes) = solver.solve(state, args.nodes, maxPlies=args.plies)
+        print('%-16s %-10s %-9s %8d nodes %8.3f s  %s' % (positionName, category, resultNames[result], nodes,
+                                                         time.perf_counter() - startTime,
+                                                         '' if move is None else '(%d,%d)->(%d,%d)' % move))
@@ -0,0 +1,233 @@
+# Headless referee with a reproducible (fixed) match mode
+#     python referee.py Dark_Knight suncharn_pipithkul Knight_Rider --nodes 20000 --seed 1
+# By default, players get <timeLimit> seconds per move as in HoldYourHorses.py. In the fixed mode, each player is
+# limited by a node budget (the clock's nodeLimit; simulations for Monte_Knight) and/or a fixed search depth instead
+# and has unlimited time, and every game seeds the random module, NumPy's global generator, and a player's own
+# generator (<rng>) from the match seed and the game number. A game then depends only on the players and the seed:
+# it plays the same on a loaded or an idle machine, runs at full speed, and a change in a player shows up as a
+# different game rather than as noise.
+# The games start from the standard position unless the settings give another start board: the standard layout on a
+# board of any size (--board 10x10), or any layout from a board diagram file (--layout, see game_rules.pieceSymbols).
+# With an opening suite (--openings, see openings.py), every pair of players plays every opening twice, once with
+# each player as MAX, so that deterministic players do not repeat the same game.
+# Players are found without importing them (see discoverPlayers), and each is imported only when it plays its first
+# game, so a missing or broken module only affects the games it is in, and processes do not load unused engines.
+
+import argparse
+import ast
+import importlib
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+import numpy as np
+import game_rules
+
+timeTolerance = 0.1  # Additional wait time (seconds) before a time violation is called in the timed mode
+playerFunctions = {'initPlayer', 'getMove', 'exitPlayer'}  # Top-level functions that make a module a player
+
+
+class MatchSettings(object):
+    __slots__ = ['timeLimit', 'nodeLimit', 'depth', 'seed', 'startBoard']
+
+    def __init__(self, timeLimit=game_rules.timeLimit, nodeLimit=None, depth=None, seed=None, startBoard=None):
+        self.timeLimit = timeLimit      # Thinking time per move in the timed mode
+        self.nodeLimit = nodeLimit      # Node budget per move (None -> no budget)
+        self.depth = depth              # Search depth (None -> the player's own maxLookAhead)
+        self.seed = seed                # Seed for the random numbers of the games (None -> not seeded)
+        self.startBoard = startBoard    # Board of the start position, MAX to move (None -> the standard position)
+
+    # True if the players are limited by nodes or depth instead of time
+    def fixed(self):
+        return self.nodeLimit is not None or self.depth is not None
+
+    # Return the start position of the games
+    def startState(self):
+        if self.startBoard is None:
+            return game_rules.initialState()
+        return game_rules.makeState(self.startBoard, 1, game_rules.moveLimit)
+
+
+# Return the start board for a board size '<width>x<height>' (the standard layout in two opposite corners) or for a
+# JSON file with a board diagram (a list of rows); None if neither is given
+def loadStartBoard(boardSize=None, layoutFile=None):
+    if layoutFile is not None:
+        with open(layoutFile) as file:
+            return game_rules.boardFromDiagram(json.load(file))
+    if boardSize is not None:
+        (width, height) = (int(size) for size in boardSize.lower().split('x'))
+        return game_rules.initialState(width, height).board
+    return None
+
+
+# Return the start board (None for the standard position) and the openings of an opening suite file (see openings.py)
+def loadOpeningSuite(fileName):
+    with open(fileName) as file:
+        suite = json.load(file)
+    startBoard = None if suite['board'] is None else game_rules.boardFromDiagram(suite['board'])
+    return (startBoard, suite['openings'])
+
+
+# Return the names of the player modules in <directory> (None -> the directory of this file), found by parsing the
+# source files instead of importing them
+def discoverPlayers(directory=None):
+    directory = directory or os.path.dirname(os.path.abspath(__file__))
+    playerNames = []
+    for fileName in sorted(os.listdir(directory)):
+        if not fileName.endswith('.py'):
+            continue
+        with open(os.path.join(directory, fileName), 'rb') as file:
+            try:
+                tree = ast.parse(file.read())
+            except SyntaxError:
+                continue
+        if playerFunctions <= {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}:
+            playerNames.append(fileName[:-3])
+    return playerNames
+
+
+# Import player <playerName>; with <copyName>, load an independent second copy of the module under that name, so
+# that the same player can play both colors of a game
+def loadPlayer(playerName, copyName=None):
+    if copyName is None:
+        return importlib.import_module(playerName)
+    spec = importlib.util.spec_from_file_location(copyName, importlib.util.find_spec(playerName).origin)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[copyName] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# Apply the node budget and search depth of <settings> to player <module>; return the time limit to pass to its
+# initPlayer
+def configurePlayer(module, settings):
+    if hasattr(module, 'clock'):
+        module.clock.nodeLimit = settings.nodeLimit
+    if settings.depth is not None and hasattr(module, 'maxLookAhead'):
+        module.minLookAhead = min(module.minLookAhead, settings.depth)
+        module.maxLookAhead = settings.depth
+    if not settings.fixed():
+        return settings.timeLimit
+    if hasattr(module, 'clock') and settings.nodeLimit is None and not hasattr(module, 'maxLookAhead'):
+        raise ValueError('%s has no search depth; give it a node budget' % module.__name__)
+    module.parallelWorkers = 0  # Root-parallel search depends on the timing of the processes
+    return float('inf')
+
+
+# Seed all random number generators that the players use for game number <gameNumber>
+def seedPlayers(modules, seed, gameNumber):
+    gameSeed = seed * 1000003 + gameNumber
+    random.seed(gameSeed)
+    np.random.seed(gameSeed % 2 ** 32)
+    for module in modules:
+        if isinstance(getattr(module, 'rng', None), random.Random):
+            module.rng.seed(gameSeed)
+
+
+# Play one game between the player modules <modules> (MAX first), starting with the moves of <opening>; return the
+# points of both players and the moves (including the opening). <onMove> (if given) is called after every move
+def playGame(modules, settings, gameNumber=0, verbose=False, opening=(), onMove=None):
+    state = settings.startState()
+    moves = []
+    for move in opening:
+        moves.append(tuple(int(c) for c in move))
+        state = game_rules.makeMove(state, moves[-1])
+    if settings.seed is not None:
+        seedPlayers(modules, settings.seed, gameNumber)
+    for (module, playerCode) in zip(modules, game_rules.playerCode):
+        module.initPlayer(state, configurePlayer(module, settings), game_rules.victoryPoints, game_rules.moveLimit,
+                          playerCode)
+
+    while not state.gameOver:
+        moveList = game_rules.getMoveOptions(state)
+        if len(moveList) == 0:  # No legal move: the game is drawn
+            break
+        module = modules[(1 - state.playerToMove) // 2]
+        startTime = time.perf_counter()
+        move = module.getMove(state)
+        duration = time.perf_counter() - startTime
+        if not settings.fixed() and duration >= settings.timeLimit + timeTolerance:
+            print('Time violation by player ' + module.__name__)
+            move = moveList[0]
+        elif tuple(move) not in moveList:
+            print('Illegal move by player ' + module.__name__)
+            move = moveList[0]
+        moves.append(tuple(int(c) for c in move))
+        state = game_rules.makeMove(state, tuple(move))
+        if verbose:
+            print('%s: (%d,%d)->(%d,%d)' % ((module.__name__,) + moves[-1]))
+        if onMove is not None:
+            onMove()
+
+    for module in modules:
+        module.exitPlayer()
+    if state.points > 0:
+        return (state.points, 0, moves)
+    if state.points < 0:
+        return (0, -state.points, moves)
+    return (game_rules.victoryPoints // 2, game_rules.victoryPoints // 2, moves)
+
+
+# Play a round-robin tournament in which any two players play each other twice (once with each color) from the start
+# position, or from each of the <openings> (move lists), in an order shuffled with the match seed; return the victories
+# and points of each player
+def computerTournament(playerNames, settings, openings=None):
+    missingPlayers = sorted(set(playerNames) - set(discoverPlayers()))
+    if len(missingPlayers) > 0:
+        raise ValueError('No player module named %s' % ', '.join(missingPlayers))
+    modules = {}
+    gameList = [(player1, player2, opening) for opening in (openings or [()]) for player1 in playerNames
+                for player2 in playerNames if player1 != player2]
+    random.Random(settings.seed).shuffle(gameList)
+    victories = {playerName: 0.0 for playerName in playerNames}
+    points = {playerName: 0 for playerName in playerNames}
+
+    for (gameNumber, (player1, player2, opening)) in enumerate(gameList):
+        for playerName in (player1, player2):
+            if playerName not in modules:
+                modules[playerName] = loadPlayer(playerName)
+        (points1, points2, moves) = playGame([modules[player1], modules[player2]], settings, gameNumber, opening=opening)
+        print('%s vs. %s %d - %d (%d moves)' % (player1, player2, points1, points2, len(moves)))
+        points[player1] += points1
+        points[player2] += points2
+        if points1 > points2:
+            victories[player1] += 1
+        elif points1 < points2:
+            victories[player2] += 1
+        else:
+            victories[player1] += 0.5
+            victories[player2] += 0.5
+    printStandings(victories, points)
+    return (victories, points)
+
+
+# Print the players ranked by victories, and by points if the victories are identical
+def printStandings(victories, points):
+    print('\nFinal Standings:\n')
+    print('Name                          Victories Points\n')
+    for playerName in sorted(victories, key=lambda playerName: (victories[playerName], points[playerName]), reverse=True):
+        print(playerName + ' ' * (30 - len(playerName)) + str(victories[playerName]) + '\t\t' + str(points[playerName]))
+    print('')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play a round-robin tournament without graphics.')
+    parser.add_argument('players', nargs='*', help='player modules (none -> list the available players)')
+    parser.add_argument('--time', type=float, default=game_rules.timeLimit, help='thinking time per move (timed mode)')
+    parser.add_argument('--nodes', type=int, default=None, help='node budget per move (fixed mode)')
+    parser.add_argument('--depth', type=int, default=None, help='search depth (fixed mode)')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the game order and the players\' random numbers')
+    parser.add_argument('--board', default=None, help='board size <width>x<height> with the standard layout')
+    parser.add_argument('--layout', default=None, help='JSON file with the board diagram of the start position')
+    parser.add_argument('--openings', default=None, help='opening suite file (see openings.py)')
+    args = parser.parse_args()
+    if len(args.players) == 0:
+        print('Available players: %s' % ', '.join(discoverPlayers()))
+        sys.exit(0)
+    (startBoard, openings) = (loadStartBoard(args.board, args.layout), None)
+    if args.openings is not None:
+        (suiteBoard, suite) = loadOpeningSuite(args.openings)
+        (startBoard, openings) = (suiteBoard if suiteBoard is not None else startBoard, [opening['moves'] for opening in suite])
+    computerTournament(args.players, MatchSettings(args.time, args.nodes, args.depth, args.seed, startBoard), openings)
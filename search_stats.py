@@ -0,0 +1,94 @@
+# Search statistics shared by the searching players
+# A player keeps one SearchStats object and counts nodes, leaves, evaluations, transposition table probes, and
+# beta cutoffs in it while it searches, guarded by its module-level <statsEnabled> flag:
+#     if statsEnabled:
+#         stats.leaves += 1
+# so that a disabled player only pays for testing one global per counting point. At the end of every iterative
+# deepening iteration, finishIteration() turns the counters into a record (a dictionary) with nodes per second, the
+# effective branching factor, the cutoff position histogram, and the TT hit rate. The records are kept in
+# <records>, optionally printed, and appended as JSON lines to <fileName>, so they can be analyzed after a game.
+
+import json
+import time
+
+maxCutoffIndex = 16  # Cutoffs at this or a later move of a node share the last histogram bin
+
+
+class SearchStats(object):
+    __slots__ = ['name', 'fileName', 'printRecords', 'records', 'nodes', 'leaves', 'evals', 'tableProbes',
+                 'tableHits', 'tableMoves', 'cutoffs', 'iterationStart', 'lastDepth', 'lastNodes']
+
+    def __init__(self, name, fileName=None, printRecords=True):
+        self.name = name
+        self.fileName = fileName            # JSON lines file that every record is appended to (None -> no file)
+        self.printRecords = printRecords    # Print a summary line for every record
+        self.records = []
+        self.lastDepth = self.lastNodes = 0
+        self.startIteration()
+
+    # Reset the counters; call before every iterative deepening iteration
+    def startIteration(self):
+        self.nodes = 0                      # Positions visited, including leaves
+        self.leaves = 0                     # Positions at the depth limit or with the game over
+        self.evals = 0                      # Calls of the evaluation function (not answered by a cache)
+        self.tableProbes = 0                # Transposition table lookups...
+        self.tableHits = 0                  # ... that returned a usable score...
+        self.tableMoves = 0                 # ... or only a best move for the move ordering
+        self.cutoffs = [0] * (maxCutoffIndex + 1)  # Number of beta cutoffs caused by the first, second, ... move
+        self.iterationStart = time.perf_counter()
+
+    # Count a transposition table lookup that returned (score, move)
+    def countProbe(self, score, move):
+        self.tableProbes += 1
+        if score is not None:
+            self.tableHits += 1
+        elif move is not None:
+            self.tableMoves += 1
+
+    # Count a beta cutoff by move number <moveIndex> (0 = first move searched) of a node
+    def countCutoff(self, moveIndex):
+        self.cutoffs[min(moveIndex, maxCutoffIndex)] += 1
+
+    # Make a record of the iteration that searched to <depth>; <complete> tells whether all root moves were searched
+    def finishIteration(self, depth, complete, **extra):
+        elapsed = time.perf_counter() - self.iterationStart
+        numCutoffs = sum(self.cutoffs)
+        record = {'player': self.name, 'depth': depth, 'complete': complete, 'time': elapsed, 'nodes': self.nodes,
+                  'leaves': self.leaves, 'evals': self.evals, 'nps': self.nodes / elapsed if elapsed > 0 else None,
+                  'ebf': self.nodes / self.lastNodes if depth == self.lastDepth + 1 and self.lastNodes > 0 else None,
+                  'cutoffs': numCutoffs,
+                  'firstMoveCutoffRate': self.cutoffs[0] / numCutoffs if numCutoffs > 0 else None,
+                  'cutoffHistogram': list(self.cutoffs),
+                  'tableProbes': self.tableProbes,
+                  'tableHitRate': self.tableHits / self.tableProbes if self.tableProbes > 0 else None,
+                  'tableMoveRate': self.tableMoves / self.tableProbes if self.tableProbes > 0 else None}
+        record.update(extra)
+        (self.lastDepth, self.lastNodes) = (depth, self.nodes) if complete else (0, 0)
+
+        self.records.append(record)
+        if self.printRecords:
+            print(formatRecord(record))
+        if self.fileName is not None:
+            with open(self.fileName, 'a') as file:
+                file.write(json.dumps(record) + '\n')
+        return record
+
+
+# One line summary of a record
+def formatRecord(record):
+    text = '%s stats: depth %d%s, %.4f s, %d nodes (%d leaves, %d evals), %.0f nodes/s' \
+           % (record['player'], record['depth'], '' if record['complete'] else ' (incomplete)', record['time'],
+              record['nodes'], record['leaves'], record['evals'], record['nps'] or 0.0)
+    if record['ebf'] is not None:
+        text += ', EBF %.2f' % record['ebf']
+    if record['firstMoveCutoffRate'] is not None:
+        text += ', %d cutoffs (%.0f%% by the first move)' % (record['cutoffs'], 100.0 * record['firstMoveCutoffRate'])
+    if record['tableHitRate'] is not None:
+        text += ', TT hits %.0f%% (moves %.0f%%)' % (100.0 * record['tableHitRate'], 100.0 * record['tableMoveRate'])
+    return text
+
+
+# Read the records of a JSON lines file written by SearchStats
+def readRecords(fileName):
+    with open(fileName) as file:
+        return [json.loads(line) for line in file if line.strip()]
@@ -0,0 +1,141 @@
+# Self-play data generator
+#     python selfplay.py --engine Dark_Knight --opponent suncharn_pipithkul --games 1000 --random-plies 4 --nodes 20000 --workers 4 --output selfplay
+# Worker processes play complete games between two player modules (the same module twice by default), the colors
+# alternating from game to game, and send every position in which a player searched, with its search score (from
+# MAX's perspective, NaN for players that do not report one) and the final result, back to the main process.
+# The main process appends each finished game to the dataset in <output> (see datasets.DatasetWriter), so an
+# interrupted run keeps all finished games, and running the script again adds more games to the same dataset.
+# The first <randomPlies> moves of every game are uniformly random, so that deterministic players (e.g. with a node
+# budget) do not repeat the same game; these positions are not recorded. With a node budget or a fixed depth, the
+# players run in the fixed mode of referee.py, so a game only depends on the seed.
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import numpy as np
+import datasets
+import game_rules
+import referee
+
+players = None          # The two player modules of a worker process (a second copy if both are the same module)
+settings = None         # Limits of the players' searches (a referee.MatchSettings)
+
+
+def initWorker(engineNames, matchSettings):
+    global players, settings
+    players = [referee.loadPlayer(engineNames[0])]
+    players.append(referee.loadPlayer(engineNames[1], engineNames[1] + '_copy' if engineNames[1] == engineNames[0] else None))
+    for module in players:
+        module.parallelWorkers = 0      # The games run in parallel instead
+        module.openingBookFile = None   # Book moves would make the games less diverse
+    settings = matchSettings
+
+
+# Let <module> choose a move in GameState <state>; return (move, score) with the score from MAX's perspective.
+# Players with searchRootMoves are searched directly, so the score of their last complete depth is known.
+def searchMove(module, state):
+    if not hasattr(module, 'searchRootMoves'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return (module.getMove(state), float('nan'))
+
+    module.clock.start(module.timeLimit)
+    ownState = module.rootState(state)
+    moveList = module.getMoveOptions(ownState)
+    results = module.searchRootMoves(ownState, moveList)
+    complete = [result for result in results if result[3] and result[1] is not None]
+    if len(complete) == 0:  # Not even the first depth finished within the budget
+        return (moveList[0], float('nan'))
+    (_, move, score, _, _) = complete[-1]
+    return (move, float(score))
+
+
+# Play game number <gameNumber> (the players swap colors every game); return the recorded positions and the result
+def playGame(job):
+    (gameNumber, randomPlies) = job
+    sides = players if gameNumber % 2 == 0 else players[::-1]  # Player of MAX, then player of MIN
+    referee.seedPlayers(sides, settings.seed, gameNumber)
+    rng = random.Random(random.getrandbits(64))  # Random openings
+    state = settings.startState()
+    for (module, playerCode) in zip(sides, game_rules.playerCode):
+        with contextlib.redirect_stdout(io.StringIO()):
+            module.initPlayer(state, referee.configurePlayer(module, settings), game_rules.victoryPoints,
+                              game_rules.moveLimit, playerCode)
+
+    (boards, playerToMove, movesRemaining, scores) = ([], [], [], [])
+    ply = 0
+    while not state.gameOver:
+        moveList = game_rules.getMoveOptions(state)
+        if len(moveList) == 0:  # No legal move: the game is drawn
+            break
+        if ply < randomPlies:
+            move = rng.choice(moveList)
+        else:
+            (move, score) = searchMove(sides[(1 - state.playerToMove) // 2], state)
+            boards.append(state.board.copy())
+            playerToMove.append(state.playerToMove)
+            movesRemaining.append(state.movesRemaining)
+            scores.append(score)
+        state = game_rules.makeMove(state, tuple(move))
+        ply += 1
+
+    for module in sides:
+        module.exitPlayer()
+    (boardWidth, boardHeight) = state.board.shape
+    return (np.array(boards, dtype=np.int8).reshape((len(boards), boardWidth, boardHeight)),
+            np.array(playerToMove, dtype=np.int8), np.array(movesRemaining, dtype=np.int16),
+            np.array(scores, dtype=np.float32), int(np.sign(state.points)))
+
+
+def generate(engineNames, numGames, randomPlies, matchSettings, numWorkers, directory):
+    writer = datasets.DatasetWriter(directory, *matchSettings.startState().board.shape)
+    firstGame = writer.manifest['numGames']
+    if firstGame > 0:
+        print('Appending to %s with %d games (%d positions)' % (directory, firstGame, writer.manifest['numPositions']))
+    jobs = [(firstGame + index, randomPlies) for index in range(numGames)]
+
+    if numWorkers > 0:
+        pool = multiprocessing.Pool(numWorkers, initializer=initWorker, initargs=(engineNames, matchSettings))
+        mapper = pool.imap_unordered
+    else:
+        initWorker(engineNames, matchSettings)
+        pool, mapper = None, map
+
+    results = [0, 0, 0]  # Wins of MAX, draws, wins of MIN
+    try:
+        for (count, (boards, playerToMove, movesRemaining, scores, result)) in enumerate(mapper(playGame, jobs)):
+            writer.addGame(boards, playerToMove, movesRemaining, scores, result)
+            writer.flush()
+            results[1 - result] += 1
+            if (count + 1) % 10 == 0 or count + 1 == numGames:
+                print('%d / %d games, %d positions; MAX %d, draws %d, MIN %d'
+                      % (count + 1, numGames, writer.manifest['numPositions'], results[0], results[1], results[2]))
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate training positions by self-play.')
+    parser.add_argument('--engine', default='Dark_Knight', help='player module')
+    parser.add_argument('--opponent', default=None, help='player module of the opponent (default: the same)')
+    parser.add_argument('--games', type=int, default=100, help='number of games to add to the dataset')
+    parser.add_argument('--random-plies', type=int, default=4, help='number of random moves at the start of a game')
+    parser.add_argument('--time', type=float, default=0.1, help='thinking time per move in seconds (without '
+                                                                '--nodes and --depth)')
+    parser.add_argument('--nodes', type=int, default=None, help='node budget per move (simulations for Monte_Knight)')
+    parser.add_argument('--depth', type=int, default=None, help='fixed search depth')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the random openings and the players')
+    parser.add_argument('--board', default=None, help='board size <width>x<height> with the standard layout')
+    parser.add_argument('--layout', default=None, help='JSON file with the board diagram of the start position')
+    parser.add_argument('--output', default='selfplay', help='dataset directory')
+    args = parser.parse_args()
+    matchSettings = referee.MatchSettings(args.time, args.nodes, args.depth, args.seed,
+                                          referee.loadStartBoard(args.board, args.layout))
+    generate([args.engine, args.opponent or args.engine], args.games, args.random_plies, matchSettings, args.workers,
+             args.output)
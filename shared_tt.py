@@ -0,0 +1,128 @@
+# Transposition table in shared memory
+# The entries live in a fixed-layout NumPy structured array inside a multiprocessing.shared_memory block, so all
+# processes of a parallel search (or a pondering process) can read and write the same table without pickling
+# anything: one process creates the table, and the others attach to it by its name.
+# Entries are written without locks. Each entry stores check = key ^ scoreBits ^ info, so an entry that was torn
+# by two processes writing at the same time fails the check on the next probe and is simply treated as a miss.
+
+import struct
+import numpy as np
+from multiprocessing import shared_memory
+
+exactBound = 0   # The stored score is the exact MiniMax score
+lowerBound = 1   # The MiniMax score is at least the stored score (the search failed high)
+upperBound = 2   # The MiniMax score is at most the stored score (the search failed low)
+
+entryType = np.dtype([('check', '<u8'), ('score', '<f8'), ('info', '<u8')])
+noMove = 0xffffffff
+
+
+# Pack search depth, bound type, and best move (coordinates up to 254) into one 64-bit integer
+def packInfo(depth, bound, move):
+    if move is None:
+        packedMove = noMove
+    else:
+        packedMove = move[0] | (move[1] << 8) | (move[2] << 16) | (move[3] << 24)
+    return depth | (bound << 8) | (packedMove << 16)
+
+
+def unpackMove(info):
+    packedMove = info >> 16
+    if packedMove == noMove:
+        return None
+    return (packedMove & 0xff, (packedMove >> 8) & 0xff, (packedMove >> 16) & 0xff, packedMove >> 24)
+
+
+def doubleToBits(value):
+    return struct.unpack('<Q', struct.pack('<d', value))[0]
+
+
+def bitsToDouble(bits):
+    return struct.unpack('<d', struct.pack('<Q', bits))[0]
+
+
+class TranspositionTable(object):
+    __slots__ = ['numEntries', 'mask', 'memory', 'isOwner', 'name', 'table', 'checks', 'scoreBits', 'infos',
+                 'probes', 'hits', 'stores']
+
+    # Create a table with <numEntries> entries (rounded up to a power of 2), or attach to the existing shared
+    # table called <name>
+    def __init__(self, numEntries=2 ** 18, name=None):
+        self.numEntries = 1 << max(0, int(numEntries) - 1).bit_length()
+        self.mask = self.numEntries - 1
+        self.isOwner = name is None
+        if self.isOwner:
+            self.memory = shared_memory.SharedMemory(create=True, size=self.numEntries * entryType.itemsize)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.numEntries = self.memory.size // entryType.itemsize  # The creator decides the size
+            self.numEntries = 1 << (self.numEntries.bit_length() - 1)
+            self.mask = self.numEntries - 1
+        self.name = self.memory.name
+
+        self.table = np.ndarray((self.numEntries,), dtype=entryType, buffer=self.memory.buf)
+        self.checks = self.table['check']
+        self.scoreBits = self.table['score'].view('<u8')
+        self.infos = self.table['info']
+        if self.isOwner:
+            self.clear()
+        self.probes = self.hits = self.stores = 0
+
+    # Remove all entries
+    def clear(self):
+        self.table[:] = np.zeros(1, dtype=entryType)
+
+    # Return (score, depth, bound, move) stored for position <key>, or None if there is no valid entry
+    def probe(self, key):
+        self.probes += 1
+        index = key & self.mask
+        check, bits, info = int(self.checks[index]), int(self.scoreBits[index]), int(self.infos[index])
+        if check ^ bits ^ info != key:
+            return None
+        self.hits += 1
+        return (bitsToDouble(bits), info & 0xff, (info >> 8) & 0x3, unpackMove(info))
+
+    # Store a search result; an entry for the same position from a deeper search is kept
+    def store(self, key, score, depth, bound, move):
+        index = key & self.mask
+        check, bits, info = int(self.checks[index]), int(self.scoreBits[index]), int(self.infos[index])
+        if check ^ bits ^ info == key and info & 0xff > depth:
+            return
+        self.stores += 1
+        bits, info = doubleToBits(score), packInfo(depth, bound, move)
+        self.scoreBits[index] = bits
+        self.infos[index] = info
+        self.checks[index] = key ^ bits ^ info
+
+    # Look up position <key> for a search of <depth> plies with window (alpha, beta). Return (score, move), where
+    # score is None unless the stored result settles the position, and move is the stored best move (or None).
+    def lookup(self, key, depth, alpha, beta):
+        entry = self.probe(key)
+        if entry is None:
+            return (None, None)
+        (score, storedDepth, bound, move) = entry
+        if storedDepth >= depth and (bound == exactBound or (bound == lowerBound and score >= beta)
+                                     or (bound == upperBound and score <= alpha)):
+            return (score, move)
+        return (None, move)
+
+    # Store the result <score> of a search of <depth> plies with window (alpha, beta), classifying it as an
+    # exact score or a bound
+    def save(self, key, depth, alpha, beta, score, move):
+        if score >= beta:
+            self.store(key, score, depth, lowerBound, move)
+        elif score <= alpha:
+            self.store(key, score, depth, upperBound, move)
+        else:
+            self.store(key, score, depth, exactBound, move)
+
+    # Fraction of probes that found a valid entry
+    def hitRate(self):
+        return self.hits / max(1, self.probes)
+
+    # Detach from the shared memory; the creating process also frees it
+    def close(self):
+        self.table = self.checks = self.scoreBits = self.infos = None
+        self.memory.close()
+        if self.isOwner:
+            self.memory.unlink()
@@ -1,11 +1,23 @@
 # Player suncharn_pipithkul
 
+import os
+import sys
 import numpy as np
-from datetime import datetime
+import attack_maps
+import parallel_search
+import eval_cache
+import knight_distance
+import opening_book
+import parameters
+import shared_tt
+import zobrist
+from search_stats import SearchStats
+from time_control import TimeControl, SearchTimeout
 
 
 class GameState(object):
-    __slots__ = ['board', 'playerToMove', 'gameOver', 'movesRemaining', 'points']
+    __slots__ = ['board', 'playerToMove', 'gameOver', 'movesRemaining', 'points', 'key', 'material', 'placement',
+                 'attacks']
 
 
 # Global variables
@@ -17,14 +29,17 @@ moveLimit = 0  # Maximum number of moves
 
 defenseWeight = .10  # weight on how much we want to defend
 attackWeight = .30  # weight on how much we want to attack
+attackDefenseTerms = False  # add attackScore and defendScore to getScore (cheap lookups in the attack maps)
 appleValue = 900
 horseValue = 20
+tunableParameters = ['appleValue', 'horseValue', 'maxPieceSquareTable']  # evaluation parameters that tuning.py can optimize
+parameterFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'suncharn_pipithkul_parameters.json')  # tuned values
 
 # If exceeded, game is a tie with victoryPoints being split between players.
 # Otherwise, number of remaining moves is added to winner's score.
 startState = None  # Initial state, provided to the initPlayer function
 assignedPlayer = 0  # 1 -> player MAX; -1 -> player MIN (in terms of the MiniMax algorithm)
-startTime = 0  # Remember the time stamp when move computation started
+clock = TimeControl()  # Keeps track of the thinking time and aborts the search when it runs out
 
 # Local parameters for player's algorithm. Can be modified, deleted, or extended in any conceivable way
 pointMultiplier = 10  # Muliplier for winner's points in getScore function
@@ -32,9 +47,23 @@ pieceValue = 30  # Score value of a single piece in getScore function
 victoryScoreThresh = 1000  # An absolute score exceeds this value if and only if one player has won
 minLookAhead = 2  # Initial search depth for iterative deepening
 maxLookAhead = 20  # Maximum search depth
+statsEnabled = False  # Count nodes, leaves, evaluations, cutoffs, and TT probes in <stats> (see search_stats.py)
+stats = SearchStats('suncharn_pipithkul')  # Search statistics of the current iteration and records of the finished ones
+parallelWorkers = 0  # Number of extra processes for root-parallel search (0 -> search on a single core)
+workerPool = None  # Worker processes for root-parallel search, started in initPlayer
+transpositionTableSize = 2 ** 18  # Number of entries in the transposition table
+transpositionTableName = None  # Name of an existing shared table to use instead of creating one (set in workers)
+transpositionTable = None  # Transposition table in shared memory, so that parallel workers share their results
+minTableDepth = 2  # Nodes with less remaining depth are not looked up in the transposition table
+pieceKeys = None  # Zobrist keys for each square and piece
+evalCacheSize = 2 ** 16  # Number of entries in the evaluation cache
+evalCache = None  # Caches getScore results by position key, separately from the transposition table
+openingBookFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'suncharn_pipithkul_book.npy')  # opening_book.py --engine suncharn_pipithkul; None -> no book
+openingBook = None  # Book moves for the first plies from the start position, loaded in initPlayer if the file exists
 
 moveDistanceFromAnySpot = None  # map how many move from any spot on the board to any given spot on the board
 # pieceSquareTable = None  # piece square table for max player
+# hand-made for the standard 7x6 board and layout; on other boards and layouts, initGeometry derives it from distanceSquareValues
 maxPieceSquareTable = np.array(
     [
         [0, 0, 5, 0, 5, 0],
@@ -47,29 +76,34 @@ maxPieceSquareTable = np.array(
     ]
 )
 minPieceSquareTable = np.flip(maxPieceSquareTable)
+standardPieceSquareTable = maxPieceSquareTable
+distanceSquareValues = [100, 20, 12]  # piece square value 0, 1, 2 moves away from the opponent's apple (other boards and layouts)
+derivedMinPieceSquareTable = None  # min player's table if the apples are not point-symmetric (None -> max player's table rotated)
+# squares 1 (danger) and 2 (semi danger) moves away from each apple, derived from the start position in initGeometry
 maxDangerSquare = [(2, 1), (1, 2)]
 maxSemiDangerSquare = [(4, 2), (3, 3), (2, 4), (4, 0), (3, 1), (1, 3), (0, 4), (2, 0), (0, 2)]
 minDangerSquare = [(5, 3), (4, 4)]
 minSemiDangerSquare = [(4, 1), (3, 2), (2, 3), (5, 2), (3, 4), (6, 1), (2, 5), (6, 3), (4, 5)]
+maxTargetSquare = (6, 5)  # square of min player's apple, the target of max player's horses
+minTargetSquare = (0, 0)  # square of max player's apple
+moveDirection = [(1, 2), (2, 1), (-1, 2), (-2, 1), (-1, -2), (-2, -1), (1, -2), (2, -1)]  # Possible (dx, dy) moves, move right first
+moveTargets = None  # for each square index, the squares a horse can jump to in the order of our moveDirection (set in initGeometry)
+maxSquareValues = None  # The piece square tables as nested lists (faster to index), set in initPlayer
+minSquareValues = None
+knightTargets = None  # for each square index (row * boardWidth + col), the indices of the squares a horse can jump to
 
 
 # Compute list of legal moves for a given GameState and the player moving next
+# the pieces are found with one numpy scan and their moves looked up in moveTargets, so larger boards cost little
 def getMoveOptions(state):
-    # direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]  # Possible (dx, dy) moves
-    direction = [(1, 2), (2, 1), (-1, 2), (-2, 1), (-1, -2), (-2, -1), (1, -2), (2, -1)]  # Possible (dx, dy) moves, move right first
-    if assignedPlayer == -1:  # min player, starts right side of the board
-        direction = [(-1, -2), (-2, -1), (1, -2), (2, -1), (1, 2), (2, 1), (-1, 2), (-2, 1)]  # Possible (dx, dy) moves, move left first
     moves = []
-
-    for xStart in range(boardHeight):  # Search board for player's pieces
-        for yStart in range(boardWidth):
-            if state.board[xStart, yStart] == state.playerToMove:  # Found a piece!
-                for (dx, dy) in direction:  # Check all potential move vectors
-                    (xEnd, yEnd) = (xStart + dx, yStart + dy)
-                    if xEnd >= 0 and xEnd < boardHeight and yEnd >= 0 and yEnd < boardWidth and not (
-                            state.board[xEnd, yEnd] in [state.playerToMove, 2 * state.playerToMove]):
-                        moves.append((xStart, yStart, xEnd,
-                                      yEnd))  # If square is empty or occupied by the opponent, then we have a legal move.
+    board = state.board.ravel().tolist()
+    ownPieces = (state.playerToMove, 2 * state.playerToMove)
+    for start in np.flatnonzero(state.board == state.playerToMove).tolist():  # Search board for player's pieces
+        (xStart, yStart) = divmod(start, boardWidth)
+        for target in moveTargets[start]:
+            if board[target] not in ownPieces:  # If square is empty or occupied by the opponent, then we have a legal move.
+                moves.append((xStart, yStart) + divmod(target, boardWidth))
     return moves
 
 # For a given GameState and move to be executed, return the GameState that results from the move
@@ -83,6 +117,23 @@ def makeMove(state, move):
     newState.movesRemaining = state.movesRemaining - 1
     newState.gameOver = False
     newState.points = 0
+    newState.key = zobrist.moveKey(state.key, pieceKeys, move, state.playerToMove, state.board[xEnd, yEnd],
+                                   state.movesRemaining)
+
+    newState.attacks = attack_maps.moveAttackMaps(state.attacks, knightTargets, boardWidth, move, state.playerToMove,
+                                                  state.board[xEnd, yEnd])
+
+    # Update the running material and piece square totals of the score by what changed on the two squares
+    captured = int(state.board[xEnd, yEnd])
+    newState.material = state.material - materialValue(captured)
+    if state.playerToMove == 1:
+        newState.placement = state.placement + maxSquareValues[xEnd][yEnd] - maxSquareValues[xStart][yStart]
+        if captured == -1:
+            newState.placement += minSquareValues[xEnd][yEnd]
+    else:
+        newState.placement = state.placement - minSquareValues[xEnd][yEnd] + minSquareValues[xStart][yStart]
+        if captured == 1:
+            newState.placement -= maxSquareValues[xEnd][yEnd]
 
     if state.board[xEnd, yEnd] == -2 * state.playerToMove or not (-state.playerToMove in newState.board):
         newState.gameOver = True  # If the opponent lost the apple or all horses, the game is over...
@@ -98,30 +149,74 @@ def makeMove(state, move):
 # Knight_Rider's evaluation function is based on the number of remaining horses and their proximity to the
 # opponent's apple (the latter factor is not too useful in its current form but at least motivates Knight_Rider
 # to move horses toward the opponent's apple).
+# The material and piece square parts of the score are running totals kept up to date by makeMove (see
+# rootState), so only the interaction terms would have to be computed here.
 def getScore(state):
-    score = 0
-
     # check if the state is a winning state
-    if assignedPlayer == 1 and state.board[boardHeight - 1, boardWidth - 1] == 1:
+    if assignedPlayer == 1 and state.board[maxTargetSquare] == 1:
         return 10000
-    elif assignedPlayer == -1 and state.board[0, 0] == -1:
+    elif assignedPlayer == -1 and state.board[minTargetSquare] == -1:
         return -10000
 
-    # Search board for any pieces and count scores
+    score = state.material + state.placement
+    if attackDefenseTerms:
+        score += attackScore(state, 1)
+        score -= attackScore(state, -1)
+        score += defendScore(state, 1)
+        score -= defendScore(state, -1)
+
+    return score
+
+# Return getScore for many positions at once: <boards> is an (N, boardHeight, boardWidth) array, and the player to
+# move (one value or N values) is accepted for the same interface as the other players but not needed here.
+# Material counts and piece square dot products are computed over all boards; the scores equal getScore's.
+def evaluateMany(boards, playerToMove=None, movesRemaining=None):
+    boards = np.asarray(boards)
+    score = appleValue * ((boards == 2).sum(axis=(1, 2)) - (boards == -2).sum(axis=(1, 2))) \
+        + horseValue * ((boards == 1).sum(axis=(1, 2)) - (boards == -1).sum(axis=(1, 2)))
+    score += ((boards == 1) * maxPieceSquareTable).sum(axis=(1, 2)) - ((boards == -1) * minPieceSquareTable).sum(axis=(1, 2))
+
+    if attackDefenseTerms:
+        attacks = attack_maps.countAttacksMany(np.stack([boards == 1, boards == -1], axis=1)).astype(int)
+        for (row, col) in minDangerSquare:
+            score += attacks[:, 1, row, col]  # attackScore(state, 1)
+        for (row, col) in maxDangerSquare:
+            score -= attacks[:, 0, row, col]  # attackScore(state, -1)
+        for (row, col) in maxDangerSquare:
+            score += attacks[:, 0, row, col]  # defendScore(state, 1)
+        for (row, col) in minDangerSquare:
+            score -= attacks[:, 1, row, col]  # defendScore(state, -1)
+
+    # check if the state is a winning state
+    if assignedPlayer == 1:
+        score = np.where(boards[(slice(None),) + maxTargetSquare] == 1, 10000, score)
+    elif assignedPlayer == -1:
+        score = np.where(boards[(slice(None),) + minTargetSquare] == -1, -10000, score)
+    return score
+
+# Search board for any pieces and count the material and piece square parts of the score from scratch
+def getMaterialAndPlacement(board):
+    material, placement = 0, 0
     for row in range(boardHeight):
         for col in range(boardWidth):
-            score += materialValue(state.board[row, col])
-            if state.board[row, col] == 1:
-                score += maxPieceSquareTable[row, col]
-            elif state.board[row, col] == -1:
-                score -= minPieceSquareTable[row, col]
-    # score += attackScore(state, 1)
-    # score -= attackScore(state, -1)
-    # score += defendScore(state, 1)
-    # score -= defendScore(state, -1)
-
+            material += materialValue(board[row, col])
+            if board[row, col] == 1:
+                placement += maxSquareValues[row][col]
+            elif board[row, col] == -1:
+                placement -= minSquareValues[row][col]
+    return (material, placement)
+
+# Return getScore(state), looking the position up in the evaluation cache first
+def getCachedScore(state):
+    score = evalCache.lookup(state.key)
+    if score is None:
+        score = getScore(state)
+        if statsEnabled:
+            stats.evals += 1
+        evalCache.store(state.key, score)
     return score
 
+
 def materialValue(piece):
     if piece == 0:  # nothing there
         return 0
@@ -163,25 +258,13 @@ def defendScore(state, player):
     return score
 
 
+# number of the opponent's (-player's) horses a knight move away from (row, col), looked up in the attack maps
 def numAttackValue(state, player, row, col):
-    attackValue = 0
-    direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]
-    xStart, yStart = row, col
-    for (dx, dy) in direction:
-        (xEnd, yEnd) = (xStart + dx, yStart + dy)
-        if 0 <= xEnd < boardHeight and 0 <= yEnd < boardWidth and state.board[xEnd, yEnd] == -player:
-            attackValue += 1
-    return attackValue
+    return state.attacks[(1 + player) // 2][row * boardWidth + col]
 
+# number of player's horses a knight move away from (row, col), looked up in the attack maps
 def numDefenseValue(state, player, row, col):
-    defenseValue = 0
-    direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]
-    xStart, yStart = row, col
-    for (dx, dy) in direction:
-        (xEnd, yEnd) = (xStart + dx, yStart + dy)
-        if 0 <= xEnd < boardHeight and 0 <= yEnd < boardWidth and state.board[xEnd, yEnd] == player:
-            defenseValue += 1
-    return defenseValue
+    return state.attacks[(1 - player) // 2][row * boardWidth + col]
 
 # def pieceSquareValue(piece, row, col):
 #     if piece == 1:
@@ -192,29 +275,39 @@ def numDefenseValue(state, player, row, col):
 #         return 0
 
 
-# Check whether time limit has been reached
-def timeOut():
-    # return False  # no time out for debugging purposes
-    duration = datetime.now() - startTime
-    return duration.seconds + duration.microseconds * 1e-6 >= timeLimit
-
-
 # Use the minimax algorithm to look ahead <depthRemaining> moves and return the resulting score
 def lookAhead(state, depthRemaining, alpha, beta):
+    if statsEnabled:
+        stats.nodes += 1
     if depthRemaining == 0 or state.gameOver:
-        return getScore(state)
-
-    if timeOut():
-        return 0
+        if statsEnabled:
+            stats.leaves += 1
+        return getCachedScore(state)
+
+    clock.check()  # Raises SearchTimeout once the time limit has been reached
+
+    moveList = getMoveOptions(state)
+    if depthRemaining >= minTableDepth:
+        (tableScore, tableMove) = transpositionTable.lookup(state.key, depthRemaining, alpha, beta)
+        if statsEnabled:
+            stats.countProbe(tableScore, tableMove)
+        if tableScore is not None:
+            return tableScore
+        if tableMove in moveList:  # Try the best move from an earlier search first
+            moveList.remove(tableMove)
+            moveList.insert(0, tableMove)
 
     bestScore = -9e9 * state.playerToMove
+    bestMove = None
+    windowAlpha, windowBeta = alpha, beta
 
-    for move in getMoveOptions(state):
+    for (moveNumber, move) in enumerate(moveList):
         projectedState = makeMove(state, move)  # Try out every possible move...
         score = lookAhead(projectedState, depthRemaining - 1, alpha, beta)  # ... and score the resulting state
 
         if (state.playerToMove == 1 and score > bestScore) or (state.playerToMove == -1 and score < bestScore):
             bestScore = score  # Update bestScore if we have a new highest/lowest score for MAX/MIN
+            bestMove = move
 
         # alpha beta pruning
         if state.playerToMove == 1:
@@ -223,101 +316,175 @@ def lookAhead(state, depthRemaining, alpha, beta):
             beta = min(beta, bestScore)
 
         if beta <= alpha:
+            if statsEnabled:
+                stats.countCutoff(moveNumber)
             break
 
+    if depthRemaining >= minTableDepth:
+        transpositionTable.save(state.key, depthRemaining, windowAlpha, windowBeta, bestScore, bestMove)
     return bestScore
 
 
+# Derive the piece square tables used by getScore from maxPieceSquareTable (MIN's table is MAX's rotated by 180
+# degrees, unless initGeometry derived one for a layout that is not point-symmetric); called by initPlayer, and by
+# tuning.py whenever it changes the parameters
+def initEvaluation():
+    global minPieceSquareTable, maxSquareValues, minSquareValues
+    minPieceSquareTable = np.flip(maxPieceSquareTable) if derivedMinPieceSquareTable is None else derivedMinPieceSquareTable
+    maxSquareValues, minSquareValues = maxPieceSquareTable.tolist(), minPieceSquareTable.tolist()
+
+# Find the apples of the start position and derive what depends on the board and layout: the target squares, the
+# danger squares next to each apple, the move tables, and the piece square tables for boards and layouts other than
+# the standard one
+def initGeometry():
+    global maxTargetSquare, minTargetSquare, maxDangerSquare, maxSemiDangerSquare, minDangerSquare, minSemiDangerSquare
+    global moveTargets, maxPieceSquareTable, derivedMinPieceSquareTable
+    maxApple = tuple(int(c) for c in np.argwhere(startState.board == 2)[0])
+    minApple = tuple(int(c) for c in np.argwhere(startState.board == -2)[0])
+    maxTargetSquare, minTargetSquare = minApple, maxApple
+    maxDangerSquare = [tuple(square) for square in np.argwhere(moveDistanceFromAnySpot[maxApple] == 1).tolist()]
+    maxSemiDangerSquare = [tuple(square) for square in np.argwhere(moveDistanceFromAnySpot[maxApple] == 2).tolist()]
+    minDangerSquare = [tuple(square) for square in np.argwhere(moveDistanceFromAnySpot[minApple] == 1).tolist()]
+    minSemiDangerSquare = [tuple(square) for square in np.argwhere(moveDistanceFromAnySpot[minApple] == 2).tolist()]
+
+    direction = moveDirection if assignedPlayer == 1 else [(-dx, -dy) for (dx, dy) in moveDirection]  # min player moves left first
+    moveTargets = [[(row + dx) * boardWidth + col + dy for (dx, dy) in direction
+                    if 0 <= row + dx < boardHeight and 0 <= col + dy < boardWidth]
+                   for row in range(boardHeight) for col in range(boardWidth)]
+
+    derivedMinPieceSquareTable = None
+    if (boardHeight, boardWidth) != standardPieceSquareTable.shape or maxTargetSquare != (6, 5) or minTargetSquare != (0, 0):
+        maxPieceSquareTable = distancePieceSquareTable(maxTargetSquare)
+        if minTargetSquare != (boardHeight - 1 - maxTargetSquare[0], boardWidth - 1 - maxTargetSquare[1]):
+            derivedMinPieceSquareTable = distancePieceSquareTable(minTargetSquare)
+
+# Piece square table of a horse that attacks the apple on square <target>, from distanceSquareValues
+def distancePieceSquareTable(target):
+    distance = moveDistanceFromAnySpot[target]
+    values = np.array(distanceSquareValues + [0])
+    return values[np.minimum(np.where(distance < 0, len(distanceSquareValues), distance), len(distanceSquareValues))]
+
 # Set global variables and initialize any data structures that the player will need
 def initPlayer(_startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer):
-    global startState, timeLimit, victoryPoints, moveLimit, assignedPlayer, boardWidth, boardHeight
+    global startState, timeLimit, victoryPoints, moveLimit, assignedPlayer, boardWidth, boardHeight, workerPool
+    global transpositionTable, pieceKeys, evalCache, knightTargets, openingBook, maxPieceSquareTable
     startState, timeLimit, victoryPoints, moveLimit, assignedPlayer = _startState, _timeLimit, _victoryPoints, _moveLimit, _assignedPlayer
     # startState.board = np.transpose(startState.board)  # swap row and height to get the correct dimension
     (boardHeight, boardWidth) = startState.board.shape
+    maxPieceSquareTable = standardPieceSquareTable  # may be replaced by tuned values or, on other layouts, by initGeometry
+    parameters.loadParameters(sys.modules[__name__], parameterFile)
 
     initMoveDistanceFromAnySpot(boardHeight, boardWidth)
-    pass
+    initGeometry()
+    initEvaluation()
 
-def initMoveDistance(startX, startY, boardHeight, boardWidth):
-    direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]  # Possible (dx, dy) moves
+    pieceKeys = zobrist.getPieceKeys(boardHeight, boardWidth)
+    knightTargets = attack_maps.getKnightTargets(boardHeight, boardWidth)
+    transpositionTable = shared_tt.TranspositionTable(transpositionTableSize, transpositionTableName)
+    evalCache = eval_cache.EvalCache(evalCacheSize)
+    openingBook = opening_book.loadBook(openingBookFile)
 
-    # starting vars for the loop
-    moveDistanceMatrix = np.full((boardHeight, boardWidth), fill_value=-1)
-    moveDistanceMatrix[startX, startY] = 0  # start pos
-    processingTile = [(startX, startY)]
-    numMove = processingAmount = 1
+    if parallelWorkers > 0:
+        workerSettings = {'transpositionTableName': transpositionTable.name}  # Workers attach to our table
+        workerPool = parallel_search.startWorkers(__name__, parallelWorkers, workerSettings, startState, timeLimit,
+                                                  victoryPoints, moveLimit, assignedPlayer)
 
-    # iterate through the tiles we are considering
-    while len(processingTile) > 0:
-        tile = processingTile.pop(0)
-        processingAmount -= 1
+def initMoveDistanceFromAnySpot(boardHeight, boardWidth):
+    global moveDistanceFromAnySpot
+    # view of the shared knight distance table: moveDistanceFromAnySpot[i, j] is the distance matrix from spot (i, j)
+    moveDistanceFromAnySpot = knight_distance.getKnightDistances(boardHeight, boardWidth).reshape(
+        (boardHeight, boardWidth, boardHeight, boardWidth))
 
-        # try all moves from this tile
-        for (dx, dy) in direction:
-            (xEnd, yEnd) = (tile[0] + dx, tile[1] + dy)
-            if 0 <= xEnd < boardHeight and 0 <= yEnd < boardWidth and moveDistanceMatrix[xEnd, yEnd] == -1:
-                moveDistanceMatrix[xEnd, yEnd] = numMove
-                processingTile.append((xEnd, yEnd))
+# Free up memory if player used huge data structures
+def exitPlayer():
+    global workerPool, transpositionTable
+    parallel_search.stopWorkers(workerPool)
+    workerPool = None
+    transpositionTable.close()
+    transpositionTable = None
 
-        # next iteration of moves
-        if processingAmount <= 0:
-            processingAmount = len(processingTile)
-            numMove += 1
 
-    return moveDistanceMatrix
+# Return a copy of the referee's GameState <state> as this player's GameState, including its Zobrist key
+def rootState(state):
+    newState = GameState()
+    newState.board = np.copy(state.board)
+    newState.playerToMove = state.playerToMove
+    newState.movesRemaining = state.movesRemaining
+    newState.gameOver = state.gameOver
+    newState.points = state.points
+    newState.key = zobrist.boardKey(state.board, state.playerToMove, state.movesRemaining)
+    (newState.material, newState.placement) = getMaterialAndPlacement(state.board)
+    newState.attacks = attack_maps.initAttackMaps(state.board)
+    return newState
 
-def initMoveDistanceFromAnySpot(boardHeight, boardWidth):
-    global movesDistanceMatrix, moveDistanceFromAnySpot
-    moveDistanceFromAnySpot = [x[:] for x in [[0] * boardWidth] * boardHeight]  # make a 2d array of temporary all elems = 0
+# Search the moves in <moveList> by iterative deepening until the time limit is reached or a victory/defeat is
+# certain; return a list of (depth, move, score, complete, elapsed) tuples, one per depth
+def searchRootMoves(state, moveList):
+    results = []
+
+    # Iterative deepening loop
+    for lookAheadDepth in range(minLookAhead, maxLookAhead + 1):
+        currBestMove = None  # Best move and score currently found during the current iteration (lookAheadDepth)
+        currBestScore = -9e9 * state.playerToMove
+        clock.startIteration()
+        if statsEnabled:
+            stats.startIteration()
+
+        # Try every possible next move, evaluate it using Minimax, and pick the one with best score
+        try:
+            for move in moveList:
+                projectedState = makeMove(state, move)
+                score = lookAhead(projectedState,
+                                  lookAheadDepth - 1, alpha=-9e9, beta=9e9)  # Find score through MiniMax for current lookAheadDepth
+
+                if (state.playerToMove == 1 and score > currBestScore) or (
+                        state.playerToMove == -1 and score < currBestScore):
+                    currBestMove, currBestScore = move, score  # Found new best move during this iteration
+        except SearchTimeout:
+            results.append((lookAheadDepth, currBestMove, currBestScore, False, clock.elapsed()))
+            if statsEnabled:
+                stats.finishIteration(lookAheadDepth, False)
+            break
 
-    # create move distance from any spot matrix
-    for iBoard in range(len(moveDistanceFromAnySpot)):
-        for jBoard in range(len(moveDistanceFromAnySpot[iBoard])):
-            moveDistanceFromAnySpot[iBoard][jBoard] = initMoveDistance(iBoard, jBoard, boardHeight, boardWidth)
-    pass
+        clock.finishIteration()
+        results.append((lookAheadDepth, currBestMove, currBestScore, True, clock.elapsed()))
+        if statsEnabled:
+            stats.finishIteration(lookAheadDepth, True)
 
-# Free up memory if player used huge data structures
-def exitPlayer():
-    return
+        if abs(currBestScore) > victoryScoreThresh:  # Stop computation if certain victory/defeat predicted
+            break
+        if not clock.canFinishNextIteration():  # Don't start a depth that is predicted not to finish in time
+            break
+
+    return results
 
 # Compute the next move to be played; keep updating <favoredMove> until computation finished or time limit reached
 def getMove(state):
-    global startTime
-    startTime = datetime.now()  # Remember computation start time
+    clock.start(timeLimit)  # Remember computation start time
+    state = rootState(state)
     moveList = getMoveOptions(state)  # Get the list of possible moves
+    if openingBook is not None:  # Play the book move if this position is in the opening book
+        bookEntry = openingBook.lookup(state.board, state.playerToMove, state.movesRemaining)
+        if bookEntry is not None and bookEntry[0] in moveList:
+            return bookEntry[0]
+
     favoredMove = moveList[0]  # Just choose first move from the list for now, in case we run out of time
     favoredMoveScore = -9e9 * state.playerToMove  # Use this variable to remember the score for the favored move
 
-    # Iterative deepening loop
-    for lookAheadDepth in range(minLookAhead, maxLookAhead + 1):
-        currBestMove = None  # Best move and score currently found during the current iteration (lookAheadDepth)
-        currBestScore = -9e9 * state.playerToMove
+    if workerPool is not None:
+        results = parallel_search.searchInParallel(workerPool, sys.modules[__name__], state, moveList,
+                                                   victoryScoreThresh)
+    else:
+        results = searchRootMoves(state, moveList)
 
-        # Try every possible next move, evaluate it using Minimax, and pick the one with best score
-        for move in moveList:
-            projectedState = makeMove(state, move)
-            score = lookAhead(projectedState,
-                              lookAheadDepth - 1, alpha=-9e9, beta=9e9)  # Find score through MiniMax for current lookAheadDepth
-
-            if (state.playerToMove == 1 and score > currBestScore) or (
-                    state.playerToMove == -1 and score < currBestScore):
-                currBestMove, currBestScore = move, score  # Found new best move during this iteration
-
-            if timeOut():
-                break
-
-        if not timeOut():  # Pick the move from the last lookahead depth as new favorite, unless the lookahead was incomplete
-            favoredMove, favoredMoveScore = currBestMove, currBestScore
-            duration = datetime.now() - startTime
-            # print('Thomas: Depth %d finished at %.4f s, favored move (%d,%d)->(%d,%d), score = %.2f'
-            #       % (lookAheadDepth, duration.seconds + duration.microseconds * 1e-6,
-            #          favoredMove[0], favoredMove[1], favoredMove[2], favoredMove[3], favoredMoveScore))
-        else:
+    for (lookAheadDepth, currBestMove, currBestScore, complete, elapsed) in results:
+        if not complete:  # The lookahead was incomplete, so keep the move from the last lookahead depth
             # print('Thomas: Timeout!')
-            pass
-
-        if timeOut() or abs(
-                favoredMoveScore) > victoryScoreThresh:  # Stop computation if timeout or certain victory/defeat predicted
             break
 
+        favoredMove, favoredMoveScore = currBestMove, currBestScore
+        # print('Thomas: Depth %d finished at %.4f s, favored move (%d,%d)->(%d,%d), score = %.2f'
+        #       % (lookAheadDepth, elapsed,
+        #          favoredMove[0], favoredMove[1], favoredMove[2], favoredMove[3], favoredMoveScore))
+
     return favoredMove
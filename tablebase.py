@@ -0,0 +1,263 @@
+# Endgame tablebases for positions with few horses
+# Generated offline by retrograde analysis (python tablebase.py --horses 2) for every material configuration with
+# 1 to <maxHorses> horses per side, plus the two apples on their start squares. For each position, a table stores
+# the result for the player to move in plies: n > 0 means a forced win in n plies, n < 0 a loss after -n plies
+# (against best defense), and 0 a draw. The result does not depend on the number of remaining moves; a win in n
+# plies is only exact if n <= movesRemaining, otherwise the game is drawn by the move limit.
+# The start layout is point-symmetric (MIN's pieces are MAX's rotated by 180 degrees), so a position with MIN to
+# move is rotated and color-flipped into one with MAX to move, and only positions with MAX to move are stored.
+# Positions are indexed by the combinatorial ranks of the mover's and the opponent's sets of horse squares.
+# Each configuration is saved as one int16 .npy file that players memory-map.
+
+import argparse
+import itertools
+import math
+import os
+import numpy as np
+import game_rules
+
+direction = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2)]  # Possible (dx, dy) moves
+
+offBoard, ownApple, opponentApple = -1, -2, -3  # Special target codes in the move generator
+
+tableDirectory = os.path.dirname(os.path.abspath(__file__))  # Where tablebase files are written and looked up
+
+
+# Square numbering for tablebases on a (W, H) board with MAX's apple on square <appleSquare> (index x * H + y):
+# all squares except the two apples are numbered 0 ... numCells-1 ("cells"), and the 180 degree rotation maps
+# cell c to cell mirror[c].
+class Geometry(object):
+    __slots__ = ['boardWidth', 'boardHeight', 'appleSquare', 'squares', 'cellOfSquare', 'mirror', 'numCells',
+                 'binomial']
+
+    def __init__(self, boardWidth, boardHeight, appleSquare):
+        numSquares = boardWidth * boardHeight
+        (self.boardWidth, self.boardHeight, self.appleSquare) = (boardWidth, boardHeight, appleSquare)
+        self.squares = [s for s in range(numSquares) if s != appleSquare and s != numSquares - 1 - appleSquare]
+        self.numCells = len(self.squares)
+        self.cellOfSquare = [-1] * numSquares
+        for (cell, square) in enumerate(self.squares):
+            self.cellOfSquare[square] = cell
+        self.mirror = [self.cellOfSquare[numSquares - 1 - square] for square in self.squares]
+        self.binomial = [[math.comb(n, k) for n in range(self.numCells + 1)] for k in range(5)]  # n choose k
+
+    # Number of sets of <count> cells
+    def numSets(self, count):
+        return self.binomial[count][self.numCells]
+
+    # Rank of a sorted list of cells among all sets of the same size (colexicographic order)
+    def rank(self, cells):
+        return sum(self.binomial[k + 1][cell] for (k, cell) in enumerate(cells))
+
+    # For each cell and direction, the target cell or one of the special target codes (for MAX as the mover)
+    def targetTable(self):
+        targets = np.full((self.numCells, len(direction)), offBoard, dtype=np.int64)
+        for (cell, square) in enumerate(self.squares):
+            (x, y) = divmod(square, self.boardHeight)
+            for (d, (dx, dy)) in enumerate(direction):
+                if 0 <= x + dx < self.boardWidth and 0 <= y + dy < self.boardHeight:
+                    target = (x + dx) * self.boardHeight + y + dy
+                    if target == self.appleSquare:
+                        targets[cell, d] = ownApple
+                    elif self.cellOfSquare[target] == -1:
+                        targets[cell, d] = opponentApple
+                    else:
+                        targets[cell, d] = self.cellOfSquare[target]
+        return targets
+
+
+def fileName(geometry, numMover, numOpponent, directory=None):
+    return os.path.join(directory or tableDirectory, 'tablebase_%dx%d_%d_%dv%d.npy' % (
+        geometry.boardWidth, geometry.boardHeight, geometry.appleSquare, numMover, numOpponent))
+
+
+# Return the MAX apple's square for the start position <board>, or None if MIN's apple is not on the rotated square:
+# the tables rely on the point symmetry of the apples, so other layouts have no tablebases
+def appleSquareOf(board):
+    flatBoard = board.ravel()
+    appleSquare = int(np.flatnonzero(flatBoard == 2)[0])
+    if flatBoard[len(flatBoard) - 1 - appleSquare] != -2:
+        return None
+    return appleSquare
+
+
+# Tablebases loaded for one board geometry; probe() returns None for positions they do not cover
+class Tablebases(object):
+    __slots__ = ['geometry', 'tables', 'maxHorses', 'probes', 'hits']
+
+    def __init__(self, geometry, tables):
+        self.geometry = geometry
+        self.tables = tables  # (numMover, numOpponent) -> int16 array
+        self.maxHorses = max(max(config) for config in tables)
+        self.probes = self.hits = 0
+
+    # Return the result (in plies, for the player to move) of the position, or None if it is not covered
+    def probe(self, board, playerToMove):
+        self.probes += 1
+        flatBoard = board.ravel()
+        maxSquares = np.flatnonzero(flatBoard == 1).tolist()
+        minSquares = np.flatnonzero(flatBoard == -1).tolist()
+        if len(maxSquares) > self.maxHorses or len(minSquares) > self.maxHorses:
+            return None
+
+        geometry = self.geometry
+        if playerToMove == 1:
+            mover = [geometry.cellOfSquare[square] for square in maxSquares]
+            opponent = [geometry.cellOfSquare[square] for square in minSquares]
+        else:  # Rotate the board by 180 degrees and swap colors
+            mover = sorted(geometry.mirror[geometry.cellOfSquare[square]] for square in minSquares)
+            opponent = sorted(geometry.mirror[geometry.cellOfSquare[square]] for square in maxSquares)
+        table = self.tables.get((len(mover), len(opponent)))
+        if table is None:
+            return None
+        self.hits += 1
+        return int(table[geometry.rank(mover) * geometry.numSets(len(opponent)) + geometry.rank(opponent)])
+
+
+# Load all tablebase files for a (W, H) board with MAX's apple on <appleSquare> (and MIN's on the rotated square);
+# return None if there are none, or if <appleSquare> is None
+def loadTablebases(boardWidth, boardHeight, appleSquare, directory=None):
+    if appleSquare is None:
+        return None
+    geometry = Geometry(boardWidth, boardHeight, appleSquare)
+    tables = {}
+    for numMover in range(1, 5):
+        for numOpponent in range(1, 5):
+            if os.path.exists(fileName(geometry, numMover, numOpponent, directory)):
+                tables[(numMover, numOpponent)] = np.load(fileName(geometry, numMover, numOpponent, directory),
+                                                          mmap_mode='r')
+    return Tablebases(geometry, tables) if len(tables) > 0 else None
+
+
+# Convert a tablebase result for a position into the points of the game (from MAX's perspective)
+def resultPoints(result, playerToMove, movesRemaining, victoryPoints):
+    if 0 < result <= movesRemaining:
+        return playerToMove * (victoryPoints + movesRemaining - result)
+    if 0 < -result <= movesRemaining:
+        return -playerToMove * (victoryPoints + movesRemaining + result)
+    return 0
+
+
+# Return the combinatorial ranks of many sets of cells at once (each row of <cells> sorted)
+def rankMany(geometry, cells):
+    binomial = np.array(geometry.binomial, dtype=np.int64)
+    return sum(binomial[k + 1][cells[:, k]] for k in range(cells.shape[1]))
+
+
+# Return arrays of all valid positions (mover's cells, opponent's cells) of a configuration and their indices
+def enumeratePositions(geometry, numMover, numOpponent):
+    moverSets = np.array(list(itertools.combinations(range(geometry.numCells), numMover)), dtype=np.int64)
+    opponentSets = np.array(list(itertools.combinations(range(geometry.numCells), numOpponent)), dtype=np.int64)
+    mover = np.repeat(moverSets, len(opponentSets), axis=0)
+    opponent = np.tile(opponentSets, (len(moverSets), 1))
+    valid = ~(mover[:, :, None] == opponent[:, None, :]).any(axis=(1, 2))
+    (mover, opponent) = (mover[valid], opponent[valid])
+    return (mover, opponent, rankMany(geometry, mover) * geometry.numSets(numOpponent) + rankMany(geometry, opponent))
+
+
+# Generate the move graph of a configuration: positions with an immediate win and the edges (parent, child) to all
+# other successors, with children given as (configuration, index) in their MAX-to-move form
+def generateMoves(geometry, numMover, numOpponent):
+    (mover, opponent, index) = enumeratePositions(geometry, numMover, numOpponent)
+    targets = geometry.targetTable()
+    mirror = np.array(geometry.mirror, dtype=np.int64)
+    immediateWin = np.zeros(geometry.numSets(numMover) * geometry.numSets(numOpponent), dtype=bool)
+    edges = {}  # child configuration -> list of (parent index array, child index array)
+
+    for k in range(numMover):
+        for d in range(len(direction)):
+            target = targets[mover[:, k], d]
+            immediateWin[index[target == opponentApple]] = True
+            legal = (target >= 0) & ~(mover == target[:, None]).any(axis=1)
+            capture = legal & (opponent == target[:, None]).any(axis=1)
+
+            newMover = mover.copy()
+            newMover[:, k] = target
+            for captured in (False, True):
+                selected = legal & (capture == captured)
+                (parentIndex, childOpponent, childMover) = (index[selected], newMover[selected], opponent[selected])
+                if captured:
+                    if numOpponent == 1:  # The opponent's last horse was captured
+                        immediateWin[parentIndex] = True
+                        continue
+                    childMover = childMover[childMover != target[selected, None]].reshape(-1, numOpponent - 1)
+                # After the move, the opponent moves: rotate and swap colors to get back to MAX to move
+                childMover = np.sort(mirror[childMover], axis=1)
+                childOpponent = np.sort(mirror[childOpponent], axis=1)
+                childConfig = (childMover.shape[1], numMover)
+                childIndex = rankMany(geometry, childMover) * geometry.numSets(numMover) + rankMany(geometry, childOpponent)
+                edges.setdefault(childConfig, []).append((parentIndex, childIndex))
+    return (immediateWin, edges)
+
+
+# Solve all configurations with the same total number of horses by retrograde analysis, given the solved tables
+# of all smaller configurations (in <solved>)
+def solveGroup(geometry, configs, solved):
+    offsets = {}
+    total = 0
+    for config in list(solved) + configs:  # One index space over all tables involved
+        offsets[config] = total
+        total += geometry.numSets(config[0]) * geometry.numSets(config[1])
+    values = np.zeros(total, dtype=np.int16)
+    for (config, table) in solved.items():
+        values[offsets[config]:offsets[config] + len(table)] = table
+
+    groupStart = offsets[configs[0]]
+    parents, children = [], []
+    for config in configs:
+        (immediateWin, edges) = generateMoves(geometry, *config)
+        values[offsets[config]:offsets[config] + len(immediateWin)][immediateWin] = 1
+        for (childConfig, edgeList) in edges.items():
+            for (parentIndex, childIndex) in edgeList:
+                parents.append(parentIndex + offsets[config] - groupStart)
+                children.append(childIndex + offsets[childConfig])
+    (parents, children) = (np.concatenate(parents), np.concatenate(children))
+    groupValues = values[groupStart:]  # A view: updates go to <values>
+    degree = np.bincount(parents, minlength=len(groupValues))
+
+    plies = 2
+    while plies <= int(np.abs(values).max()) + 1:
+        childValues = values[children]
+        unresolved = groupValues == 0
+        # Win in <plies> if some move leads to a position lost after plies - 1 for the opponent
+        win = unresolved & (np.bincount(parents, weights=childValues == 1 - plies, minlength=len(groupValues)) > 0)
+        # Loss if every move leads to a position won by the opponent; it takes as long as the slowest of those wins
+        loss = unresolved & (degree > 0) & (np.bincount(parents, weights=childValues > 0,
+                                                        minlength=len(groupValues)) == degree)
+        if loss.any():
+            lossEdges = loss[parents]
+            slowest = np.zeros(len(groupValues), dtype=np.int16)
+            np.maximum.at(slowest, parents[lossEdges], childValues[lossEdges])
+            groupValues[loss] = -1 - slowest[loss]
+        groupValues[win] = plies
+        plies += 1
+
+    return {config: values[offsets[config]:offsets[config] + geometry.numSets(config[0]) * geometry.numSets(config[1])].copy()
+            for config in configs}
+
+
+# Generate and save the tablebases for up to <maxHorses> horses per side
+def generateTablebases(boardWidth, boardHeight, appleSquare, maxHorses, directory=None):
+    geometry = Geometry(boardWidth, boardHeight, appleSquare)
+    solved = {}
+    for totalHorses in range(2, 2 * maxHorses + 1):
+        configs = [(numMover, totalHorses - numMover) for numMover in range(1, maxHorses + 1)
+                   if 1 <= totalHorses - numMover <= maxHorses]
+        for (config, table) in solveGroup(geometry, configs, solved).items():
+            solved[config] = table
+            tempFileName = fileName(geometry, *config, directory=directory) + '.tmp'
+            with open(tempFileName, 'wb') as file:
+                np.save(file, table)
+            os.replace(tempFileName, fileName(geometry, *config, directory=directory))
+            print('%dv%d: %d wins, %d losses, longest win %d plies' % (config[0], config[1], np.sum(table > 0),
+                                                                      np.sum(table < 0), table.max()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate endgame tablebases by retrograde analysis.')
+    parser.add_argument('--horses', type=int, default=2, help='maximum number of horses per side')
+    parser.add_argument('--directory', default=None, help='directory for the tablebase files')
+    args = parser.parse_args()
+    startBoard = game_rules.initialState().board
+    generateTablebases(game_rules.boardWidth, game_rules.boardHeight, appleSquareOf(startBoard), args.horses,
+                       args.directory)
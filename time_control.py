@@ -0,0 +1,102 @@
+# Time control shared by the searching players
+# The clock is read with time.perf_counter only once every <checkInterval> nodes, where the interval
+# adapts so that the clock is read roughly every <checkPeriod> seconds, and an expired
+# deadline unwinds the whole search by raising SearchTimeout instead of returning a fake score.
+# It also remembers how long each iterative deepening depth took, so a player can skip the next
+# depth if it is predicted not to finish within the time limit.
+# A node budget (<nodeLimit>, kept across moves) aborts the search the same way after a fixed number of nodes,
+# which makes searches reproducible and independent of the machine's speed.
+
+import time
+
+
+# Raised inside the search when the time limit has been reached; caught by the player's getMove
+class SearchTimeout(Exception):
+    pass
+
+
+class TimeControl(object):
+    __slots__ = ['timeLimit', 'checkInterval', 'checkPeriod', 'minGrowth', 'maxGrowth', 'startTime', 'deadline',
+                 'nodeLimit', 'nodeCount', 'nextCheck', 'lastCheck', 'aborted', 'iterationStart', 'iterationTimes']
+
+    def __init__(self, checkPeriod=0.005, minGrowth=1.5, maxGrowth=12.0):
+        self.timeLimit = 0.0
+        self.checkInterval = 16             # Number of nodes between two reads of the clock
+        self.checkPeriod = checkPeriod      # Desired time (in seconds) between two reads of the clock
+        self.minGrowth = minGrowth          # Bounds for the predicted time ratio between two depths
+        self.maxGrowth = maxGrowth
+        self.nodeLimit = None               # Maximum number of nodes per move computation (None -> no limit)
+        self.start(0.0)
+
+    # Start timing a new move computation with <timeLimit> seconds of thinking time
+    def start(self, timeLimit):
+        self.timeLimit = timeLimit
+        self.startTime = time.perf_counter()
+        self.deadline = self.startTime + timeLimit
+        self.nodeCount = 0
+        self.nextCheck = self.checkInterval if self.nodeLimit is None else min(self.checkInterval, self.nodeLimit)
+        self.lastCheck = self.startTime
+        self.aborted = False
+        self.iterationStart = self.startTime
+        self.iterationTimes = []
+
+    # Count a search node; raise SearchTimeout if the time limit or the node budget has been reached
+    def check(self):
+        self.nodeCount += 1
+        if self.nodeCount >= self.nextCheck:
+            if self.nodeLimit is not None and self.nodeCount >= self.nodeLimit:
+                self.aborted = True
+                raise SearchTimeout()
+            now = time.perf_counter()
+            if now >= self.deadline:
+                self.aborted = True
+                raise SearchTimeout()
+
+            if now - self.lastCheck > self.checkPeriod and self.checkInterval > 1:  # Nodes got more expensive
+                self.checkInterval //= 2
+            elif now - self.lastCheck < 0.5 * self.checkPeriod and self.checkInterval < 4096:
+                self.checkInterval *= 2
+            self.lastCheck = now
+            self.nextCheck = self.nodeCount + self.checkInterval
+            if self.nodeLimit is not None:
+                self.nextCheck = min(self.nextCheck, self.nodeLimit)
+
+    # Count <nodes> nodes searched outside of check() (e.g. by a proof-number search) against the node budget
+    def addNodes(self, nodes):
+        self.nodeCount += nodes
+
+    # Check whether time limit has been reached (reads the clock immediately)
+    def timeOut(self):
+        if not self.aborted and time.perf_counter() >= self.deadline:
+            self.aborted = True
+        return self.aborted
+
+    # Seconds since start() was called
+    def elapsed(self):
+        return time.perf_counter() - self.startTime
+
+    # Seconds left until the deadline
+    def remaining(self):
+        return self.deadline - time.perf_counter()
+
+    # Call before starting an iterative deepening iteration
+    def startIteration(self):
+        self.iterationStart = time.perf_counter()
+
+    # Call after an iteration completed; remembers its duration for the prediction
+    def finishIteration(self):
+        self.iterationTimes.append(time.perf_counter() - self.iterationStart)
+
+    # Predict whether the next iteration can finish before the deadline, assuming that it takes
+    # as much longer than the last one as the last one took compared to the one before
+    def canFinishNextIteration(self):
+        if self.timeOut():
+            return False
+        if len(self.iterationTimes) == 0:
+            return True
+
+        lastTime = self.iterationTimes[-1]
+        growth = self.minGrowth
+        if len(self.iterationTimes) >= 2 and self.iterationTimes[-2] > 0.0:
+            growth = min(self.maxGrowth, max(self.minGrowth, lastTime / self.iterationTimes[-2]))
+        return lastTime * growth <= self.remaining()
@@ -0,0 +1,380 @@
+# Resumable round-robin tournaments with an on-disk job queue
+#     python tournament.py --db tournament.db create Dark_Knight suncharn_pipithkul Knight_Rider --rounds 2 --nodes 20000 --seed 1
+#     python tournament.py --db tournament.db run --workers 4
+#     python tournament.py --db tournament.db standings
+# <create> writes the settings and the complete pairing schedule (every ordered pair of players, <rounds> times, in
+# an order shuffled with the seed) to an SQLite database. <run> starts worker processes that claim one pending game
+# at a time in a transaction, play it with the referee (see referee.py), and record its result in another one, so
+# any number of <run> commands on the same machine can work on the same tournament at the same time. A claim is a
+# lease that the worker renews after every move; if the machine or a worker dies or hangs, the lease of its game
+# runs out after <leaseTime> seconds and the game goes back into the queue, and all finished games are kept. <standings> ranks the players by the finished games, like HoldYourHorses.computerTournament.
+# Game results are also kept in a cache database (<cache>, shared by all tournaments), under the fingerprints of both
+# players (see playerFingerprint), the match settings, and the round. <create> takes every game it finds there from
+# the cache, so after changing one player in a large field, only the games of that player are played again. Every
+# game is seeded by its pairing and round rather than by its place in the schedule, so with a seed in the fixed mode
+# (see referee.py) a cached game is exactly the game that would be played. Timed or unseeded games are not
+# reproducible, so their tournaments neither read nor write the cache.
+# With an opening suite (--openings, see openings.py), every round plays every opening with each ordered pair of
+# players, i.e. every opening twice per pair of players with the colors reversed.
+
+import argparse
+import ast
+import contextlib
+import glob
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+import zlib
+import game_rules
+import referee
+
+cacheFile = 'tournament_cache.db'  # Default cache database of game results
+leaseTime = 300.0                  # Seconds after the last move of a running game until other workers may take it over
+pathFunctions = {'os.path.join': os.path.join, 'os.path.dirname': os.path.dirname,
+                 'os.path.abspath': os.path.abspath}  # Functions that staticValue evaluates
+
+schema = """
+CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,         -- Game number (position in the shuffled schedule)
+    player1 TEXT, player2 TEXT,     -- Players of MAX and MIN
+    round INTEGER,                  -- Number of the game among the games of the same ordered pair (see gameOpening)
+    status TEXT DEFAULT 'pending',  -- 'pending', 'running', or 'done'
+    worker INTEGER,                 -- Process id of the worker that claimed the game
+    lease REAL,                     -- Time until which the claim holds, renewed by the worker after every move
+    points1 INTEGER, points2 INTEGER, moves TEXT, started REAL, finished REAL,
+    cached INTEGER DEFAULT 0);      -- 1 if the result was taken from the cache
+CREATE INDEX IF NOT EXISTS gameStatus ON games (status);
+"""
+
+cacheSchema = """
+CREATE TABLE IF NOT EXISTS results (fingerprint1 TEXT, fingerprint2 TEXT, settings TEXT, round INTEGER,
+    points1 INTEGER, points2 INTEGER, moves TEXT, PRIMARY KEY (fingerprint1, fingerprint2, settings, round));
+"""
+
+
+def connect(fileName, databaseSchema=schema):
+    connection = sqlite3.connect(fileName, timeout=60.0, isolation_level=None)  # Transactions are explicit
+    connection.executescript(databaseSchema)
+    return connection
+
+
+def readSettings(connection):
+    return {name: json.loads(value) for (name, value) in connection.execute('SELECT name, value FROM settings')}
+
+
+# Value of expression <node> from the source of a module, for the forms used by the data-file globals of the players
+# (strings, None, other such globals, +, and os.path.join / dirname / abspath); raise ValueError for anything else
+def staticValue(node, variables):
+    if isinstance(node, ast.Constant) and (node.value is None or isinstance(node.value, str)):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in variables:
+        return variables[node.id]
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return staticValue(node.left, variables) + staticValue(node.right, variables)
+    if isinstance(node, ast.Call) and ast.unparse(node.func) in pathFunctions and len(node.keywords) == 0:
+        return pathFunctions[ast.unparse(node.func)](*[staticValue(argument, variables) for argument in node.args])
+    raise ValueError('not a static value')
+
+
+# Return the global variables of module source <tree> (from file <moduleFile>) whose values staticValue can find
+def staticGlobals(tree, moduleFile):
+    variables = {'__file__': moduleFile}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                variables[node.targets[0].id] = staticValue(node.value, variables)
+            except (ValueError, TypeError):
+                pass
+    return variables
+
+
+# Return the names of the modules that module source <tree> imports, except in its "if __name__ == '__main__':" block
+# (the command line of a module does not change how a player plays)
+def importedModules(tree):
+    (moduleNames, pending) = ([], list(tree.body))
+    while len(pending) > 0:
+        node = pending.pop()
+        if isinstance(node, ast.If) and ast.unparse(node.test) == "__name__ == '__main__'":
+            pending += node.orelse
+            continue
+        if isinstance(node, ast.Import):
+            moduleNames += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            moduleNames.append(node.module)
+        pending += ast.iter_child_nodes(node)
+    return moduleNames
+
+
+# Return a fingerprint of player <playerName>: a hash of its source, the sources of the local modules that it imports
+# (directly or indirectly), its parameter and opening book files, and the names, sizes and times of the tablebase
+# files it would load, so anything that can change its play changes it.
+# The player is not imported: its file is found with importlib, and the data files are read from its parsed source
+def playerFingerprint(playerName):
+    playerFile = importlib.util.find_spec(playerName).origin
+    directory = os.path.dirname(os.path.abspath(playerFile))
+    with open(playerFile, 'rb') as file:
+        playerGlobals = staticGlobals(ast.parse(file.read()), playerFile)
+    digest = hashlib.sha256()
+    (pending, seen) = ([playerName], set())
+    while len(pending) > 0:
+        moduleName = pending.pop()
+        moduleFile = os.path.join(directory, moduleName + '.py')
+        if moduleName in seen or not os.path.exists(moduleFile):  # Standard library and installed packages are skipped
+            continue
+        seen.add(moduleName)
+        with open(moduleFile, 'rb') as file:
+            source = file.read()
+        digest.update(moduleName.encode() + b'\0' + source)
+        pending += importedModules(ast.parse(source))
+    for variable in ('parameterFile', 'openingBookFile'):
+        dataFile = playerGlobals.get(variable)
+        if dataFile is not None and os.path.exists(dataFile):
+            with open(dataFile, 'rb') as file:
+                digest.update(variable.encode() + b'\0' + file.read())
+    if 'tablebase' in seen:  # Tablebases can be large, so their sizes and modification times stand for their contents
+        tableDirectory = playerGlobals.get('tablebaseDirectory') or directory
+        for tableFile in sorted(glob.glob(os.path.join(tableDirectory, 'tablebase_*.npy'))):
+            fileStatus = os.stat(tableFile)
+            digest.update(('%s %d %d' % (os.path.basename(tableFile), fileStatus.st_size, fileStatus.st_mtime_ns)).encode())
+    return digest.hexdigest()[:16]
+
+
+# Key of the match settings under which results are cached
+def settingsKey(settings):
+    key = {'time': settings['time'], 'nodes': settings['nodes'], 'depth': settings['depth'], 'seed': settings['seed'],
+           'victoryPoints': game_rules.victoryPoints, 'moveLimit': game_rules.moveLimit}
+    if settings.get('board') is not None:  # Only for other start boards, so results from the standard one stay valid
+        key['board'] = settings['board']
+    if settings.get('openings') is not None:
+        key['openings'] = hashlib.sha256(json.dumps(settings['openings']).encode()).hexdigest()[:16]
+    return json.dumps(key, sort_keys=True)
+
+
+# Return the opening moves of the game with number <gameRound> among the games of an ordered pair: with an opening
+# suite, the games of every round play the openings in turn
+def gameOpening(settings, gameRound):
+    if settings.get('openings') is None:
+        return ()
+    return settings['openings'][gameRound % len(settings['openings'])]
+
+
+# Match settings of the games of a tournament
+def matchSettings(settings):
+    startBoard = None if settings.get('board') is None else game_rules.boardFromDiagram(settings['board'])
+    return referee.MatchSettings(settings['time'], settings['nodes'], settings['depth'], settings['seed'], startBoard)
+
+
+# Number that seeds the game of <player1> (MAX) against <player2> in round <gameRound>
+def gameNumber(player1, player2, gameRound):
+    return zlib.crc32(('%s %s %d' % (player1, player2, gameRound)).encode())
+
+
+def createTournament(fileName, playerNames, rounds, settings, cacheFileName):
+    connection = connect(fileName)
+    if connection.execute('SELECT COUNT(*) FROM games').fetchone()[0] > 0:
+        raise ValueError('%s already holds a tournament' % fileName)
+    missingPlayers = sorted(set(playerNames) - set(referee.discoverPlayers()))
+    if len(missingPlayers) > 0:
+        raise ValueError('No player module named %s' % ', '.join(missingPlayers))
+    fingerprints = {playerName: playerFingerprint(playerName) for playerName in playerNames}
+    numGames = rounds * (1 if settings.get('openings') is None else len(settings['openings']))  # Per ordered pair
+    gameList = [(player1, player2, gameRound) for gameRound in range(numGames) for player1 in playerNames
+                for player2 in playerNames if player1 != player2]
+    random.Random(settings['seed']).shuffle(gameList)
+
+    if cacheFileName is not None and not (matchSettings(settings).fixed() and settings['seed'] is not None):
+        print('The games are not reproducible without a seed in the fixed mode; the cache is not used')
+        cacheFileName = None
+    rows = []
+    cache = connect(cacheFileName, cacheSchema) if cacheFileName is not None else None
+    for (player1, player2, gameRound) in gameList:
+        result = None
+        if cache is not None:
+            result = cache.execute('SELECT points1, points2, moves FROM results WHERE fingerprint1 = ? AND '
+                                   'fingerprint2 = ? AND settings = ? AND round = ?',
+                                   (fingerprints[player1], fingerprints[player2], settingsKey(settings), gameRound)).fetchone()
+        if result is None:
+            rows.append((player1, player2, gameRound, 'pending', None, None, None, 0))
+        else:
+            rows.append((player1, player2, gameRound, 'done') + tuple(result) + (1,))
+
+    connection.execute('BEGIN IMMEDIATE')
+    settings = dict(settings, players=playerNames, fingerprints=fingerprints, cache=cacheFileName)
+    connection.executemany('INSERT INTO settings VALUES (?, ?)',
+                           [(name, json.dumps(value)) for (name, value) in settings.items()])
+    connection.executemany('INSERT INTO games (player1, player2, round, status, points1, points2, moves, cached) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    connection.execute('COMMIT')
+    numCached = sum(row[-1] for row in rows)
+    print('%d games scheduled in %s, %d of them taken from the cache' % (len(gameList), fileName, numCached))
+
+
+# Put running games whose lease has run out (the worker or the machine died, or the worker hangs) back into the queue
+def releaseStaleGames(connection):
+    cursor = connection.execute("UPDATE games SET status = 'pending', worker = NULL, lease = NULL "
+                                "WHERE status = 'running' AND lease < ?", (time.time(),))
+    if cursor.rowcount > 0:
+        print('%d interrupted games put back into the queue' % cursor.rowcount)
+    claimed = connection.execute("SELECT COUNT(*), MAX(lease) FROM games WHERE status = 'running'").fetchone()
+    if claimed[0] > 0:
+        print('%d games claimed by other workers (all leases run out within %.0f s)' % (claimed[0], claimed[1] - time.time()))
+
+
+# Claim the next pending game, or a running game whose lease has run out; return (id, player1, player2, round), or
+# None if there is none
+def claimGame(connection, leaseTime):
+    connection.execute('BEGIN IMMEDIATE')   # Locks the database for writing, so no two workers claim the same game
+    now = time.time()
+    row = connection.execute("SELECT id, player1, player2, round FROM games WHERE status = 'pending' OR "
+                             "(status = 'running' AND lease < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+    if row is not None:
+        connection.execute("UPDATE games SET status = 'running', worker = ?, lease = ?, started = ? WHERE id = ?",
+                           (os.getpid(), now + leaseTime, now, row[0]))
+    connection.execute('COMMIT')
+    return row
+
+
+# Return a function that extends the lease of game <gameId> (unless another worker has taken it over), writing to the
+# database at most every tenth of the lease time
+def leaseRenewal(connection, gameId, leaseTime):
+    lastRenewal = [time.time()]
+
+    def renewLease():
+        now = time.time()
+        if now - lastRenewal[0] >= 0.1 * leaseTime:
+            connection.execute("UPDATE games SET lease = ? WHERE id = ? AND status = 'running' AND worker = ?",
+                               (now + leaseTime, gameId, os.getpid()))
+            lastRenewal[0] = now
+
+    return renewLease
+
+
+# Record the result of game <gameId>; return False if the lease had run out and another worker has taken it over
+def recordGame(connection, gameId, points1, points2, moves):
+    connection.execute('BEGIN IMMEDIATE')
+    cursor = connection.execute("UPDATE games SET status = 'done', points1 = ?, points2 = ?, moves = ?, finished = ?, "
+                                "lease = NULL WHERE id = ? AND status = 'running' AND worker = ?",
+                                (points1, points2, json.dumps(moves), time.time(), gameId, os.getpid()))
+    connection.execute('COMMIT')
+    return cursor.rowcount > 0
+
+
+# Play pending games until the queue is empty; a worker only imports the players of the games it plays
+def runWorker(fileName, leaseTime=leaseTime):
+    connection = connect(fileName)
+    settings = readSettings(connection)
+    gameSettings = matchSettings(settings)
+    cache = connect(settings['cache'], cacheSchema) if settings['cache'] is not None else None
+    modules = {}
+    while True:
+        job = claimGame(connection, leaseTime)
+        if job is None:
+            break
+        (gameId, player1, player2, gameRound) = job
+        changedPlayers = [playerName for playerName in (player1, player2) if playerName not in modules
+                          and playerFingerprint(playerName) != settings['fingerprints'][playerName]]
+        if len(changedPlayers) > 0:
+            connection.execute("UPDATE games SET status = 'pending', worker = NULL, lease = NULL WHERE id = ?", (gameId,))
+            print('%s has changed since the tournament was created; create a new one' % changedPlayers[0])
+            break
+        for playerName in (player1, player2):
+            if playerName not in modules:
+                modules[playerName] = referee.loadPlayer(playerName)
+        with contextlib.redirect_stdout(io.StringIO()):  # The players' own output
+            (points1, points2, moves) = referee.playGame([modules[player1], modules[player2]], gameSettings,
+                                                         gameNumber(player1, player2, gameRound),
+                                                         opening=gameOpening(settings, gameRound),
+                                                         onMove=leaseRenewal(connection, gameId, leaseTime))
+        if not recordGame(connection, gameId, points1, points2, moves):
+            print('Game %d was taken over by another worker after its lease ran out' % gameId)
+            continue
+        if cache is not None:
+            cache.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                          (settings['fingerprints'][player1], settings['fingerprints'][player2], settingsKey(settings),
+                           gameRound, points1, points2, json.dumps(moves)))
+        print('Game %d: %s vs. %s %d - %d (%d moves)' % (gameId, player1, player2, points1, points2, len(moves)))
+    connection.close()
+
+
+def runTournament(fileName, numWorkers, leaseTime=leaseTime):
+    connection = connect(fileName)
+    releaseStaleGames(connection)
+    (done, total) = connection.execute("SELECT SUM(status = 'done'), COUNT(*) FROM games").fetchone()
+    connection.close()
+    print('%d of %d games finished' % (done or 0, total))
+    if numWorkers <= 1:
+        runWorker(fileName, leaseTime)
+    else:
+        workers = [multiprocessing.Process(target=runWorker, args=(fileName, leaseTime)) for _ in range(numWorkers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    printStandings(fileName)
+
+
+def printStandings(fileName):
+    connection = connect(fileName)
+    playerNames = readSettings(connection)['players']
+    victories = {playerName: 0.0 for playerName in playerNames}
+    points = {playerName: 0 for playerName in playerNames}
+    rows = connection.execute("SELECT player1, player2, points1, points2 FROM games WHERE status = 'done'").fetchall()
+    for (player1, player2, points1, points2) in rows:
+        points[player1] += points1
+        points[player2] += points2
+        if points1 > points2:
+            victories[player1] += 1
+        elif points1 < points2:
+            victories[player2] += 1
+        else:
+            victories[player1] += 0.5
+            victories[player2] += 0.5
+    total = connection.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+    connection.close()
+    print('\n%d of %d games finished' % (len(rows), total))
+    referee.printStandings(victories, points)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Resumable round-robin tournaments.')
+    parser.add_argument('--db', default='tournament.db', help='tournament database')
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help='schedule a new tournament')
+    create.add_argument('players', nargs='+', help='player modules')
+    create.add_argument('--rounds', type=int, default=1, help='number of games per ordered pair of players')
+    create.add_argument('--time', type=float, default=game_rules.timeLimit, help='thinking time per move')
+    create.add_argument('--nodes', type=int, default=None, help='node budget per move (fixed mode)')
+    create.add_argument('--depth', type=int, default=None, help='search depth (fixed mode)')
+    create.add_argument('--seed', type=int, default=None, help='seed for the schedule and the players')
+    create.add_argument('--cache', default=cacheFile, help='cache database of game results')
+    create.add_argument('--no-cache', action='store_true', help='play all games, and do not cache the results')
+    create.add_argument('--board', default=None, help='board size <width>x<height> with the standard layout')
+    create.add_argument('--layout', default=None, help='JSON file with the board diagram of the start position')
+    create.add_argument('--openings', default=None, help='opening suite file (see openings.py)')
+    run = commands.add_parser('run', help='play the pending games')
+    run.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    run.add_argument('--lease', type=float, default=leaseTime, help='seconds without a move until a game is taken over')
+    commands.add_parser('standings', help='print the standings of the finished games')
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        (startBoard, openings) = (referee.loadStartBoard(args.board, args.layout), None)
+        if args.openings is not None:
+            (suiteBoard, suite) = referee.loadOpeningSuite(args.openings)
+            (startBoard, openings) = (suiteBoard if suiteBoard is not None else startBoard, [opening['moves'] for opening in suite])
+        createTournament(args.db, args.players, args.rounds,
+                         {'time': args.time, 'nodes': args.nodes, 'depth': args.depth, 'seed': args.seed,
+                          'board': None if startBoard is None else game_rules.boardToDiagram(startBoard),
+                          'openings': openings},
+                         None if args.no_cache else args.cache)
+    elif args.command == 'run':
+        runTournament(args.db, args.workers, args.lease)
+    else:
+        printStandings(args.db)
@@ -0,0 +1,150 @@
+# Texel-style tuning of a player's evaluation parameters from recorded games
+#     python tuning.py --engine suncharn_pipithkul --data selfplay --epochs 500 --output suncharn_pipithkul_parameters.json
+# The tuner looks for the parameters (the player's <tunableParameters>) for which sigmoid(K * score) best predicts
+# the results of the games that the positions of one or more datasets (see datasets.py) came from.
+# 1. Both evaluators are linear in their parameters (positions scored as won do not depend on them), so the score
+#    of each position is base + features . parameters. The features are extracted with the player's evaluateMany,
+#    chunk by chunk, as differences to the score with all parameters zero, into memory-mapped work files.
+# 2. The scale K is fitted for the current parameters, so that the loss is only reduced by better parameters.
+# 3. The parameters are optimized by Adam gradient descent on the mean logistic loss, streaming through the
+#    features in chunks, and written to a parameter file that the player loads at initPlayer.
+
+import argparse
+import importlib
+import os
+import tempfile
+import numpy as np
+import datasets
+import game_rules
+import parameters
+
+chunkSize = 65536  # Positions per chunk of feature extraction and gradient computation
+
+
+# Import the player module and initialize it for the board size of the datasets
+def loadEngine(engineName, boardWidth, boardHeight):
+    module = importlib.import_module(engineName)
+    module.parallelWorkers = 0
+    module.openingBookFile = None
+    module.initPlayer(game_rules.initialState(boardWidth, boardHeight), float('inf'), game_rules.victoryPoints,
+                      game_rules.moveLimit, 1)
+    return module
+
+
+# Score positions start ... stop-1 of a dataset with the parameter vector <vector>
+def evaluateWith(module, vector, fields, start, stop):
+    parameters.setParameterVector(module, vector)
+    module.initEvaluation()
+    return np.asarray(module.evaluateMany(np.asarray(fields['boards'][start:stop]),
+                                          np.asarray(fields['playerToMove'][start:stop]),
+                                          np.asarray(fields['movesRemaining'][start:stop])), dtype=float)
+
+
+# Write the features, base scores, and targets (result 1, 0, -1 -> 1, 0.5, 0) of all positions to work files
+def extractFeatures(module, dataSets, workDirectory):
+    numParameters = len(parameters.getParameterVector(module))
+    numPositions = sum(len(fields['result']) for fields in dataSets)
+    features = np.lib.format.open_memmap(os.path.join(workDirectory, 'features.npy'), mode='w+', dtype=np.float32,
+                                         shape=(numPositions, numParameters))
+    base = np.lib.format.open_memmap(os.path.join(workDirectory, 'base.npy'), mode='w+', dtype=np.float32,
+                                     shape=(numPositions,))
+    targets = np.lib.format.open_memmap(os.path.join(workDirectory, 'targets.npy'), mode='w+', dtype=np.float32,
+                                        shape=(numPositions,))
+
+    position = 0
+    for fields in dataSets:
+        for start in range(0, len(fields['result']), chunkSize):
+            stop = min(start + chunkSize, len(fields['result']))
+            baseScores = evaluateWith(module, np.zeros(numParameters), fields, start, stop)
+            for parameterIndex in range(numParameters):
+                unitVector = np.zeros(numParameters)
+                unitVector[parameterIndex] = 1.0
+                features[position:position + stop - start, parameterIndex] = \
+                    evaluateWith(module, unitVector, fields, start, stop) - baseScores
+            base[position:position + stop - start] = baseScores
+            targets[position:position + stop - start] = (np.asarray(fields['result'][start:stop]) + 1) / 2
+            position += stop - start
+    return (features, base, targets)
+
+
+# Mean logistic loss of sigmoid(K * score) against the targets, and its gradient with respect to the parameters
+def lossAndGradient(weights, scale, features, base, targets):
+    (loss, gradient) = (0.0, np.zeros(len(weights)))
+    for start in range(0, len(targets), chunkSize):
+        z = scale * (base[start:start + chunkSize] + features[start:start + chunkSize] @ weights)
+        y = targets[start:start + chunkSize]
+        loss += np.sum(np.logaddexp(0.0, z) - y * z)  # -y log(p) - (1 - y) log(1 - p) with p = sigmoid(z)
+        gradient += scale * (features[start:start + chunkSize].T @ (0.5 * (1.0 + np.tanh(0.5 * z)) - y))
+    return (loss / len(targets), gradient / len(targets))
+
+
+# Find the scale K with the smallest loss for the given parameters (golden section search on log K)
+def fitScale(weights, features, base, targets, low=1e-5, high=1.0):
+    (low, high) = (np.log(low), np.log(high))
+    ratio = (np.sqrt(5.0) - 1.0) / 2.0
+    for _ in range(40):
+        (left, right) = (high - ratio * (high - low), low + ratio * (high - low))
+        if lossAndGradient(weights, np.exp(left), features, base, targets)[0] < \
+                lossAndGradient(weights, np.exp(right), features, base, targets)[0]:
+            high = right
+        else:
+            low = left
+    return float(np.exp((low + high) / 2.0))
+
+
+# Minimize the loss with Adam; return the optimized parameter vector
+def optimize(weights, scale, features, base, targets, epochs, learningRate, beta1=0.9, beta2=0.999):
+    weights = weights.copy()
+    (moment, secondMoment) = (np.zeros(len(weights)), np.zeros(len(weights)))
+    for epoch in range(1, epochs + 1):
+        (loss, gradient) = lossAndGradient(weights, scale, features, base, targets)
+        moment = beta1 * moment + (1.0 - beta1) * gradient
+        secondMoment = beta2 * secondMoment + (1.0 - beta2) * gradient ** 2
+        weights -= learningRate * (moment / (1.0 - beta1 ** epoch)) / (np.sqrt(secondMoment / (1.0 - beta2 ** epoch)) + 1e-12)
+        if epoch == 1 or epoch % 50 == 0:
+            print('Epoch %d: loss %.6f' % (epoch, loss))
+    return weights
+
+
+def tune(engineName, dataDirectories, epochs, learningRate, outputFile, workDirectory):
+    manifest = datasets.readManifest(dataDirectories[0])
+    module = loadEngine(engineName, manifest['boardWidth'], manifest['boardHeight'])
+    initialWeights = parameters.getParameterVector(module)
+    dataSets = [datasets.openDataset(directory) for directory in dataDirectories]
+    print('%d positions, %d parameters' % (sum(len(fields['result']) for fields in dataSets), len(initialWeights)))
+
+    (features, base, targets) = extractFeatures(module, dataSets, workDirectory)
+    check = min(len(targets), chunkSize)  # Make sure that the evaluation really is linear in the parameters
+    if not np.allclose(base[:check] + features[:check] @ initialWeights,
+                       evaluateWith(module, initialWeights, dataSets[0], 0, check), rtol=1e-4, atol=1e-2):
+        raise ValueError('The evaluation of %s is not linear in its tunable parameters' % engineName)
+
+    scale = fitScale(initialWeights, features, base, targets)
+    print('Scale K = %.6f, initial loss %.6f' % (scale, lossAndGradient(initialWeights, scale, features, base, targets)[0]))
+    weights = optimize(initialWeights, scale, features, base, targets, epochs, learningRate)
+    print('Final loss %.6f' % lossAndGradient(weights, scale, features, base, targets)[0])
+
+    for (parameterName, oldValue, newValue) in zip(parameters.getParameterNames(module), initialWeights, weights):
+        if abs(newValue - oldValue) > 1e-6:
+            print('  %-28s %10.3f -> %10.3f' % (parameterName, oldValue, newValue))
+    parameters.setParameterVector(module, weights)
+    parameters.saveParameters(module, outputFile)
+    module.exitPlayer()
+    print('Parameters written to %s' % outputFile)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tune evaluation parameters on recorded positions.')
+    parser.add_argument('--engine', default='suncharn_pipithkul', help='player module whose evaluation is tuned')
+    parser.add_argument('--data', action='append', required=True, help='dataset directory (can be repeated)')
+    parser.add_argument('--epochs', type=int, default=500, help='number of gradient descent steps')
+    parser.add_argument('--rate', type=float, default=0.1, help='Adam learning rate (in score units)')
+    parser.add_argument('--output', default=None, help='parameter file to write (default: the engine\'s parameterFile)')
+    parser.add_argument('--work', default=None, help='directory for the feature files (default: a temporary one)')
+    args = parser.parse_args()
+    outputFile = args.output or importlib.import_module(args.engine).parameterFile
+    if args.work is not None:
+        tune(args.engine, args.data, args.epochs, args.rate, outputFile, args.work)
+    else:
+        with tempfile.TemporaryDirectory() as workDirectory:
+            tune(args.engine, args.data, args.epochs, args.rate, outputFile, workDirectory)
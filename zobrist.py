@@ -0,0 +1,46 @@
+# Zobrist keys for Hold Your Horses positions
+# The key of a position is the XOR of one random 64-bit number per occupied square (depending on the piece),
+# one number if MIN is to move, and one number for the count of remaining moves. The random numbers come from
+# a fixed seed, so keys are identical in every process and every run and can be stored in shared tables or files.
+
+import numpy as np
+
+keySeed = 4702021     # Seed for the random numbers
+maxBoardSize = 32     # Largest supported board width and height
+maxMoveLimit = 256    # Largest supported number of moves per game
+
+randomNumbers = np.random.Generator(np.random.PCG64(keySeed)).bit_generator.random_raw(
+    maxBoardSize * maxBoardSize * 5 + 1 + maxMoveLimit + 1)
+pieceKeyArray = randomNumbers[:maxBoardSize * maxBoardSize * 5].reshape((maxBoardSize, maxBoardSize, 5))
+pieceKeyArray[:, :, 2] = 0  # Empty squares do not change the key
+sideKey = int(randomNumbers[maxBoardSize * maxBoardSize * 5])
+movesKeys = [int(k) for k in randomNumbers[maxBoardSize * maxBoardSize * 5 + 1:]]
+
+pieceKeyTables = {}   # (boardWidth, boardHeight) -> nested lists of Python ints, indexed [x][y][piece + 2]
+
+
+# Return the piece keys for a board of the given size as nested lists (XOR of Python ints is faster than numpy's)
+def getPieceKeys(boardWidth, boardHeight):
+    if (boardWidth, boardHeight) not in pieceKeyTables:
+        pieceKeyTables[(boardWidth, boardHeight)] = [[[int(k) for k in pieceKeyArray[x, y]] for y in range(boardHeight)]
+                                                     for x in range(boardWidth)]
+    return pieceKeyTables[(boardWidth, boardHeight)]
+
+
+# Compute the key of a position from scratch
+def boardKey(board, playerToMove, movesRemaining):
+    (boardWidth, boardHeight) = board.shape
+    squareKeys = pieceKeyArray[:boardWidth, :boardHeight].reshape((-1, 5))
+    key = int(np.bitwise_xor.reduce(squareKeys[np.arange(boardWidth * boardHeight), board.ravel() + 2]))
+    if playerToMove == -1:
+        key ^= sideKey
+    return key ^ movesKeys[movesRemaining]
+
+
+# Return the key after <move> by <piece> (the player to move), capturing <captured> (0 for an empty square),
+# in a position with key <key> and <movesRemaining> moves remaining before the move
+def moveKey(key, pieceKeys, move, piece, captured, movesRemaining):
+    (xStart, yStart, xEnd, yEnd) = move
+    endKeys = pieceKeys[xEnd][yEnd]
+    return key ^ pieceKeys[xStart][yStart][piece + 2] ^ endKeys[captured + 2] ^ endKeys[piece + 2] ^ sideKey \
+        ^ movesKeys[movesRemaining] ^ movesKeys[movesRemaining - 1]